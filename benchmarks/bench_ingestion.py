@@ -0,0 +1,177 @@
+""" Ingestion of generated Style A / Style B workbooks: files/sec and peak RSS of MetricsFetcher.fetch_many and the time of
+every stage of the extraction (prescan with style detection, load, metric extraction, panel assembly).
+
+Every scenario runs in a fresh process, so the peak RSS of one doesn't carry over to the next. With a baseline, the run
+fails when files/sec drops or the peak RSS grows by more than the threshold.
+
+Run from the root of the repo:
+    python benchmarks/bench_ingestion.py --save-baseline   # Stores the results in benchmarks/ingestion_baseline.json
+    python benchmarks/bench_ingestion.py                   # Compares against it, exit code 1 on a regression
+"""
+from dataclasses import dataclass, asdict
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import json
+import multiprocessing
+import resource
+import tempfile
+import time
+import warnings
+
+import openpyxl as opx
+
+import os
+import sys
+sys.path.append(os.path.join(os.getcwd()))
+sys.path.append(os.path.join(os.getcwd(), "tests"))
+from src.configs.file_style_configs_by_metric import file_style_configs_by_metric
+from src.data_fetchers.file_style import FileStyleManager
+from src.data_fetchers.metrics_fetcher import MetricsFetcher, MetricFetcherFileStyleFactory, MetricNotFoundInSheet, ExtractionEngine
+from src.data_fetchers.panel_assembly import PanelAssembler
+from src.data_fetchers.workbook_index import WorkbookIndex
+from src.data_fetchers.workbook_prescan import prescan_workbook, get_style_cells
+from synthetic_workbooks import generate_companies_folder
+
+DEFAULT_BASELINE_FILE_PATH = os.path.join("benchmarks", "ingestion_baseline.json")
+STAGES = ["prescan", "load", "extract", "assemble"]
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    n_companies: int
+    n_quarters: int
+    n_sheets: int
+
+SCENARIOS = [
+    Scenario("small", 25, 40, 4),
+    Scenario("long_history", 25, 120, 4),
+    Scenario("many_sheets", 25, 40, 12),
+    Scenario("many_companies", 200, 40, 4),
+]
+
+
+def get_peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024 # Kilobytes on Linux
+
+
+def run_fetch(data_folder_path: str, engine: ExtractionEngine) -> dict:
+    """ End to end fetch_many of every metric with an empty cache. Runs in its own process """
+    with tempfile.TemporaryDirectory() as pickled_data_path, warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        fetcher = MetricsFetcher(data_folder_path, file_style_configs_by_metric, extraction_engine=engine, show_progress=False)
+        start = time.perf_counter()
+        fetcher.fetch_many(list(file_style_configs_by_metric), pickled_data_path)
+        total_time = time.perf_counter() - start
+
+    return {"files_per_sec": len(fetcher.file_names)/total_time, "peak_rss_mb": get_peak_rss_mb()}
+
+
+def run_stages(data_folder_path: str, engine: ExtractionEngine) -> dict:
+    """ Seconds spent in every stage of the extraction of every metric of every workbook. Runs in its own process """
+    stage_times = dict.fromkeys(STAGES, 0.0)
+    series_by_metric = {metric: [] for metric in file_style_configs_by_metric}
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for file_name in sorted(os.listdir(data_folder_path)):
+            file_path = os.path.join(data_folder_path, file_name)
+            start = time.perf_counter()
+            prescan = prescan_workbook(file_path, get_style_cells(file_style_configs_by_metric))
+            file_styles = {metric: FileStyleManager(file_style_configs).determine_file_style_from_cells(prescan.cells)
+                           for metric, file_style_configs in file_style_configs_by_metric.items()} if not prescan.is_incomplete else {}
+            stage_times["prescan"] += time.perf_counter() - start
+            if prescan.is_incomplete:
+                continue
+
+            start = time.perf_counter()
+            workbook = opx.load_workbook(file_path, read_only=engine == ExtractionEngine.BULK)
+            stage_times["load"] += time.perf_counter() - start
+
+            workbook_index = WorkbookIndex(workbook)
+            for metric, file_style_configs in file_style_configs_by_metric.items():
+                file_style = file_styles[metric]
+                start = time.perf_counter()
+                extractor = MetricFetcherFileStyleFactory.get_extractor(file_style, workbook, file_style_configs[file_style], workbook_index=workbook_index)
+                try:
+                    series_by_metric[metric].append(extractor.get_metric_data(engine).rename(file_name))
+                except MetricNotFoundInSheet:
+                    pass
+                stage_times["extract"] += time.perf_counter() - start
+
+            workbook.close()
+
+    assembler = PanelAssembler()
+    start = time.perf_counter()
+    for series_list in series_by_metric.values():
+        assembler.assemble(series_list)
+    stage_times["assemble"] += time.perf_counter() - start
+
+    return stage_times
+
+
+def run_in_new_process(function, *args):
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(function, *args).result()
+
+
+def find_regressions(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """ Results worse than the baseline by more than threshold (0.2 = 20%). Stage times are reported but too noisy to fail on """
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        if result["files_per_sec"] < baseline[key]["files_per_sec"]*(1 - threshold):
+            regressions.append(f"{key}: {result['files_per_sec']:.1f} files/sec, baseline {baseline[key]['files_per_sec']:.1f}")
+        if result["peak_rss_mb"] > baseline[key]["peak_rss_mb"]*(1 + threshold):
+            regressions.append(f"{key}: {result['peak_rss_mb']:.0f} MB peak RSS, baseline {baseline[key]['peak_rss_mb']:.0f}")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="*", default=[scenario.name for scenario in SCENARIOS], help="Names of the scenarios to run")
+    parser.add_argument("--engines", nargs="*", default=[engine.name for engine in ExtractionEngine], help="Extraction engines to run")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_FILE_PATH, help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the baseline instead of comparing against it")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Tolerated relative regression, 0.2 = 20%%")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'scenario':>16} {'engine':>9} {'files/sec':>10} {'peak RSS [MB]':>14} " + " ".join(f"{stage + ' [s]':>12}" for stage in STAGES))
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for scenario in [scenario for scenario in SCENARIOS if scenario.name in args.scenarios]:
+            data_folder_path = os.path.join(temp_dir, scenario.name)
+            generate_companies_folder(data_folder_path, scenario.n_companies, scenario.n_quarters, scenario.n_sheets)
+
+            for engine in [ExtractionEngine[engine_name] for engine_name in args.engines]:
+                result = {**asdict(scenario), "engine": engine.name,
+                          **run_in_new_process(run_fetch, data_folder_path, engine),
+                          "stages": run_in_new_process(run_stages, data_folder_path, engine)}
+                results[f"{scenario.name}/{engine.name}"] = result
+                print(f"{scenario.name:>16} {engine.name:>9} {result['files_per_sec']:>10.1f} {result['peak_rss_mb']:>14.0f} "
+                      + " ".join(f"{result['stages'][stage]:>12.3f}" for stage in STAGES))
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as outfile:
+            json.dump(results, outfile, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    try:
+        with open(args.baseline) as infile:
+            baseline = json.load(infile)
+    except FileNotFoundError:
+        print(f"No baseline in {args.baseline}, run with --save-baseline to store one")
+        return
+
+    regressions = find_regressions(results, baseline, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        sys.exit(1)
+    print(f"No regressions beyond {args.threshold:.0%} of {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
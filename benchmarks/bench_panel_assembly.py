@@ -0,0 +1,56 @@
+""" Time to assemble the metric panel against the number of companies: chained outer merges vs PanelAssembler.
+Run from the root of the repo: python benchmarks/bench_panel_assembly.py
+"""
+import time
+import datetime
+
+import numpy as np
+import pandas as pd
+
+import os
+import sys
+sys.path.append(os.path.join(os.getcwd()))
+from src.data_fetchers.panel_assembly import PanelAssembler
+
+
+def make_series_list(n_companies: int, max_quarters: int = 100, seed: int = 0) -> list[pd.Series]:
+    """ Descending quarterly series of random length and start, like the ones extracted from Style A workbooks """
+    rng = np.random.default_rng(seed)
+    all_quarters = [datetime.date(1995 + i//4, 3*(i%4) + 1, 1) for i in range(max_quarters)]
+    series_list = []
+    for i in range(n_companies):
+        start = int(rng.integers(0, max_quarters//2))
+        index = all_quarters[start:][::-1]
+        series_list.append(pd.Series(rng.normal(size=len(index)), index=index, name=f"TICK{i}"))
+
+    return series_list
+
+
+def merge_panel(series_list: list[pd.Series]) -> pd.DataFrame:
+    merged = pd.DataFrame()
+    for series in series_list:
+        merged = pd.merge(merged, series, how="outer", left_index=True, right_index=True)
+    return merged
+
+
+def best_time(function, *args, repeats: int = 3) -> float:
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    assembler = PanelAssembler()
+    print(f"{'companies':>10} {'outer merge [s]':>16} {'assembler [s]':>14} {'speedup':>8}")
+    for n_companies in [50, 100, 200, 400, 800]:
+        series_list = make_series_list(n_companies)
+        merge_time = best_time(merge_panel, series_list)
+        assembler_time = best_time(assembler.assemble, series_list)
+        print(f"{n_companies:>10} {merge_time:>16.4f} {assembler_time:>14.4f} {merge_time/assembler_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
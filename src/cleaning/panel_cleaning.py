@@ -0,0 +1,158 @@
+""" Cleaning of the metric panels of MetricsFetcher: NaN handling, smoothing and outlier removal, on the whole 2-D array at once """
+from dataclasses import dataclass, field
+from abc import ABC, abstractmethod
+import hashlib
+import pickle
+import os
+
+import numpy as np
+import pandas as pd
+from scipy.ndimage import uniform_filter1d
+
+
+@dataclass
+class StepLog:
+    """ What a cleaning step did to the panel """
+    step: str
+    dropped_companies: list = field(default_factory=list)
+    imputed_cells: int = 0
+    removed_cells: int = 0 # Values set to NaN
+
+@dataclass
+class PanelValues:
+    """ Panel being cleaned: quarters (rows) by companies (columns). imputed marks the cells filled by a step """
+    values: np.ndarray
+    index: pd.Index
+    columns: pd.Index
+    imputed: np.ndarray
+
+    def keep_columns(self, is_kept: np.ndarray) -> "PanelValues":
+        return PanelValues(self.values[:, is_kept], self.index, self.columns[is_kept], self.imputed[:, is_kept])
+
+
+class CleaningStep(ABC):
+    """ A stage of PanelCleaningPipeline. Steps are frozen dataclasses, so their repr holds every parameter that changes their output """
+    @abstractmethod
+    def apply(self, panel: PanelValues) -> tuple[PanelValues, StepLog]:
+        pass
+
+@dataclass(frozen=True)
+class DropLongNaNRuns(CleaningStep):
+    """ Drops the companies with more than max_consecutive_nans NaNs in a row """
+    max_consecutive_nans: int = 4
+
+    def apply(self, panel: PanelValues) -> tuple[PanelValues, StepLog]:
+        # NaNs in every window of max_consecutive_nans + 1 quarters, from the cumulative count of NaNs
+        window = self.max_consecutive_nans + 1
+        nan_counts = np.concatenate([np.zeros((1, panel.values.shape[1])), np.cumsum(np.isnan(panel.values), axis=0)])
+        has_long_run = (nan_counts[window:] - nan_counts[:-window] >= window).any(axis=0)
+
+        return panel.keep_columns(~has_long_run), StepLog(repr(self), dropped_companies=panel.columns[has_long_run].to_list())
+
+@dataclass(frozen=True)
+class FillFromSameQuarter(CleaningStep):
+    """ Fills NaNs with the value of the same quarter of the previous year and then, for the ones left, of the next year.
+    Each direction is filled once, like df.fillna(df.shift(4)).fillna(df.shift(-4))
+    """
+    quarters_in_year: int = 4
+
+    def apply(self, panel: PanelValues) -> tuple[PanelValues, StepLog]:
+        values = panel.values.copy()
+        shift = self.quarters_in_year
+        for source_rows, target_rows in [(slice(None, -shift), slice(shift, None)), (slice(shift, None), slice(None, -shift))]:
+            target_values = values[target_rows]
+            np.copyto(target_values, values[source_rows].copy(), where=np.isnan(target_values))
+
+        is_imputed = np.isnan(panel.values) & ~np.isnan(values)
+        return (PanelValues(values, panel.index, panel.columns, panel.imputed | is_imputed),
+                StepLog(repr(self), imputed_cells=int(is_imputed.sum())))
+
+@dataclass(frozen=True)
+class Smooth(CleaningStep):
+    """ Moving average of window_size quarters along every company, like scipy's uniform_filter1d run column by column """
+    window_size: int = 2
+
+    def apply(self, panel: PanelValues) -> tuple[PanelValues, StepLog]:
+        values = uniform_filter1d(panel.values, self.window_size, axis=0) if len(panel.values) else panel.values
+        return PanelValues(values, panel.index, panel.columns, panel.imputed), StepLog(repr(self))
+
+@dataclass(frozen=True)
+class RemoveOutliers(CleaningStep):
+    """ Sets to NaN the values further than iqr_times IQRs from the quartiles of all the values of the panel """
+    iqr_times: float = 1.5
+
+    def apply(self, panel: PanelValues) -> tuple[PanelValues, StepLog]:
+        is_value = ~np.isnan(panel.values)
+        if not is_value.any():
+            return panel, StepLog(repr(self))
+
+        first_quartile, third_quartile = np.quantile(panel.values[is_value], [0.25, 0.75])
+        iqr = third_quartile - first_quartile
+        is_outlier = is_value & ((panel.values < first_quartile - self.iqr_times*iqr) | (panel.values > third_quartile + self.iqr_times*iqr))
+
+        values = np.where(is_outlier, np.NaN, panel.values)
+        return (PanelValues(values, panel.index, panel.columns, panel.imputed & ~is_outlier),
+                StepLog(repr(self), removed_cells=int(is_outlier.sum())))
+
+
+@dataclass
+class CleanedPanel:
+    panel: pd.DataFrame
+    imputed: pd.DataFrame # True for the cells filled by a step
+    log: list[StepLog]
+
+    @property
+    def dropped_companies(self) -> list[str]:
+        return [company for step_log in self.log for company in step_log.dropped_companies]
+
+    def print_log(self) -> None:
+        for step_log in self.log:
+            print(f"{step_log.step}. Dropped {len(step_log.dropped_companies)} companies, imputed {step_log.imputed_cells} and removed {step_log.removed_cells} values.")
+
+
+class PanelCleaningPipeline:
+    """
+    Runs the cleaning steps, in order, on the float array behind a panel, without looping over its columns.
+
+    With a cache folder, the result is saved keyed by the fingerprint of the panel (values, quarters and tickers) and
+    the parameters of the steps, so cleaning the same panel with the same steps again only loads the saved result.
+    """
+    def __init__(self, steps: list[CleaningStep], cache_folder_path: str=None):
+        self.steps = steps
+        self.cache_folder_path = cache_folder_path
+
+    def get_cache_key(self, panel: pd.DataFrame) -> str:
+        key = hashlib.sha256()
+        key.update(np.ascontiguousarray(panel.to_numpy(dtype=float)).tobytes())
+        key.update(repr(panel.index.to_list()).encode())
+        key.update(repr(panel.columns.to_list()).encode())
+        key.update(repr(self.steps).encode())
+        return key.hexdigest()
+
+    def _get_cache_file_path(self, panel: pd.DataFrame) -> str:
+        return os.path.join(self.cache_folder_path, f"{self.get_cache_key(panel)}.pickle")
+
+    def clean(self, panel: pd.DataFrame) -> CleanedPanel:
+        if self.cache_folder_path is not None:
+            try:
+                with open(self._get_cache_file_path(panel), "rb") as infile:
+                    return pickle.load(infile)
+            except FileNotFoundError:
+                pass
+
+        panel_values = PanelValues(panel.to_numpy(dtype=float), panel.index, panel.columns, np.zeros(panel.shape, dtype=bool))
+        log = []
+        for step in self.steps:
+            panel_values, step_log = step.apply(panel_values)
+            log.append(step_log)
+
+        cleaned_panel = CleanedPanel(pd.DataFrame(panel_values.values, index=panel_values.index, columns=panel_values.columns),
+                                     pd.DataFrame(panel_values.imputed, index=panel_values.index, columns=panel_values.columns),
+                                     log)
+
+        if self.cache_folder_path is not None:
+            os.makedirs(self.cache_folder_path, exist_ok=True)
+            with open(self._get_cache_file_path(panel), "wb") as outfile:
+                pickle.dump(cleaned_panel, outfile)
+
+        return cleaned_panel
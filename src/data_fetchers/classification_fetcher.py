@@ -1,23 +1,80 @@
 """ Fucntions to get different information about companies given their tickers """
+import os
+import warnings
+
 import pandas as pd
 
+CLASSIFICATION_COLUMNS = {
+    "GICS Sector": "sector",
+    "GICS Sub-Industry": "industry"
+}
+
+class UnknownTickers(UserWarning):
+    def __init__(self, tickers: list, data_file_path: str):
+        self.tickers = tickers
+        self.data_file_path = data_file_path
+
+    def __str__(self):
+        return f"Tickers not found in {self.data_file_path}: {self.tickers}."
+
+
+# Parsed classification files shared by every ClassificationFetcher of the process. {absolute path: (mtime_ns, table)}
+_classification_tables = {}
+
+def load_classification_table(data_file_path: str) -> pd.DataFrame:
+    """ Sector and industry of every symbol in the file, indexed by symbol. Parsed once per process and again only when the file changes """
+    full_file_path = os.path.abspath(data_file_path)
+    mtime_ns = os.stat(full_file_path).st_mtime_ns
+
+    cached_table = _classification_tables.get(full_file_path)
+    if cached_table is None or cached_table[0] != mtime_ns:
+        table = pd.read_csv(full_file_path, usecols=["Symbol", *CLASSIFICATION_COLUMNS], index_col="Symbol",
+                            dtype={column: "category" for column in CLASSIFICATION_COLUMNS})
+        table = table.rename(columns=CLASSIFICATION_COLUMNS)[list(CLASSIFICATION_COLUMNS.values())]
+        table = table[~table.index.duplicated()] # First row of every symbol, like df[tickers] used to return
+        _classification_tables[full_file_path] = (mtime_ns, table)
+
+    return _classification_tables[full_file_path][1]
+
 class ClassificationFetcher:
     def __init__(self, data_file_path: str):
         self.data_file_path = data_file_path
 
         self.extracted_data = None
+        self.unknown_tickers = [] # Tickers of the last fetch that are not in the file
 
-    def fetch(self, tickers: list) -> pd.DataFrame:
+    def get_table(self) -> pd.DataFrame:
+        return load_classification_table(self.data_file_path)
+
+    def lookup(self, tickers: list) -> pd.DataFrame:
+        """ Sector and industry of the tickers, one row per ticker. Tickers that are not in the file are left out
+        and reported in self.unknown_tickers and with an UnknownTickers warning.
+        """
+        table = self.get_table()
+        is_known = table.index.get_indexer(tickers) != -1
+        self.unknown_tickers = [ticker for ticker, known in zip(tickers, is_known) if not known]
+        if self.unknown_tickers:
+            warnings.warn(UnknownTickers(self.unknown_tickers, self.data_file_path))
+
+        return table.loc[[ticker for ticker, known in zip(tickers, is_known) if known]]
 
-        df = pd.read_csv(self.data_file_path, index_col="Symbol")[["GICS Sector", "GICS Sub-Industry"]].T
-        df.rename({
-            "GICS Sector": "sector",
-            "GICS Sub-Industry": "industry"
-        }, inplace=True)
-        
-        self.extracted_data = df[tickers]
+    def fetch(self, tickers: list) -> pd.DataFrame:
+        """ Sector and industry of the tickers, one column per ticker. See lookup for the tickers that are not in the file """
+        self.extracted_data = self.lookup(tickers).astype(object).T
         return self.extracted_data.copy()
 
+    def _get_tickers_by(self, column: str, tickers: list=None) -> dict:
+        table = self.get_table() if tickers is None else self.lookup(tickers)
+        return {group: group_tickers.to_list() for group, group_tickers in table.index.groupby(table[column]).items() if len(group_tickers)}
+
+    def get_tickers_by_sector(self, tickers: list=None) -> dict:
+        """ {sector: [tickers]}. Defaults to every ticker in the file """
+        return self._get_tickers_by("sector", tickers)
+
+    def get_tickers_by_industry(self, tickers: list=None) -> dict:
+        """ {industry: [tickers]}. Defaults to every ticker in the file """
+        return self._get_tickers_by("industry", tickers)
+
 
 def main():
     # info_dict = get_classification(['EXC', 'TXT', 'ETN', 'MSI'])
@@ -25,4 +82,4 @@ def main():
     pass
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,94 @@
+""" Timing and outcome of the extraction of every workbook, collected by MetricsFetcher when it is asked for a report """
+from dataclasses import dataclass, field, asdict
+from enum import Enum
+import json
+
+import pandas as pd
+
+# Stages of the extraction of a workbook, in the order they run
+STAGES = ["prescan", "load", "style", "find_sheet", "find_row", "read_cells"]
+
+
+class FailureReason(Enum):
+    INCOMPLETE_WORKBOOK = 1 # Less than 4 sheets, found by the prescan without loading the workbook
+    METRIC_NOT_FOUND = 2 # No row of the target sheet contains the metric name
+    SHEET_NOT_FOUND = 3 # No sheet has the name of the target sheet in its title cell
+    UNRECOGNIZED_STYLE = 4 # The cells of the active sheet match no FileStyle
+
+
+@dataclass
+class FileReport:
+    """
+    Attributes:
+        bytes_read (int): Uncompressed bytes of the sheet XML parts that were read. Every sheet, parsed whole when the
+            workbook is loaded, with the cellwise engine. Only what the extraction read with the bulk engine
+        stage_times (dict): Wall time in seconds of every stage in STAGES, summed over the metrics of the workbook
+        cells_read (int): Cells of the timestamp and metric rows visited for all the metrics, also the cells of the
+            timestamp row outside the window that the cellwise engine goes through
+        failures (dict): {metric: FailureReason} of the metrics that couldn't be extracted
+    """
+    file_name: str
+    company_ticker: str
+    bytes_read: int = 0
+    stage_times: dict = field(default_factory=lambda: dict.fromkeys(STAGES, 0.0))
+    cells_read: int = 0
+    failures: dict = field(default_factory=dict)
+
+    @property
+    def total_time(self) -> float:
+        return sum(self.stage_times.values())
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), "failures": {metric: reason.name for metric, reason in self.failures.items()}}
+
+
+@dataclass
+class ExtractionReport:
+    """ FileReports of every workbook extracted in one run of MetricsFetcher, in extraction order """
+    metrics: list[str]
+    file_reports: list[FileReport] = field(default_factory=list)
+
+    def get_file_table(self) -> pd.DataFrame:
+        """ One row per workbook with the bytes and cells read, failed metrics and the time of every stage """
+        return pd.DataFrame([{"company_ticker": file_report.company_ticker, "file_name": file_report.file_name,
+                              "bytes_read": file_report.bytes_read, "cells_read": file_report.cells_read,
+                              "failed_metrics": len(file_report.failures), **file_report.stage_times, "total_time": file_report.total_time}
+                             for file_report in self.file_reports],
+                            columns=["company_ticker", "file_name", "bytes_read", "cells_read", "failed_metrics", *STAGES, "total_time"])
+
+    def get_failure_table(self) -> pd.DataFrame:
+        """ One row per (company, metric) that couldn't be extracted, with the reason """
+        return pd.DataFrame([{"company_ticker": file_report.company_ticker, "metric": metric, "reason": reason.name}
+                             for file_report in self.file_reports for metric, reason in file_report.failures.items()],
+                            columns=["company_ticker", "metric", "reason"])
+
+    def get_stage_totals(self) -> pd.Series:
+        """ Seconds spent in every stage over all the workbooks """
+        return pd.Series({stage: sum(file_report.stage_times[stage] for file_report in self.file_reports) for stage in STAGES})
+
+    def to_dict(self) -> dict:
+        return {"metrics": self.metrics, "file_reports": [file_report.to_dict() for file_report in self.file_reports]}
+
+    def to_json(self, **json_kwargs) -> str:
+        return json.dumps(self.to_dict(), **json_kwargs)
+
+
+class ExtractionHook:
+    """ Receives the reports of MetricsFetcher as they are made. Subclass it and override the methods of interest """
+    def on_file(self, file_report: FileReport) -> None:
+        """ Called after every workbook is extracted """
+        pass
+
+    def on_report(self, report: ExtractionReport) -> None:
+        """ Called once all the workbooks of a run are extracted """
+        pass
+
+
+class JsonReportWriter(ExtractionHook):
+    """ Writes the report of every run to file_path, replacing the one of the previous run """
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+
+    def on_report(self, report: ExtractionReport) -> None:
+        with open(self.file_path, "w") as outfile:
+            outfile.write(report.to_json(indent=2))
@@ -53,6 +53,11 @@ class FileStyleDetailsFactory:
         )
 
 
+class FileStyleNotRecognized(Exception):
+    def __str__(self):
+        return "Sheet style not recognized."
+
+
 class FileStyleManager:
     def __init__(self, styles : dict):
         self.styles = styles
@@ -65,13 +70,25 @@ class FileStyleManager:
             FileStyle: If the comparison for the corresponding file style returns true
         """
         active_sheet = workbook.active
-        
+
+        return self.determine_file_style_from_cells({coordinate: active_sheet[coordinate].value for coordinate in self.get_style_cells()})
+
+    def get_style_cells(self) -> list[str]:
+        """ Coordinates of the cells of the active sheet that determine the style """
+        return list(dict.fromkeys(coordinate for style in self.styles.values() for coordinate in [style.sheet_name_base, style.sheet_name_compare]))
+
+    def determine_file_style_from_cells(self, cells : dict) -> FileStyle:
+        """ Same as determine_file_style, from the values of the cells of get_style_cells: {coordinate: value} """
         for style_name, style in self.styles.items():
-            sheet_name_base = active_sheet[style.sheet_name_base].value
-            sheet_name_compare = active_sheet[style.sheet_name_compare].value.split("-") #
+            sheet_name_base = cells.get(style.sheet_name_base)
+            sheet_name_compare = cells.get(style.sheet_name_compare)
+            if not isinstance(sheet_name_base, str) or not isinstance(sheet_name_compare, str):
+                continue
+
+            sheet_name_compare = sheet_name_compare.split("-") #
             sheet_name_compare = sheet_name_compare[0].split("\xa0\xa0")[0].strip() # In style A there a bunch of "\xa0" characters
 
             if sheet_name_compare in sheet_name_base:
                 return style_name
             
-        raise Exception("Sheet style not recognized.")
+        raise FileStyleNotRecognized()
@@ -0,0 +1,122 @@
+""" Incremental cache of the data extracted from every workbook, so only new or changed workbooks are processed again """
+from dataclasses import dataclass
+import hashlib
+import pickle
+import os
+
+from .quarter_window import QuarterWindow
+
+
+@dataclass(frozen=True)
+class FileFingerprint:
+    size: int
+    mtime_ns: int
+    content_hash: str
+
+
+@dataclass
+class CacheEntry:
+    fingerprint: FileFingerprint
+    company_ticker: str
+    extracted_data: object # What was extracted from the file, None when the file didn't have the data
+    window: QuarterWindow = QuarterWindow() # Quarters extracted, the full history by default and in manifests saved before windows
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0 # New or changed files
+    removed: int = 0
+
+
+def hash_file(file_path: str, chunk_size: int = 1 << 20) -> str:
+    file_hash = hashlib.sha256()
+    with open(file_path, "rb") as infile:
+        while chunk := infile.read(chunk_size):
+            file_hash.update(chunk)
+
+    return file_hash.hexdigest()
+
+
+class MetricCache:
+    """
+    Manifest of the workbooks a metric has been extracted from, keyed by file name, with the fingerprint of every file
+    and what was extracted from it. Saved as a pickle next to the pickled metric data.
+
+    A file is considered unchanged when its size and mtime match the manifest. Otherwise its content hash decides, so
+    files that were only touched or copied over are not extracted again.
+    """
+    def __init__(self, manifest_file_path: str, file_style_configs: dict):
+        self.manifest_file_path = manifest_file_path
+        self.file_style_configs = file_style_configs
+
+        self.entries = {}
+        self.stats = CacheStats()
+        self.load()
+
+    def load(self) -> None:
+        try:
+            with open(self.manifest_file_path, "rb") as infile:
+                manifest = pickle.load(infile)
+        except FileNotFoundError:
+            return
+
+        # Data extracted with other locations or names of the metric is stale for every file
+        if manifest["file_style_configs"] == self.file_style_configs:
+            self.entries = manifest["entries"]
+
+    def save(self) -> None:
+        with open(self.manifest_file_path, "wb") as outfile:
+            pickle.dump({"file_style_configs": self.file_style_configs, "entries": self.entries}, outfile)
+
+    def get_fingerprint(self, file_name: str, file_path: str) -> FileFingerprint:
+        file_stat = os.stat(file_path)
+        entry = self.entries.get(file_name)
+        if entry and entry.fingerprint.size == file_stat.st_size and entry.fingerprint.mtime_ns == file_stat.st_mtime_ns:
+            return entry.fingerprint
+
+        return FileFingerprint(file_stat.st_size, file_stat.st_mtime_ns, hash_file(file_path))
+
+    def refresh(self, file_paths: dict, window: QuarterWindow=QuarterWindow(), folder_file_names: list=None) -> dict:
+        """ Compares the manifest against the files currently in the data folder and forgets the ones that were removed.
+
+        Args:
+            file_paths (dict): {file_name: file_path} of every file the metric should be extracted from
+            window (QuarterWindow, optional): Quarters needed. Entries extracted for a window that doesn't cover it are stale.
+            folder_file_names (list, optional): Every file of the data folder, when file_paths is only a subset of them.
+                Entries of files that are not in the folder are forgotten. Defaults to the files of file_paths.
+
+        Returns:
+            dict: {file_name: FileFingerprint} of the new or changed files, which have to be extracted again
+        """
+        self.stats = CacheStats()
+
+        for file_name in set(self.entries) - set(file_paths if folder_file_names is None else folder_file_names):
+            del self.entries[file_name]
+            self.stats.removed += 1
+
+        stale_files = {}
+        for file_name, file_path in file_paths.items():
+            fingerprint = self.get_fingerprint(file_name, file_path)
+            entry = self.entries.get(file_name)
+            if entry and entry.fingerprint.content_hash == fingerprint.content_hash and entry.window.covers(window):
+                entry.fingerprint = fingerprint
+                self.stats.hits += 1
+            else:
+                stale_files[file_name] = fingerprint
+                self.stats.misses += 1
+
+        return stale_files
+
+    def get_extraction_window(self, file_name: str, fingerprint: FileFingerprint, window: QuarterWindow) -> QuarterWindow:
+        """ Window to extract a stale file for: window, grown to cover the cached one when only the window was missing,
+        so a narrower request doesn't shrink what is cached for the next ones
+        """
+        entry = self.entries.get(file_name)
+        if entry and entry.fingerprint.content_hash == fingerprint.content_hash:
+            return window.union(entry.window)
+        return window
+
+    def update(self, file_name: str, fingerprint: FileFingerprint, company_ticker: str, extracted_data,
+               window: QuarterWindow=QuarterWindow()) -> None:
+        self.entries[file_name] = CacheEntry(fingerprint, company_ticker, extracted_data, window)
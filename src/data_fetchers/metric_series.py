@@ -0,0 +1,70 @@
+""" Compact representation of the metric series of a company: contiguous arrays instead of a pd.Series of date objects """
+import numpy as np
+import pandas as pd
+
+
+def dates_to_days(dates) -> np.ndarray:
+    """ Days since 1970-01-01 of datetime.date objects (or anything np.datetime64 understands) as int32 """
+    return np.asarray(dates, dtype="datetime64[D]").astype(np.int32)
+
+def days_to_dates(days: np.ndarray) -> np.ndarray:
+    """ Inverse of dates_to_days: object array of datetime.date """
+    return np.asarray(days, dtype=np.int64).astype("datetime64[D]").astype(object)
+
+
+class CompactSeries:
+    """
+    Metric series of one company as two contiguous arrays of the same length, in the order of the sheet:
+        days: quarter end dates as int32 days since 1970-01-01
+        values: float values, NaN where the cell was blank
+
+    About 12 bytes per quarter with float64 values, instead of a date object, its pointer and a float of a pd.Series
+    plus the overhead of the Series and its Index. to_series gives back the pd.Series of IMetricFetcher.get_metric_data,
+    and PanelAssembler assembles lists of CompactSeries directly from the arrays.
+    """
+    __slots__ = ("name", "days", "values")
+
+    def __init__(self, name: str, days: np.ndarray, values: np.ndarray):
+        self.name = name
+        self.days = np.ascontiguousarray(days, dtype=np.int32)
+        self.values = np.ascontiguousarray(values)
+
+    @classmethod
+    def from_series(cls, series: pd.Series, dtype=np.float64) -> "CompactSeries":
+        """
+        Args:
+            dtype (optional): Of the values. np.float32 halves their size, with float32 precision.
+        """
+        return cls(series.name, dates_to_days(series.index.to_numpy()), series.to_numpy(dtype=dtype))
+
+    def to_series(self) -> pd.Series:
+        """ pd.Series indexed by datetime.date, like the ones of IMetricFetcher.get_metric_data """
+        return pd.Series(self.values.astype(float), index=pd.Index(days_to_dates(self.days), dtype=object), name=self.name)
+
+    def rename(self, name: str) -> "CompactSeries":
+        return CompactSeries(name, self.days, self.values)
+
+    @property
+    def is_missing(self) -> np.ndarray:
+        return np.isnan(self.values)
+
+    @property
+    def nbytes(self) -> int:
+        return self.days.nbytes + self.values.nbytes
+
+    @property
+    def empty(self) -> bool:
+        return len(self) == 0
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __eq__(self, other) -> bool:
+        return (isinstance(other, CompactSeries) and self.name == other.name and np.array_equal(self.days, other.days)
+                and self.values.dtype == other.values.dtype and np.array_equal(self.values, other.values, equal_nan=True))
+
+    def __reduce__(self):
+        return (CompactSeries, (self.name, self.days, self.values))
+
+    def __repr__(self) -> str:
+        return f"CompactSeries(name={self.name!r}, length={len(self)}, dtype={self.values.dtype})"
@@ -2,23 +2,48 @@ from dataclasses import dataclass
 from abc import ABC, abstractmethod
 from enum import Enum
 import pickle
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, Executor
+from contextlib import nullcontext
+from itertools import repeat
+from collections import deque
+from functools import partial
+from typing import Iterator, AsyncIterator
+import asyncio
 
 import openpyxl as opx
 from openpyxl.utils import get_column_letter, column_index_from_string, coordinate_to_tuple
 
 import os
+import time
+import zipfile
 import datetime
 import numpy as np
 import pandas as pd
 
 from tqdm import tqdm
 
-from .file_style import FileStyle, FileStyleDetails, FileStyleManager
+from .file_style import FileStyle, FileStyleDetails, FileStyleManager, FileStyleNotRecognized
+from .workbook_index import WorkbookIndex, SheetBytesCounter
+from .panel_assembly import PanelAssembler, DuplicateQuarters
+from .metric_cache import MetricCache, CacheStats
+from .panel_store import PanelStorage, ColumnarPanelStore
+from .metric_series import CompactSeries
+from .quarter_window import QuarterWindow
+from .workbook_prescan import prescan_workbook, get_style_cells
+from .extraction_report import ExtractionReport, ExtractionHook, FileReport, FailureReason
 
 class FrequencyOfData(Enum):
     ANNUAL = 1
     QUARTERLY = 2
 
+class ExtractionEngine(Enum):
+    CELLWISE = 1 # Reads one cell at a time through worksheet[coordinate]
+    BULK = 2 # Loads the workbook read only and reads every metric sheet in one pass, shared by all the metrics (see SheetCells)
+
+# Percentages are stored as 12.3 instead of 0.123 in cells with these formats
+PERCENT_NUMBER_FORMATS = [r"[>=100]##,##0.0\%;[<=-100]\-##,##0.0\%;##,##0.0\%",
+                          r"[>=100]##,##0.0\%;[<=-100]-##,##0.0\%;##,##0.0\%"]
+
 class MetricNotFoundInSheet(Exception):
     def __init__(self, metric_name: str, sheet_name: str):
         self.metric_name = metric_name
@@ -27,34 +52,57 @@ class MetricNotFoundInSheet(Exception):
     def __str__(self):
         return(repr(f"Metric {self.metric_name} not found in {self.sheet_name}."))
 
+class MetricSheetNotFound(Exception):
+    def __init__(self, metric_sheet_name: str, sheet_name_base: str):
+        self.metric_sheet_name = metric_sheet_name
+        self.sheet_name_base = sheet_name_base
+
+    def __str__(self):
+        return(repr(f"Metric sheet not found. {self.metric_sheet_name} not in cell {self.sheet_name_base} on any sheet"))
+
 class IMetricFetcher(ABC):
-    def __init__(self, workbook : opx.Workbook, file_structure_details : FileStyleDetails, quarter_end_dates : list = ["31-03", "30-06", "30-09", "31-12"]):
+    dates_descending: bool # Order of the dates in the timestamp row, set by every style
+
+    def __init__(self, workbook : opx.Workbook, file_structure_details : FileStyleDetails, quarter_end_dates : list = ["31-03", "30-06", "30-09", "31-12"],
+                 workbook_index : WorkbookIndex = None):
+        """
+        Args:
+            workbook_index (WorkbookIndex, optional): Sheet and row lookups of workbook. Pass the same one to every extractor of a workbook so it is only built once.
+        """
         self.workbook = workbook
         self.file_structure_details = file_structure_details
+        self.workbook_index = workbook_index if workbook_index is not None else WorkbookIndex(workbook)
 
         self.worksheet = None
         self.open_sheet()
 
+        self.cells_read = 0 # Cells of the timestamp and metric rows visited by get_metric_data
+
         self.quarter_end_dates = quarter_end_dates
 
     def open_sheet(self) -> None:
-        for sheet in self.workbook.worksheets:
-            if self.file_structure_details.metric_sheet_name in sheet[self.file_structure_details.sheet_name_base].value:
-                self.worksheet = sheet
-                break
+        self.worksheet = self.workbook_index.find_sheet(self.file_structure_details.metric_sheet_name, self.file_structure_details.sheet_name_base)
 
         if not self.worksheet:
-            raise Exception(f"Metric sheet not found. {self.file_structure_details.metric_sheet_name} not in cell {self.file_structure_details.sheet_name_base} on any sheet")
+            raise MetricSheetNotFound(self.file_structure_details.metric_sheet_name, self.file_structure_details.sheet_name_base)
 
     def get_company_name(self) -> str:
-        return self.worksheet[self.file_structure_details.company_name_cell].value.split(self.file_structure_details.company_name_separator)[0].strip()
+        return self.workbook_index.get_cell_value(self.worksheet, self.file_structure_details.company_name_cell).split(self.file_structure_details.company_name_separator)[0].strip()
 
     def format_date(self, quarter: int, year: str):
         full_date_str = self.quarter_end_dates[quarter-1] + "-" + year # Offset of -1: quarters 1-4, index 0-3
 
         return datetime.datetime.strptime(full_date_str, "%d-%m-%Y").date()
 
-    def get_metric_data(self) -> pd.Series:
+    def get_metric_data(self, engine: ExtractionEngine=ExtractionEngine.CELLWISE, window: QuarterWindow=None) -> pd.Series:
+        """
+        Args:
+            window (QuarterWindow, optional): Only the quarters in the window are read. The scan of the columns stops as
+                soon as it moves past the window, in the direction of the dates of the style.
+        """
+        if engine == ExtractionEngine.BULK:
+            return self.get_metric_data_bulk(window)
+
         timestamps = []
         metric_values = []
 
@@ -69,17 +117,23 @@ class IMetricFetcher(ABC):
         current_year = None
         quarters_till_next_year = 0
 
-        for col_num in range(col_num, self.worksheet.max_column + 1):
+        # Cells past max_column are empty. Don't read them: openpyxl creates every cell it is asked for, which would grow the
+        # sheet for the next metric extracted from the same workbook
+        max_column = self.worksheet.max_column
+
+        for col_num in range(col_num, max_column + 1):
             col_letter = get_column_letter(col_num)
 
             # Determine the quarter
             year_cell_value = self.worksheet[f"{get_column_letter(col_num)}{row_num_timestamp}"].value
+            self.cells_read += 1 # Also for the columns outside the window, their dates are needed to know where it is
             if year_cell_value != current_year and year_cell_value is not None: # Every time I am on a new year, count how many quarters until the next
                 current_year = year_cell_value
                 quarters_till_next_year = 0
                 # Calculate quarters until next year by comparing the current value against the next 4 which would yield 4 quarters until next year
                 for i in range(1, quarters+1): 
-                    year_cell_value_i = self.worksheet[f"{get_column_letter(col_num+i)}{row_num_timestamp}"].value
+                    year_cell_value_i = self.worksheet[f"{get_column_letter(col_num+i)}{row_num_timestamp}"].value if col_num+i <= max_column else None
+                    self.cells_read += col_num+i <= max_column
                     quarters_till_next_year += 1
                     if not (year_cell_value_i == current_year or year_cell_value_i is None):
                         break
@@ -88,29 +142,117 @@ class IMetricFetcher(ABC):
             timestamp = self.format_date(quarter, current_year.strip())
             quarters_till_next_year -= 1
 
+            if window is not None:
+                if (window.is_before(timestamp) and self.dates_descending) or (window.is_after(timestamp) and not self.dates_descending):
+                    break
+                if window.is_before(timestamp) or window.is_after(timestamp):
+                    continue
+
             timestamps.append(timestamp)
             metric_cell = self.worksheet[f"{col_letter}{row_num_data}"]
+            self.cells_read += 1
             if isinstance(metric_cell.value, str):
                 metric_cell.value = metric_cell.value.strip()
             if metric_cell.value in [None, "-", ""]:
                 metric_values.append(np.NaN)
             else:                                 
-                if metric_cell.number_format == r"[>=100]##,##0.0\%;[<=-100]\-##,##0.0\%;##,##0.0\%" or \
-                   metric_cell.number_format == r"[>=100]##,##0.0\%;[<=-100]-##,##0.0\%;##,##0.0\%":
+                if metric_cell.number_format in PERCENT_NUMBER_FORMATS:
                     metric_values.append(metric_cell.value/100)
                 else:
                     metric_values.append(metric_cell.value)
                 
         return pd.Series(data=metric_values, index=timestamps).astype(float)
 
+    def get_metric_data_bulk(self, window: QuarterWindow=None) -> pd.Series:
+        """ Same output as get_metric_data, but the timestamp and metric rows are read once each and the dates
+        and values are computed for the whole row at once instead of cell by cell. With a window, only the cells of
+        the metric row between the first and the last quarter in the window are read.
+        """
+        [row_num_timestamp, first_col_num] = coordinate_to_tuple(self.file_structure_details.timestamp_coord)
+        row_num_data = self.find_row_with_target_metric()
+
+        # Every metric of the sheet shares the timestamp row, so its dates are computed once per workbook
+        index_key = (self.worksheet.title, row_num_timestamp, first_col_num, type(self), tuple(self.quarter_end_dates))
+        if index_key not in self.workbook_index.quarter_indexes:
+            year_values, _ = self.read_row(row_num_timestamp, first_col_num)
+            self.workbook_index.quarter_indexes[index_key] = self.get_quarter_index(year_values)
+        index = self.workbook_index.quarter_indexes[index_key]
+
+        first_position, n_cols = 0, len(index)
+        if window is not None:
+            positions_in_window = np.flatnonzero(window.contains(index.to_numpy()))
+            if len(positions_in_window) == 0:
+                return pd.Series(data=[], index=index[:0], dtype=float)
+            first_position, n_cols = positions_in_window[0], positions_in_window[-1] - positions_in_window[0] + 1
+            index = index[first_position:first_position + n_cols]
+
+        metric_values, number_formats = self.read_row(row_num_data, first_col_num + first_position, n_cols)
+
+        # Plain lists: a metric row is too short for pandas to pay off
+        metric_values = [value.strip() if isinstance(value, str) else value for value in metric_values]
+        is_blank = np.array([value is None or (isinstance(value, str) and value in ["-", ""]) for value in metric_values], dtype=bool)
+        metric_values = np.array([np.NaN if blank else value for value, blank in zip(metric_values, is_blank)], dtype=float)
+
+        is_percent = np.isin(np.array(number_formats, dtype=object), PERCENT_NUMBER_FORMATS) & ~is_blank
+        metric_values[is_percent] = metric_values[is_percent]/100
+
+        metric_data = pd.Series(data=metric_values, index=index).astype(float)
+        return window.select(metric_data) if window is not None else metric_data
+
+    def read_row(self, row_num: int, first_col_num: int, n_cols: int=None) -> tuple[list, list]:
+        """ Values and number formats of n_cols cells starting at first_col_num. Defaults to reading up to the last column of the sheet.
+        Read only sheets are read whole once and shared by the extractors of every metric, see SheetCells.
+        """
+        if self.workbook.read_only:
+            values, number_formats = self.workbook_index.get_sheet_cells(self.worksheet).get_row(row_num, first_col_num, n_cols)
+        else:
+            max_col_num = first_col_num + n_cols - 1 if n_cols is not None else self.worksheet.max_column
+            [row] = self.worksheet.iter_rows(min_row=row_num, max_row=row_num, min_col=first_col_num, max_col=max_col_num)
+            values, number_formats = [cell.value for cell in row], [cell.number_format for cell in row]
+        self.cells_read += len(values)
+
+        return values, number_formats
+
+    def get_quarter_index(self, year_values: list) -> pd.Index:
+        """ Vectorized version of the date logic of get_metric_data: quarter end dates for a whole timestamp row """
+        quarters = 4
+        years = pd.Series(year_values, dtype=object)
+        n_cols = len(years)
+
+        # A new year starts on every non empty cell that differs from the last non empty one
+        current_years = years.ffill()
+        is_new_year = (years.notna() & (current_years.shift(1) != years)).to_numpy()
+        if n_cols and not is_new_year[0]:
+            raise AttributeError(f"Timestamp row starts with an empty cell in {self.file_structure_details.metric_sheet_name}")
+
+        # Quarters until next year, counted at the start of every year by looking at the next 4 cells. Empty cells count as the same year
+        differs_from_year = np.column_stack([(years.shift(-i).notna() & (years.shift(-i) != years)).to_numpy() for i in range(1, quarters+1)])
+        quarters_till_next_year = np.where(differs_from_year.any(axis=1), differs_from_year.argmax(axis=1) + 1, quarters)
+
+        # Within a year the count goes down by one every column
+        year_starts = np.flatnonzero(is_new_year)
+        year_start_of_col = year_starts[np.cumsum(is_new_year) - 1]
+        quarters_till_next_year = quarters_till_next_year[year_start_of_col] - (np.arange(n_cols) - year_start_of_col)
+
+        quarter = np.asarray(self.calculate_fiscal_quarter(quarters_till_next_year, quarters))
+
+        # Same indexing as self.quarter_end_dates[quarter-1], including its IndexError for quarters out of range
+        day_month = np.array([list(map(int, quarter_end_date.split("-"))) for quarter_end_date in self.quarter_end_dates])
+        day, month = day_month[quarter - 1, 0], day_month[quarter - 1, 1]
+        year = current_years.str.strip().astype(int).to_numpy()
+
+        dates = (year - 1970).astype("datetime64[Y]").astype("datetime64[M]") + (month - 1).astype("timedelta64[M]")
+        dates = dates.astype("datetime64[D]") + (day - 1).astype("timedelta64[D]")
+        if (dates.astype("datetime64[M]").astype(int) % 12 + 1 != month).any(): # Days that don't exist roll over to the next month
+
+            raise ValueError(f"Invalid quarter end date in {self.quarter_end_dates}")
+
+        return pd.Index(dates.astype(object), dtype=object) # datetime.date, like the index built by get_metric_data
+
     def find_row_with_target_metric(self) -> int:
-        row_num_data = 0
-        for cell in self.worksheet['A']:
-            if cell.value is not None and self.file_structure_details.metric_name in cell.value:
-                row_num_data = cell.row
-                break
+        row_num_data = self.workbook_index.find_row(self.worksheet, self.file_structure_details.metric_name)
 
-        if row_num_data == 0:
+        if row_num_data is None:
             raise MetricNotFoundInSheet(self.file_structure_details.metric_name, self.file_structure_details.metric_sheet_name)
 
         return row_num_data
@@ -121,21 +263,25 @@ class IMetricFetcher(ABC):
 
 # TODO: Assess if we need strategy pattern here. Lots or repeated code in the concrete implementations of the interface.
 class MetricFetcherFileStyleA(IMetricFetcher):
+    dates_descending = True
+
     def calculate_fiscal_quarter(self, qs_till_next_year: int, qs_in_year):
         return qs_till_next_year # Date is descending order
 
 class MetricFetcherFileStyleB(IMetricFetcher):
+    dates_descending = False
+
     def calculate_fiscal_quarter(self, qs_till_next_year: int, qs_in_year):
         return qs_in_year - (qs_till_next_year - 1) # If qtny is one, it means we are in q4, so current_quarter = 4 - (1-1) which returns quarter 4 as expected
 
 class MetricFetcherFileStyleFactory:
     @staticmethod
-    def get_extractor(file_style: FileStyle, *extractor_args):
+    def get_extractor(file_style: FileStyle, *extractor_args, **extractor_kwargs):
         match file_style:
             case FileStyle.A:
-                return MetricFetcherFileStyleA(*extractor_args)
+                return MetricFetcherFileStyleA(*extractor_args, **extractor_kwargs)
             case FileStyle.B:
-                return MetricFetcherFileStyleB(*extractor_args)
+                return MetricFetcherFileStyleB(*extractor_args, **extractor_kwargs)
             case _:
                 return None
 
@@ -143,106 +289,594 @@ class MetricFetcherFileStyleFactory:
 class MetricOfCompany:
     company_name: str
     company_ticker: str
-    metric_data: pd.Series
+    metric_data: pd.Series | CompactSeries
 
 def __repr__(self):
         data_status = "Data has been extracted." if not self.metric_data.empty else "Failed to extract data."
         return f"Company: {self.company_name}. {data_status}"
 
+@dataclass
+class ExtractedCompany:
+    """ What was extracted from the workbook of one company. metrics_of_company is {metric: MetricOfCompany | None} """
+    company_ticker: str
+    file_name: str
+    metrics_of_company: dict
+
+def map_bounded(executor: Executor, function, *iterables, max_pending: int) -> Iterator:
+    """ Like executor.map, but only submits up to max_pending tasks ahead of the results that were consumed, so results
+    don't pile up in memory when the consumer is slower than the workers. Results come in submission order.
+    """
+    pending = deque()
+    try:
+        for args in zip(*iterables):
+            pending.append(executor.submit(function, *args))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending: # The consumer stopped early
+            future.cancel()
+
+def extract_metrics_of_company(file_path: str, company_ticker: str, file_style_configs_by_metric: dict,
+                               extraction_engine: ExtractionEngine=ExtractionEngine.CELLWISE, compact_series: bool=False,
+                               window: QuarterWindow=None) -> dict:
+    """ Loads one workbook and extracts every metric in file_style_configs_by_metric from it.
+
+    Args:
+        compact_series (bool, optional): The metric_data of every MetricOfCompany is a CompactSeries instead of a pd.Series.
+        window (QuarterWindow, optional): Only the quarters in the window are extracted.
+
+    Returns:
+        dict: {metric: MetricOfCompany | None}. None when the workbook is incomplete or the metric is not in the target sheet
+    """
+    return extract_metrics_of_company_with_report(file_path, company_ticker, file_style_configs_by_metric, extraction_engine, compact_series, window)[0]
+
+def extract_metrics_of_company_with_report(file_path: str, company_ticker: str, file_style_configs_by_metric: dict,
+                                           extraction_engine: ExtractionEngine=ExtractionEngine.CELLWISE,
+                                           compact_series: bool=False, window: QuarterWindow=None) -> tuple[dict, FileReport]:
+    """ Same as extract_metrics_of_company, plus the FileReport with the time of every stage and why metrics are missing.
+    Module level so it can be shipped to the worker processes of MetricsFetcher.
+    """
+    file_report = FileReport(os.path.basename(file_path), company_ticker)
+
+    # The sheet count and the cells that identify the style are read straight from the zip, so incomplete workbooks
+    # are never loaded and the style is known before loading
+    start = time.perf_counter()
+    prescan = prescan_workbook(file_path, get_style_cells(file_style_configs_by_metric))
+    file_styles = {} # All metrics usually share the cells that identify the style, so determine it once per set of cells
+    if not prescan.is_incomplete:
+        for file_style_configs in file_style_configs_by_metric.values():
+            style_cells = _get_style_cells_key(file_style_configs)
+            if style_cells not in file_styles:
+                file_styles[style_cells] = prescan.get_file_style(file_style_configs) # None when no style matches
+    file_report.stage_times["prescan"] += time.perf_counter() - start
+
+    # Workbooks with less than 4 sheets are worthless to us
+    if prescan.is_incomplete:
+        file_report.failures = dict.fromkeys(file_style_configs_by_metric, FailureReason.INCOMPLETE_WORKBOOK)
+        return {metric: None for metric in file_style_configs_by_metric}, file_report
+
+    # The bulk engine only reads rows, so the workbook can be streamed instead of fully loaded, and only the sheets that are read get parsed
+    start = time.perf_counter()
+    workbook = opx.load_workbook(file_path, read_only=extraction_engine == ExtractionEngine.BULK)
+    file_report.stage_times["load"] += time.perf_counter() - start
+    if workbook.read_only:
+        sheet_bytes_counter = SheetBytesCounter.install(workbook)
+    else: # Every sheet was parsed whole by load_workbook
+        with zipfile.ZipFile(file_path) as archive:
+            file_report.bytes_read = sum(info.file_size for info in archive.infolist()
+                                         if info.filename.startswith(SheetBytesCounter.SHEETS_PATH) and info.filename.endswith(".xml"))
+    try:
+        return _extract_metrics_from_workbook(workbook, company_ticker, file_style_configs_by_metric, extraction_engine, file_report,
+                                              file_styles, compact_series, window), file_report
+    finally:
+        if workbook.read_only:
+            file_report.bytes_read = sheet_bytes_counter.bytes_read
+        workbook.close() # Read only workbooks keep the file open until closed
+
+def _get_style_cells_key(file_style_configs: dict) -> tuple:
+    return tuple((style, details.sheet_name_base, details.sheet_name_compare) for style, details in file_style_configs.items())
+
+def _extract_metrics_from_workbook(workbook: opx.Workbook, company_ticker: str, file_style_configs_by_metric: dict,
+                                   extraction_engine: ExtractionEngine, file_report: FileReport, file_styles: dict=None,
+                                   compact_series: bool=False, window: QuarterWindow=None) -> dict:
+    """
+    Args:
+        file_styles (dict, optional): {style cells key: FileStyle} already known, e.g. from the prescan of the workbook
+    """
+    # Workbooks with less than 4 sheets are worthless to us
+    if (len(workbook.worksheets) < 4):
+        file_report.failures = dict.fromkeys(file_style_configs_by_metric, FailureReason.INCOMPLETE_WORKBOOK)
+        return {metric: None for metric in file_style_configs_by_metric}
+
+    workbook_index = WorkbookIndex(workbook) # Shared by the extractors of every metric, so each sheet and row lookup is only done once
+    file_styles = dict(file_styles) if file_styles is not None else {} # All metrics usually share the cells that identify the style, so determine it once per set of cells
+    metrics_of_company = {}
+    for metric, file_style_configs in file_style_configs_by_metric.items():
+        start = time.perf_counter()
+        style_cells = _get_style_cells_key(file_style_configs)
+        if style_cells not in file_styles:
+            try:
+                file_styles[style_cells] = FileStyleManager(file_style_configs).determine_file_style(workbook)
+            except FileStyleNotRecognized:
+                file_styles[style_cells] = None
+
+        file_style = file_styles[style_cells]
+        file_report.stage_times["style"] += time.perf_counter() - start
+        if file_style is None:
+            file_report.failures[metric] = FailureReason.UNRECOGNIZED_STYLE
+            metrics_of_company[metric] = None
+            continue
+
+        start = time.perf_counter()
+        try:
+            extractor = MetricFetcherFileStyleFactory.get_extractor(file_style, workbook, file_style_configs[file_style], workbook_index=workbook_index)
+        except MetricSheetNotFound:
+            file_report.stage_times["find_sheet"] += time.perf_counter() - start
+            file_report.failures[metric] = FailureReason.SHEET_NOT_FOUND
+            metrics_of_company[metric] = None
+            continue
+
+        company_name = extractor.get_company_name()
+        file_report.stage_times["find_sheet"] += time.perf_counter() - start
+        try:
+            # The row lookup is cached by workbook_index, so get_metric_data doesn't look it up again
+            start = time.perf_counter()
+            extractor.find_row_with_target_metric()
+            file_report.stage_times["find_row"] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            metric_data = extractor.get_metric_data(extraction_engine, window).rename(company_ticker) # Give the pd.Series a name, this will later be the name of the col
+            if compact_series:
+                metric_data = CompactSeries.from_series(metric_data)
+            file_report.stage_times["read_cells"] += time.perf_counter() - start
+        except MetricNotFoundInSheet as e:
+            # print(str(e))
+            file_report.stage_times["find_row"] += time.perf_counter() - start
+            file_report.cells_read += extractor.cells_read
+            file_report.failures[metric] = FailureReason.METRIC_NOT_FOUND
+            metrics_of_company[metric] = None
+            continue
+
+        file_report.cells_read += extractor.cells_read
+        metrics_of_company[metric] = MetricOfCompany(company_name, company_ticker, metric_data)
+
+    return metrics_of_company
+
 class MetricsFetcher:
-    def __init__(self, data_folder_path : str, file_style_configs_by_metrics : dict):
+    def __init__(self, data_folder_path : str, file_style_configs_by_metrics : dict, n_workers : int = 1,
+                 extraction_engine : ExtractionEngine = ExtractionEngine.CELLWISE,
+                 duplicate_quarters : DuplicateQuarters = DuplicateQuarters.FIRST,
+                 panel_storage : PanelStorage = PanelStorage.PICKLE,
+                 report : bool = False, report_hooks : list[ExtractionHook] = None, show_progress : bool = True,
+                 compact_series : bool = False):
+        """
+        Args:
+            n_workers (int, optional): Number of processes used to load the workbooks. 1 (default) loads them serially in this process.
+            extraction_engine (ExtractionEngine, optional): How the cells of the metric are read. Both engines return the same data.
+            duplicate_quarters (DuplicateQuarters, optional): Value kept in the panel when a company has the same quarter more than once.
+            panel_storage (PanelStorage, optional): Format of the panels saved by fetch. Use load_panel to read them back.
+            report (bool, optional): Keep an ExtractionReport of every run in self.extraction_report, with the time of every
+                stage of every workbook and why metrics are missing. Only the workbooks extracted in the run are reported,
+                not the ones fetch_many takes from the cache.
+            report_hooks (list[ExtractionHook], optional): Receive the reports as they are made. Implies report.
+            show_progress (bool, optional): Show the progress bar and print the extraction summary of every metric.
+            compact_series (bool, optional): Keep the extracted series as CompactSeries, arrays of days and values, instead of
+                pd.Series of date objects. Takes a fraction of the memory, also in the cache, and gives the same panels.
+        """
         self.data_folder_path = data_folder_path
-        self.file_names = os.listdir(self.data_folder_path)
 
         self.file_style_configs_by_metrics = file_style_configs_by_metrics
+        self.n_workers = n_workers
+        self.extraction_engine = extraction_engine
+        self.panel_assembler = PanelAssembler(duplicate_quarters)
+        self.panel_storage = panel_storage
+        self.report_hooks = report_hooks if report_hooks is not None else []
+        self.report = report or bool(self.report_hooks)
+        self.show_progress = show_progress
+        self.compact_series = compact_series
 
         # Status of last extraction
         self.extracted_data = None
         self.companies_successfully_extracted = 0
         self.companies_with_not_enough_data = []
+        self.cache_stats = {} # {metric: CacheStats} of the last fetch
+        self.extraction_report = None # ExtractionReport of the last run, when report is on
 
     def _load_from_pickle_file(self, full_file_path) -> pd.DataFrame:
         with open(full_file_path, "rb") as infile:
             metric_df = pickle.load(infile)
             return metric_df
     
-    def _load_from_excel_file(self, metric: str, data_frequency: FrequencyOfData=FrequencyOfData.QUARTERLY):
-        file_style_configs = self.file_style_configs_by_metrics[metric]
-        style_manager = FileStyleManager(file_style_configs)
-        
-        progress_bar = tqdm(total=int(len(self.file_names)/2), position=0, leave=True) # int() to dispaly x/int instead of x/float. Magic number 2 represents that almost all compnies only have 2 files
-        metrics_of_companies = []
-        for file_name in self.file_names:
+    @property
+    def file_names(self) -> list[str]:
+        """ Files in the data folder right now. Listed on every access, so workbooks added or removed after the fetcher was made are seen """
+        return os.listdir(self.data_folder_path)
+
+    def _get_company_files(self, data_frequency: FrequencyOfData, tickers: list[str]=None, file_names: list[str]=None) -> list[tuple[str, str]]:
+        """ (company_ticker, file_name) of every file in the data folder with the requested frequency, in folder order.
+        Only the files of tickers when given.
+
+        Args:
+            file_names (list[str], optional): Files of the folder, when already listed. Defaults to listing it.
+        """
+        tickers = set(map(str.upper, tickers)) if tickers is not None else None
+        company_files = []
+        for file_name in file_names if file_names is not None else self.file_names:
             # Remove the extension of the file, get only the name of the company and the frequency of the data in caps and discard the rest
             [company_ticker, frequency, *_] = list(map(str.upper, file_name.split(".")[0].split("_")))
 
-            if frequency != data_frequency.name:
-                continue
+            if frequency == data_frequency.name and (tickers is None or company_ticker in tickers):
+                company_files.append((company_ticker, file_name))
 
-            progress_bar.set_description(f"Processing {company_ticker}")
-            progress_bar.update(1)
+        return company_files
 
-            workbook = opx.load_workbook(os.path.join(self.data_folder_path, file_name))
+    def _load_from_excel_file(self, metric: str, data_frequency: FrequencyOfData=FrequencyOfData.QUARTERLY):
+        self._load_from_excel_files([metric], data_frequency)
+
+    def _load_from_excel_files(self, metrics: list[str], data_frequency: FrequencyOfData=FrequencyOfData.QUARTERLY) -> dict:
+        """ Opens every workbook once and extracts all the metrics from it.
+        The extraction status attributes end up describing the last metric in metrics, as if they had been extracted one after the other.
+
+        Returns:
+            dict: {metric: list of MetricOfCompany}
+        """
+        company_files = self._get_company_files(data_frequency)
+        self._start_report(metrics)
+
+        metrics_of_companies = {metric: [] for metric in metrics}
+        companies_with_not_enough_data = {metric: [] for metric in metrics}
+        for (company_ticker, _), metrics_of_company in zip(company_files, self._extract_files(company_files, repeat(metrics))):
+            for metric, metric_of_company in metrics_of_company.items():
+                if metric_of_company is None:
+                    companies_with_not_enough_data[metric].append(company_ticker)
+                else:
+                    metrics_of_companies[metric].append(metric_of_company)
 
-            # Workbooks with less than 4 sheets are worthless to us
-            if (len(workbook.worksheets) < 4):
-                self.companies_with_not_enough_data.append(company_ticker)
-                continue
-        
-            file_style = style_manager.determine_file_style(workbook)
-            extractor = MetricFetcherFileStyleFactory.get_extractor(file_style, workbook, file_style_configs[file_style])
-            
-            if not extractor:
-                raise Exception("Unrecognized file style")
-
-            company_name = extractor.get_company_name()
-            try:
-                metric_data = extractor.get_metric_data().rename(company_ticker) # Give the pd.Series a name, this will later be the name of the col
-            except MetricNotFoundInSheet as e:
-                # print(str(e))
-                self.companies_with_not_enough_data.append(company_ticker)
-                continue
+        for metric in metrics:
+            self._set_extraction_status(metric, metrics_of_companies[metric], companies_with_not_enough_data[metric])
+        self._finish_report()
+
+        return metrics_of_companies
+
+    def _extract_files(self, company_files: list[tuple[str, str]], metrics_by_file, windows_by_file=None):
+        """ Yields the {metric: MetricOfCompany | None} of every file in company_files, in order.
+        metrics_by_file is an iterable with the metrics to extract from each file, windows_by_file one with the
+        QuarterWindow of each file, the full history by default.
+        """
+        if not company_files:
+            return
+
+        company_tickers = [company_ticker for company_ticker, _ in company_files]
+        file_paths = [os.path.join(self.data_folder_path, file_name) for _, file_name in company_files]
+        file_style_configs = [{metric: self.file_style_configs_by_metrics[metric] for metric in metrics} for _, metrics in zip(company_files, metrics_by_file)]
+
+        progress_bar = tqdm(total=len(company_files), position=0, leave=True, disable=not self.show_progress)
+        with ProcessPoolExecutor(max_workers=self.n_workers) if self.n_workers > 1 else nullcontext() as executor:
+            # Both maps return results in submission order, so the order of the companies doesn't depend on the number of workers
+            mapper = partial(map_bounded, executor, max_pending=self.max_pending_files) if executor else map
+            results = mapper(extract_metrics_of_company_with_report, file_paths, company_tickers, file_style_configs, repeat(self.extraction_engine),
+                             repeat(self.compact_series), windows_by_file if windows_by_file is not None else repeat(None))
+
+            for company_ticker, (metrics_of_company, file_report) in zip(company_tickers, results):
+                yield self._process_file_result(company_ticker, metrics_of_company, file_report, progress_bar)
+
+        progress_bar.close()
 
-            metrics_of_companies.append(MetricOfCompany(company_name, company_ticker, metric_data))
+    def _process_file_result(self, company_ticker: str, metrics_of_company: dict, file_report: FileReport, progress_bar: tqdm) -> dict:
+        progress_bar.set_description(f"Processing {company_ticker}")
+        progress_bar.update(1)
+        self._add_to_report(file_report)
+
+        return metrics_of_company
+
+    @property
+    def max_pending_files(self) -> int:
+        """ Workbooks extracted ahead of the consumer: enough to keep every worker busy, few enough to keep memory flat """
+        return 2*self.n_workers
+
+    def iter_companies(self, metrics: list[str], data_frequency: FrequencyOfData=FrequencyOfData.QUARTERLY) -> Iterator[ExtractedCompany]:
+        """ Yields what was extracted from every workbook as soon as it is extracted, in folder order, without keeping
+        anything: every workbook is closed right after its metrics are read, and at most max_pending_files results wait
+        to be consumed, so memory doesn't grow with the size of the folder.
+
+        Nothing is cached and the extraction status attributes are not set. The report, when on, is finished once the
+        generator is exhausted.
+        """
+        company_files = self._get_company_files(data_frequency)
+        self._start_report(metrics)
+        for (company_ticker, file_name), metrics_of_company in zip(company_files, self._extract_files(company_files, repeat(metrics))):
+            yield ExtractedCompany(company_ticker, file_name, metrics_of_company)
+
+        self._finish_report()
+
+    async def aiter_companies(self, metrics: list[str], data_frequency: FrequencyOfData=FrequencyOfData.QUARTERLY) -> AsyncIterator[ExtractedCompany]:
+        """ Same as iter_companies for asyncio code. The workbooks are extracted in an executor, a process pool with
+        n_workers > 1 and a single thread otherwise, so the event loop is never blocked by the extraction.
+        """
+        company_files = self._get_company_files(data_frequency)
+        self._start_report(metrics)
+        file_style_configs = {metric: self.file_style_configs_by_metrics[metric] for metric in metrics}
+
+        loop = asyncio.get_running_loop()
+        progress_bar = tqdm(total=len(company_files), position=0, leave=True, disable=not self.show_progress)
+        with ProcessPoolExecutor(max_workers=self.n_workers) if self.n_workers > 1 else ThreadPoolExecutor(max_workers=1) as executor:
+            pending = deque()
+            try:
+                for i, (company_ticker, file_name) in enumerate(company_files):
+                    pending.append(loop.run_in_executor(executor, extract_metrics_of_company_with_report, os.path.join(self.data_folder_path, file_name),
+                                                        company_ticker, file_style_configs, self.extraction_engine, self.compact_series))
+
+                    # Same window as map_bounded: wait for the oldest file once max_pending_files are in flight or all are submitted
+                    while pending and (len(pending) >= self.max_pending_files or i == len(company_files) - 1):
+                        done_company_ticker, done_file_name = company_files[i - len(pending) + 1]
+                        metrics_of_company, file_report = await pending.popleft()
+                        yield ExtractedCompany(done_company_ticker, done_file_name,
+                                               self._process_file_result(done_company_ticker, metrics_of_company, file_report, progress_bar))
+            finally:
+                for future in pending:
+                    future.cancel()
 
         progress_bar.close()
+        self._finish_report()
+
+    def _start_report(self, metrics: list[str]) -> None:
+        self.extraction_report = ExtractionReport(list(metrics)) if self.report else None
+
+    def _add_to_report(self, file_report: FileReport) -> None:
+        if self.extraction_report is None:
+            return
+
+        self.extraction_report.file_reports.append(file_report)
+        for report_hook in self.report_hooks:
+            report_hook.on_file(file_report)
 
+    def _finish_report(self) -> None:
+        if self.extraction_report is None:
+            return
+
+        for report_hook in self.report_hooks:
+            report_hook.on_report(self.extraction_report)
+
+    def _set_extraction_status(self, metric: str, metrics_of_companies: list, companies_with_not_enough_data: list) -> None:
+        self.companies_with_not_enough_data = companies_with_not_enough_data
         self.companies_successfully_extracted = len(metrics_of_companies)
-        self.print_extraction_summary()
-        
+        if self.show_progress:
+            self.print_extraction_summary(metric)
+
         self.extracted_data = metrics_of_companies.copy()
 
     def _save_metric_data(self, full_file_path: str, data: pd.DataFrame):
         with open(full_file_path, "wb") as outfile:
             pickle.dump(data, outfile)
 
+    def _get_pickled_data_file_path(self, pickled_data_path: str, metric: str) -> str:
+        return os.path.join(pickled_data_path, f"{metric}_data.pickle") # TODO: move this configuration to a file in its corresponding folder inside or src
+
+    def _get_panel_store(self, pickled_data_path: str, metric: str) -> ColumnarPanelStore:
+        return ColumnarPanelStore(os.path.join(pickled_data_path, f"{metric}_panel"))
+
+    def _save_panel(self, pickled_data_path: str, metric: str, panel: pd.DataFrame) -> None:
+        if self.panel_storage == PanelStorage.COLUMNAR:
+            self._get_panel_store(pickled_data_path, metric).save(panel)
+        else:
+            self._save_metric_data(self._get_pickled_data_file_path(pickled_data_path, metric), panel)
+
+    def load_panel(self,
+                   metric: str,
+                   pickled_data_path: str=os.path.join("..", "..", "data", "pickled_data"),
+                   tickers: list[str]=None, start=None, end=None) -> pd.DataFrame:
+        """ Panel saved by the last fetch of metric, without extracting anything. With PanelStorage.COLUMNAR only the
+        selected tickers and quarters are read, see ColumnarPanelStore.load for the arguments. The pickled panel is read
+        whole and then sliced.
+        """
+        if self.panel_storage == PanelStorage.COLUMNAR:
+            return self._get_panel_store(pickled_data_path, metric).load(tickers, start, end)
+
+        panel = self._load_from_pickle_file(self._get_pickled_data_file_path(pickled_data_path, metric))
+        if tickers is not None:
+            panel = panel[tickers]
+        if (start is not None or end is not None) and not panel.empty:
+            quarters = pd.to_datetime(panel.index.to_timestamp(how="end") if isinstance(panel.index, pd.PeriodIndex) else panel.index).normalize()
+            is_selected = np.ones(len(panel), dtype=bool)
+            if start is not None:
+                is_selected &= quarters >= pd.Period(start, freq="Q").start_time
+            if end is not None:
+                is_selected &= quarters <= pd.Period(end, freq="Q").end_time
+            panel = panel[is_selected]
+
+        return panel
+
+    def _get_manifest_file_path(self, pickled_data_path: str, metric: str, data_frequency: FrequencyOfData) -> str:
+        return os.path.join(pickled_data_path, f"{metric}_{data_frequency.name.lower()}_manifest.pickle")
+
     def fetch(self,
               metric: str,
               pickled_data_path: str=os.path.join("..", "..", "data", "pickled_data"),
-              data_frequency: FrequencyOfData=FrequencyOfData.QUARTERLY):
-        
-        pickled_data_file_path = os.path.join(pickled_data_path, f"{metric}_data.pickle") # TODO: move this configuration to a file in its corresponding folder inside or src
-        try:
-            metric_df = self._load_from_pickle_file(pickled_data_file_path)
-        except FileNotFoundError:
-            self._load_from_excel_file(metric, data_frequency)
-            metric_df = self.get_dataframe()
-        # TODO: Remove the need to pass the data to _save_metric_data by, perhaps, saving self.extracted_data instead of what returns self.get_dataframe()
-        self._save_metric_data(pickled_data_file_path, metric_df)
-        return metric_df
-
-    def print_extraction_summary(self) -> None:
-        summary_str = f"Successfully extracted data for {self.companies_successfully_extracted}. "
+              data_frequency: FrequencyOfData=FrequencyOfData.QUARTERLY,
+              tickers: list[str]=None, start=None, end=None):
+        return self.fetch_many([metric], pickled_data_path, data_frequency, tickers, start, end)[metric]
+
+    def fetch_many(self,
+                   metrics: list[str],
+                   pickled_data_path: str=os.path.join("..", "..", "data", "pickled_data"),
+                   data_frequency: FrequencyOfData=FrequencyOfData.QUARTERLY,
+                   tickers: list[str]=None, start=None, end=None) -> dict:
+        """ Same as fetch but for several metrics.
+
+        The data of every workbook is cached per metric in a manifest (see MetricCache). Only the workbooks that are
+        new or changed since the last fetch are loaded, once for all the metrics that need them, and the panels are
+        rebuilt from the cached pieces. Hits and misses are left in self.cache_stats.
+
+        With PanelStorage.COLUMNAR, a metric whose saved panel was built from the files currently in the folder is read
+        straight from the memory mapped panel, only the selected tickers and quarters, without loading its manifest.
+        self.extracted_data is None for those metrics, as no MetricOfCompany is loaded.
+
+        Args:
+            tickers (list[str], optional): Only the workbooks of these companies are read, picked by file name before loading anything.
+            start, end (optional): First and last quarter, as anything pd.Period understands ("2000Q1", "2000", a date, ...).
+                Only the cells of these quarters are read. The cache keeps the quarters extracted for every workbook, so any
+                request within them is served from the cache, and a wider request extracts the union of both.
+
+        Returns:
+            dict: {metric: pd.DataFrame}, one panel per metric. Panels of a subset of the tickers or quarters are not saved,
+                so the saved panels always hold every company and quarter.
+        """
+        # The folder is listed on every fetch, so the manifest sees the workbooks added and removed since the last one
+        file_names = self.file_names
+        self._start_report(metrics)
+
+        metric_dfs = {}
+        if self.panel_storage == PanelStorage.COLUMNAR:
+            folder_company_files = self._get_company_files(data_frequency, file_names=file_names)
+            for metric in metrics:
+                panel = self._load_current_panel(pickled_data_path, metric, self._get_panel_sources(metric, data_frequency, folder_company_files),
+                                                 folder_company_files, tickers, start, end)
+                if panel is not None:
+                    metric_dfs[metric] = panel
+
+        metric_dfs.update(self._fetch_through_manifests([metric for metric in metrics if metric not in metric_dfs], pickled_data_path,
+                                                        data_frequency, file_names, tickers, start, end))
+        self._finish_report()
+
+        return {metric: metric_dfs[metric] for metric in metrics}
+
+    def _get_panel_sources(self, metric: str, data_frequency: FrequencyOfData, company_files: list[tuple[str, str]]) -> dict:
+        """ What a panel is built from: the size and mtime of every file, the configuration of the metric and how the panel is assembled """
+        files = {}
+        for _, file_name in company_files:
+            try:
+                file_stat = os.stat(os.path.join(self.data_folder_path, file_name))
+            except FileNotFoundError: # Removed after the folder was listed
+                continue
+            files[file_name] = (file_stat.st_size, file_stat.st_mtime_ns)
+
+        return {"data_frequency": data_frequency, "duplicate_quarters": self.panel_assembler.duplicate_quarters,
+                "file_style_configs": self.file_style_configs_by_metrics[metric], "files": files}
+
+    def _save_panel_sources(self, pickled_data_path: str, metric: str, panel_sources: dict, panel: pd.DataFrame, cache_entries: list) -> None:
+        """ Saved next to a columnar panel, so the next fetch knows whether the panel is current without loading the manifest.
+        The first and last quarter of every company let a subset of the tickers drop the quarters none of them reports, like
+        the panel assembled from their series. They are None when a company skips quarters of the panel.
+        """
+        quarter_days = np.array(panel.index, dtype="datetime64[D]") if len(panel.index) else np.array([], dtype="datetime64[D]")
+        quarter_ranges = {}
+        for entry in cache_entries:
+            if entry.extracted_data is None:
+                continue
+            metric_data = entry.extracted_data.metric_data
+            days = metric_data.days.astype("datetime64[D]") if isinstance(metric_data, CompactSeries) else np.array(metric_data.index, dtype="datetime64[D]")
+            if len(days) == 0:
+                continue
+            first_day, last_day = days.min(), days.max()
+            if ((quarter_days >= first_day) & (quarter_days <= last_day)).sum() != len(np.unique(days)):
+                quarter_ranges = None
+                break
+            quarter_ranges[entry.company_ticker] = (first_day, last_day)
+
+        self._get_panel_store(pickled_data_path, metric).save_sources({
+            "sources": panel_sources, "n_quarters": len(panel.index), "quarter_ranges": quarter_ranges,
+            "companies_with_not_enough_data": [entry.company_ticker for entry in cache_entries if entry.extracted_data is None]})
+
+    def _load_current_panel(self, pickled_data_path: str, metric: str, panel_sources: dict, company_files: list[tuple[str, str]],
+                            tickers: list[str]=None, start=None, end=None) -> pd.DataFrame | None:
+        """ The requested part of the saved columnar panel, None when it is missing or wasn't built from panel_sources """
+        panel_store = self._get_panel_store(pickled_data_path, metric)
+        saved_sources = panel_store.load_sources()
+        if saved_sources is None or saved_sources["sources"] != panel_sources or not panel_store.exists() or len(panel_store.load_quarters()) != saved_sources["n_quarters"]:
+            return None
+        if tickers is not None and saved_sources["quarter_ranges"] is None:
+            return None
+
+        requested_tickers = set(map(str.upper, tickers)) if tickers is not None else None
+        is_requested = lambda company_ticker: requested_tickers is None or company_ticker in requested_tickers
+        selected_tickers = [ticker for ticker in panel_store.get_tickers() if is_requested(ticker)] if tickers is not None else None
+        if selected_tickers == []:
+            return None # The manifests give the same empty panel as get_dataframe
+        panel = panel_store.load(selected_tickers, start, end)
+        if tickers is not None and len(panel.index):
+            quarter_days = np.array(panel.index, dtype="datetime64[D]")
+            is_reported = np.zeros(len(panel.index), dtype=bool)
+            for company_ticker in panel.columns:
+                first_day, last_day = saved_sources["quarter_ranges"][company_ticker]
+                is_reported |= (quarter_days >= first_day) & (quarter_days <= last_day)
+            panel = panel[is_reported]
+
+        self.cache_stats[metric] = CacheStats(hits=sum(is_requested(company_ticker) for company_ticker, _ in company_files))
+        self.companies_with_not_enough_data = [company_ticker for company_ticker in saved_sources["companies_with_not_enough_data"] if is_requested(company_ticker)]
+        self.companies_successfully_extracted = len(panel.columns)
+        self.extracted_data = None
+        if self.show_progress:
+            self.print_extraction_summary(metric)
+
+        return panel
+
+    def _fetch_through_manifests(self, metrics: list[str], pickled_data_path: str, data_frequency: FrequencyOfData, file_names: list[str],
+                                 tickers: list[str]=None, start=None, end=None) -> dict:
+        """ Panels of fetch_many rebuilt from the manifests of the metrics, extracting the workbooks that are new or changed """
+        if not metrics:
+            return {}
+
+        company_files = self._get_company_files(data_frequency, tickers, file_names)
+        window = QuarterWindow.from_quarters(start, end)
+        file_paths = {file_name: os.path.join(self.data_folder_path, file_name) for _, file_name in company_files}
+        folder_company_files = self._get_company_files(data_frequency, file_names=file_names)
+        folder_file_names = [file_name for _, file_name in folder_company_files]
+
+        metric_caches = {metric: MetricCache(self._get_manifest_file_path(pickled_data_path, metric, data_frequency),
+                                             self.file_style_configs_by_metrics[metric]) for metric in metrics}
+        stale_files = {metric: metric_cache.refresh(file_paths, window, folder_file_names) for metric, metric_cache in metric_caches.items()}
+        self.cache_stats.update({metric: metric_cache.stats for metric, metric_cache in metric_caches.items()})
+
+        # Every stale workbook is loaded once for all the metrics that need it, for the quarters that all of them need
+        metrics_by_file = {file_name: [metric for metric in metrics if file_name in stale_files[metric]] for _, file_name in company_files}
+        files_to_extract = [(company_ticker, file_name) for company_ticker, file_name in company_files if metrics_by_file[file_name]]
+        extraction_windows = {file_name: window for _, file_name in files_to_extract}
+        for _, file_name in files_to_extract:
+            for metric in metrics_by_file[file_name]:
+                extraction_windows[file_name] = metric_caches[metric].get_extraction_window(file_name, stale_files[metric][file_name], extraction_windows[file_name])
+
+        extracted_files = self._extract_files(files_to_extract, [metrics_by_file[file_name] for _, file_name in files_to_extract],
+                                              [extraction_windows[file_name] for _, file_name in files_to_extract])
+        for (company_ticker, file_name), metrics_of_company in zip(files_to_extract, extracted_files):
+            for metric, metric_of_company in metrics_of_company.items():
+                metric_caches[metric].update(file_name, stale_files[metric][file_name], company_ticker, metric_of_company, extraction_windows[file_name])
+
+        metric_dfs = {}
+        for metric, metric_cache in metric_caches.items():
+            metric_cache.save()
+
+            # Cached entries can hold more quarters than requested
+            cache_entries = [metric_cache.entries[file_name] for _, file_name in company_files]
+            self._set_extraction_status(metric,
+                                        [MetricOfCompany(entry.extracted_data.company_name, entry.extracted_data.company_ticker,
+                                                         window.select(entry.extracted_data.metric_data))
+                                         for entry in cache_entries if entry.extracted_data is not None],
+                                        [entry.company_ticker for entry in cache_entries if entry.extracted_data is None])
+            metric_dfs[metric] = self.get_dataframe()
+
+            # The panel is still saved for the notebooks that read it directly
+            if tickers is None and window.is_full:
+                self._save_panel(pickled_data_path, metric, metric_dfs[metric])
+                if self.panel_storage == PanelStorage.COLUMNAR:
+                    self._save_panel_sources(pickled_data_path, metric, self._get_panel_sources(metric, data_frequency, folder_company_files),
+                                             metric_dfs[metric], cache_entries)
+
+        return metric_dfs
+
+    def print_extraction_summary(self, metric: str=None) -> None:
+        summary_str = f"{metric}. " if metric else ""
+        summary_str += f"Successfully extracted data for {self.companies_successfully_extracted}. "
         summary_str += f"{self.companies_with_not_enough_data} companies ignored, corresponding workbook incomplete or metric not found in target sheet." if len(self.companies_with_not_enough_data) > 0 else ""
         print(summary_str)
 
-    def get_dataframe(self) -> pd.DataFrame:
-        merged = pd.DataFrame()
+    def get_dataframe(self, metrics_of_companies: list=None) -> pd.DataFrame:
+        """ Panel with one column per company. Defaults to the data of the last extraction """
+        metrics_of_companies = self.extracted_data if metrics_of_companies is None else metrics_of_companies
 
-        for metric_object in self.extracted_data:
-            merged = pd.merge(merged, metric_object.metric_data, how='outer', left_index=True, right_index=True)
-        
-        return merged.copy()
+        return self.panel_assembler.assemble([metric_object.metric_data for metric_object in metrics_of_companies])
 
 def main():
     # extractor = MetricsExtractor("companies_data", file_style_configs_by_metric)
@@ -0,0 +1,84 @@
+""" Assembly of the per company metric series into a single panel """
+from enum import Enum
+
+import numpy as np
+import pandas as pd
+
+from .metric_series import CompactSeries, days_to_dates
+
+
+class DuplicateQuarters(Enum):
+    """ What to keep when a company has the same quarter more than once, e.g. a header with 5 columns for one year """
+    FIRST = 1 # Value of the first column of the sheet with that quarter
+    LAST = 2
+    MEAN = 3 # Mean of the non NaN values
+    RAISE = 4
+
+
+class DuplicateQuartersFound(Exception):
+    def __init__(self, company_tickers: list):
+        self.company_tickers = company_tickers
+
+    def __str__(self):
+        return(repr(f"Companies with duplicated quarters: {self.company_tickers}."))
+
+
+class PanelAssembler:
+    """
+    Aligns many series onto the sorted union of their indexes in one pass, filling a preallocated 2-D float array.
+    Equivalent to chaining pd.merge(how="outer") over the series, without copying the growing frame on every merge.
+
+    Lists of CompactSeries are aligned on their integer days, which is faster than on date objects, and give the same panel.
+    """
+    def __init__(self, duplicate_quarters: DuplicateQuarters = DuplicateQuarters.FIRST):
+        self.duplicate_quarters = duplicate_quarters
+
+        # Status of last assembly
+        self.companies_with_duplicate_quarters = []
+
+    def assemble(self, series_list: list[pd.Series | CompactSeries]) -> pd.DataFrame:
+        self.companies_with_duplicate_quarters = []
+        if not series_list:
+            return pd.DataFrame()
+
+        n_companies = len(series_list)
+        lengths = np.array([len(series) for series in series_list])
+        is_compact = all(isinstance(series, CompactSeries) for series in series_list)
+        if is_compact:
+            all_quarters = np.concatenate([series.days for series in series_list])
+            all_values = np.concatenate([series.values for series in series_list]).astype(float)
+        else:
+            series_list = [series.to_series() if isinstance(series, CompactSeries) else series for series in series_list]
+            all_quarters = np.concatenate([series.index.to_numpy() for series in series_list])
+            all_values = np.concatenate([series.to_numpy(dtype=float) for series in series_list])
+
+        # Row of every value in the union index and column of the company it belongs to
+        row_nums, quarters = pd.factorize(all_quarters, sort=True)
+        col_nums = np.repeat(np.arange(n_companies), lengths)
+        cell_nums = row_nums * n_companies + col_nums
+
+        values = np.full(len(quarters) * n_companies, np.NaN)
+        unique_cell_nums, first_positions, counts = np.unique(cell_nums, return_index=True, return_counts=True)
+        if (counts > 1).any():
+            companies_with_duplicates = np.unique(unique_cell_nums[counts > 1] % n_companies)
+            self.companies_with_duplicate_quarters = [series_list[col_num].name for col_num in companies_with_duplicates]
+
+            if self.duplicate_quarters == DuplicateQuarters.RAISE:
+                raise DuplicateQuartersFound(self.companies_with_duplicate_quarters)
+
+        match self.duplicate_quarters:
+            case DuplicateQuarters.LAST:
+                _, last_positions_reversed = np.unique(cell_nums[::-1], return_index=True)
+                last_positions = len(cell_nums) - 1 - last_positions_reversed
+                values[cell_nums[last_positions]] = all_values[last_positions]
+            case DuplicateQuarters.MEAN:
+                is_value = ~np.isnan(all_values)
+                sums = np.bincount(cell_nums, weights=np.where(is_value, all_values, 0), minlength=len(values))
+                value_counts = np.bincount(cell_nums, weights=is_value, minlength=len(values))
+                np.divide(sums, value_counts, out=values, where=value_counts > 0)
+            case _:
+                values[cell_nums[first_positions]] = all_values[first_positions]
+
+        return pd.DataFrame(values.reshape(len(quarters), n_companies),
+                            index=pd.Index(days_to_dates(quarters), dtype=object) if is_compact else pd.Index(quarters, dtype=all_quarters.dtype),
+                            columns=[series.name for series in series_list])
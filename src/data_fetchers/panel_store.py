@@ -0,0 +1,230 @@
+""" Columnar on disk format for metric panels, read through memory maps so only the selected tickers and quarters are loaded """
+from enum import Enum
+import datetime
+import json
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+
+class PanelStorage(Enum):
+    """ How MetricsFetcher saves the panels it fetches """
+    PICKLE = 1 # {metric}_data.pickle, read whole with pickle
+    COLUMNAR = 2 # {metric}_panel folder, see ColumnarPanelStore
+
+
+class ColumnarPanelStore:
+    """
+    Panel saved as a folder with three files:
+        values.npy: float64 array of shape (companies, quarters), so the history of every company is contiguous
+        quarters.npy: the index of the panel as datetime64[D], or as period ordinals for a PeriodIndex
+        metadata.json: the tickers, in column order, and the type of the index
+
+    values.npy is memory mapped when loading, so selecting 20 tickers only reads the pages of those 20 companies. The
+    type of the index is saved with the data, so the panel comes back with the same index it was saved with.
+
+    values.npy can have more columns than quarters saved: append_quarter writes the new quarter of every company in the
+    first spare column, in place, and only rewrites the whole panel when it runs out of them.
+
+    MetricsFetcher saves what the panel was built from in sources.pickle (see save_sources), so it can serve the panel
+    without loading its manifest. append_quarter keeps its n_quarters and quarter_ranges up to date.
+    """
+    VALUES_FILE_NAME = "values.npy"
+    QUARTERS_FILE_NAME = "quarters.npy"
+    METADATA_FILE_NAME = "metadata.json"
+    SOURCES_FILE_NAME = "sources.pickle"
+
+    def __init__(self, panel_path: str):
+        self.panel_path = panel_path
+
+    def _get_file_path(self, file_name: str) -> str:
+        return os.path.join(self.panel_path, file_name)
+
+    def exists(self) -> bool:
+        return os.path.exists(self._get_file_path(self.METADATA_FILE_NAME))
+
+    @staticmethod
+    def get_index_type(index: pd.Index) -> str:
+        if isinstance(index, pd.PeriodIndex):
+            return f"period[{index.freqstr}]"
+        if isinstance(index, pd.DatetimeIndex):
+            return str(index.dtype)
+        if index.dtype == object and all(type(quarter) is datetime.date for quarter in index):
+            return "date" # Index built by PanelAssembler from the series of the extractors
+        if len(index) == 0:
+            return "empty"
+
+        raise TypeError(f"Index of type {index.dtype} can't be saved in a columnar panel")
+
+    def save(self, panel: pd.DataFrame, spare_quarters: int=0) -> None:
+        """
+        Args:
+            spare_quarters (int, optional): Empty columns left at the end of values.npy for append_quarter. Defaults to 0.
+        """
+        os.makedirs(self.panel_path, exist_ok=True)
+
+        index_type = self.get_index_type(panel.index)
+        if isinstance(panel.index, pd.PeriodIndex):
+            quarters = panel.index.asi8
+        else:
+            quarters = np.array(panel.index, dtype="datetime64[D]")
+        metadata = {"tickers": panel.columns.to_list(), "index_type": index_type}
+
+        values = np.full((len(panel.columns), len(panel.index) + spare_quarters), np.NaN)
+        values[:, :len(panel.index)] = panel.to_numpy(dtype=float).T
+
+        # Every file is written next to the old one and then swapped, so panels that are still memory mapped keep their data
+        self._write_file(self.VALUES_FILE_NAME, lambda outfile: np.save(outfile, values))
+        self._write_file(self.QUARTERS_FILE_NAME, lambda outfile: np.save(outfile, quarters))
+        self._write_file(self.METADATA_FILE_NAME, lambda outfile: outfile.write(json.dumps(metadata).encode()))
+
+    def _write_file(self, file_name: str, write) -> None:
+        file_path = self._get_file_path(file_name)
+        with open(f"{file_path}.tmp", "wb") as outfile:
+            write(outfile)
+        os.replace(f"{file_path}.tmp", file_path)
+
+    def load_metadata(self) -> dict:
+        with open(self._get_file_path(self.METADATA_FILE_NAME), "r") as infile:
+            return json.load(infile)
+
+    def save_sources(self, sources: dict) -> None:
+        """
+        Args:
+            sources (dict): Anything that can be pickled, with
+                n_quarters (int): Number of quarters of the panel when the sources were saved
+                quarter_ranges (dict): {ticker: (first_day, last_day)} of the quarters every company reports, as
+                    np.datetime64[D], or None when they are unknown
+        """
+        self._write_file(self.SOURCES_FILE_NAME, lambda outfile: pickle.dump(sources, outfile))
+
+    def load_sources(self) -> dict | None:
+        try:
+            with open(self._get_file_path(self.SOURCES_FILE_NAME), "rb") as infile:
+                return pickle.load(infile)
+        except FileNotFoundError:
+            return None
+
+    def _add_quarter_to_sources(self, quarter_day: np.datetime64, tickers: list[str]) -> None:
+        """ The appended quarter is reported by the companies that have a value for it """
+        sources = self.load_sources()
+        if sources is None:
+            return
+
+        sources["n_quarters"] += 1
+        if sources["quarter_ranges"] is not None:
+            for ticker in tickers:
+                first_day, _ = sources["quarter_ranges"].get(ticker, (quarter_day, quarter_day))
+                sources["quarter_ranges"][ticker] = (first_day, quarter_day)
+        self.save_sources(sources)
+
+    def load_quarters(self) -> np.ndarray:
+        return np.load(self._get_file_path(self.QUARTERS_FILE_NAME))
+
+    def get_tickers(self) -> list[str]:
+        return self.load_metadata()["tickers"]
+
+    def get_index(self, quarters: np.ndarray, index_type: str) -> pd.Index:
+        if index_type.startswith("period"):
+            return pd.PeriodIndex(pd.arrays.PeriodArray(quarters.astype("int64"), dtype=pd.PeriodDtype(index_type[len("period["):-1])))
+        if index_type == "date":
+            return pd.Index(quarters.astype(object), dtype=object)
+        if index_type == "empty":
+            return pd.RangeIndex(0)
+
+        return pd.DatetimeIndex(quarters.astype(index_type))
+
+    @staticmethod
+    def get_quarter_day(quarter) -> np.datetime64:
+        """ Day of a quarter label, the last day for a pd.Period """
+        if isinstance(quarter, pd.Period):
+            return np.datetime64(quarter.end_time.date(), "D")
+        return np.datetime64(pd.Timestamp(quarter).date(), "D")
+
+    def append_quarter(self, quarter, values: pd.Series) -> None:
+        """ Adds quarter at the end of the panel, with the values of the companies that have data for it and NaN for the
+        others. Only the new quarter of every company is written into values.npy, in O(companies), as long as it has a
+        spare column and values has no new ticker. Otherwise the panel is saved again with spare quarters for the next
+        appends, as many as it has quarters, so the rewrites get rarer as the history grows.
+
+        Panels loaded before the append keep the quarters they were loaded with. A crash in the middle leaves the panel as
+        it was before the append: values.npy is written first, in a column that isn't part of the panel until
+        quarters.npy is replaced.
+
+        Args:
+            quarter: Label of the new quarter in the index of the panel: a datetime.date, a pd.Period or a timestamp.
+                Must come after the last quarter saved.
+            values (pd.Series): Value of the companies for quarter, indexed by ticker.
+        """
+        new_panel = pd.DataFrame([values.to_numpy(dtype=float)], index=pd.Index([quarter]), columns=values.index)
+        metadata = self.load_metadata() if self.exists() else {"tickers": [], "index_type": "empty"}
+        if metadata["index_type"] == "empty":
+            self.save(pd.concat([self.load(), new_panel]) if self.exists() else new_panel, spare_quarters=1)
+            self._add_quarter_to_sources(self.get_quarter_day(quarter), values.index[values.notna()].to_list())
+            return
+
+        quarters = self.load_quarters()
+        if self.get_index(quarters, metadata["index_type"])[-1] >= new_panel.index[0]:
+            raise ValueError(f"Quarter {quarter} is not after the last quarter of the panel saved in {self.panel_path}")
+
+        tickers = pd.Index(metadata["tickers"])
+        stored_values = np.load(self._get_file_path(self.VALUES_FILE_NAME), mmap_mode="r+")
+        if not values.index.difference(tickers).empty or stored_values.shape[1] == len(quarters):
+            del stored_values
+            panel = pd.concat([self.load(), new_panel])
+            self.save(panel, spare_quarters=len(panel.index))
+            self._add_quarter_to_sources(self.get_quarter_day(quarter), values.index[values.notna()].to_list())
+            return
+
+        stored_values[:, len(quarters)] = values.reindex(tickers).to_numpy(dtype=float)
+        stored_values.flush()
+        del stored_values
+
+        if metadata["index_type"].startswith("period"):
+            new_quarter = pd.Period(quarter, freq=metadata["index_type"][len("period["):-1]).ordinal
+        else:
+            new_quarter = np.datetime64(quarter, "D")
+        self._write_file(self.QUARTERS_FILE_NAME, lambda outfile: np.save(outfile, np.append(quarters, np.array([new_quarter], dtype=quarters.dtype))))
+        self._add_quarter_to_sources(self.get_quarter_day(quarter), values.index[values.notna()].to_list())
+
+    def load(self, tickers: list[str]=None, start=None, end=None) -> pd.DataFrame:
+        """ Panel with only the requested tickers and quarters.
+
+        Args:
+            tickers (list[str], optional): Columns of the panel, in this order. Defaults to every ticker. Raises KeyError when a ticker is not in the panel.
+            start, end (optional): First and last quarter of the panel, both included, as anything pd.Period understands ("2000Q1", a date, ...).
+                Default to the first and last quarter saved.
+        """
+        metadata = self.load_metadata()
+        if metadata["index_type"] == "empty" and not metadata["tickers"]:
+            return pd.DataFrame() # What get_dataframe returns when nothing was extracted
+
+        quarters = self.load_quarters()
+        index = self.get_index(quarters, metadata["index_type"])
+        values = np.load(self._get_file_path(self.VALUES_FILE_NAME), mmap_mode="r")
+
+        col_nums = np.arange(len(metadata["tickers"]))
+        if tickers is not None:
+            col_num_by_ticker = {ticker: col_num for col_num, ticker in enumerate(metadata["tickers"])}
+            missing_tickers = [ticker for ticker in tickers if ticker not in col_num_by_ticker]
+            if missing_tickers:
+                raise KeyError(f"{missing_tickers} not in the panel saved in {self.panel_path}")
+            col_nums = np.array([col_num_by_ticker[ticker] for ticker in tickers], dtype=int)
+
+        row_nums = np.arange(len(index))
+        if (start is not None or end is not None) and len(index):
+            # Quarters are compared as days, so the index type doesn't matter
+            days = index.to_timestamp(how="end").to_numpy(dtype="datetime64[D]") if isinstance(index, pd.PeriodIndex) else quarters.astype("datetime64[D]")
+            is_selected = np.ones(len(days), dtype=bool)
+            if start is not None:
+                is_selected &= days >= np.datetime64(pd.Period(start, freq="Q").start_time.date())
+            if end is not None:
+                is_selected &= days <= np.datetime64(pd.Period(end, freq="Q").end_time.date())
+            row_nums = np.flatnonzero(is_selected)
+
+        # Only the rows of the selected companies are read from the memory map
+        selected_values = np.asarray(values[col_nums][:, row_nums]).T if len(col_nums) else np.empty((len(row_nums), 0))
+
+        return pd.DataFrame(selected_values, index=index[row_nums], columns=[metadata["tickers"][col_num] for col_num in col_nums])
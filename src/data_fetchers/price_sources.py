@@ -0,0 +1,109 @@
+""" Sources of the daily prices downloaded by ReturnsFetcher """
+from abc import ABC, abstractmethod
+import ast
+import logging
+import os
+import re
+import threading
+
+import yfinance as yf
+
+import pandas as pd
+
+
+class MissingPrices(Exception):
+    """ Raised when the prices of symbols couldn't be downloaded, e.g. because of a timeout or a rate limit """
+    def __init__(self, symbols: list[str], errors: list[str]=None):
+        super().__init__(f"Prices of {symbols} couldn't be downloaded: {errors or []}")
+        self.symbols = symbols
+        self.errors = errors or []
+
+
+class ErrorRecorder(logging.Handler):
+    """ Errors logged on the thread that created it, which are the ones of the downloads that run on that thread """
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.thread_id = threading.get_ident()
+        self.messages = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if record.thread == self.thread_id:
+            self.messages.append(record.getMessage())
+
+
+class IPriceSource(ABC):
+    """ Downloads the prices of a list of symbols. Instances are called like the download_stock_data function of
+    ReturnsFetcher, and the calls must be safe to run from several threads at once.
+    """
+    @abstractmethod
+    def download(self, symbols: list[str], start_date: str, end_date: str) -> pd.DataFrame:
+        """ Prices of the symbols in [start_date, end_date), shaped like the result of yf.download with an "Adj Close"
+        column per symbol. Symbols without prices in the range can be left out or have a column of NaNs, e.g. before
+        the company was listed. Raises when the download fails.
+        """
+        pass
+
+    def __call__(self, symbols: list[str], start_date: str, end_date: str) -> pd.DataFrame:
+        return self.download(symbols, start_date, end_date)
+
+
+class YFinancePriceSource(IPriceSource):
+    """ yf.download doesn't raise when symbols fail, it logs their errors and leaves their columns empty. Symbols that
+    have no prices in the range are logged too, as "no price data found". Every other error, like a timeout or a rate
+    limit, makes the download raise MissingPrices with the symbols that failed, so it can be retried.
+    """
+    ERROR_PATTERN = re.compile(r"^(\[.*?\]): (.*)$", re.DOTALL) # How yf.download logs the errors: "['MSFT', 'AAPL']: error"
+
+    @classmethod
+    def get_failed_symbols(cls, error_messages: list[str]) -> tuple[list[str], list[str]]:
+        """ Symbols and errors of the messages logged by yf.download, without the ones of symbols that have no prices in the range """
+        failed_symbols, errors = [], []
+        for error_message in error_messages:
+            match = cls.ERROR_PATTERN.match(error_message)
+            if match is None:
+                continue
+
+            symbols, error = ast.literal_eval(match.group(1)), match.group(2)
+            if "no price data found" in error and "status_code" not in error: # Yahoo answered, there are no prices
+                continue
+            failed_symbols.extend(symbols)
+            errors.append(error)
+
+        return failed_symbols, errors
+
+    def download(self, symbols: list[str], start_date: str, end_date: str) -> pd.DataFrame:
+        error_recorder = ErrorRecorder()
+        yf_logger = logging.getLogger("yfinance")
+        yf_logger.addHandler(error_recorder)
+        try:
+            # ReturnsFetcher runs the chunks on its own threads, so yfinance doesn't start more of them and logs on this one
+            data = yf.download(symbols, start=start_date, end=end_date, auto_adjust=False, progress=False, threads=False,
+                               multi_level_index=True) # auto_adjust=False keeps the "Adj Close" columns
+        finally:
+            yf_logger.removeHandler(error_recorder)
+
+        failed_symbols, errors = self.get_failed_symbols(error_recorder.messages)
+        if failed_symbols:
+            raise MissingPrices(failed_symbols, errors)
+
+        return data if data is not None else pd.DataFrame()
+
+
+class LocalPriceSource(IPriceSource):
+    """ Adjusted close prices of a csv file with a date column and one column per symbol, for working offline """
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.prices = None # Read on the first download
+
+    @staticmethod
+    def save(prices: pd.DataFrame, file_path: str) -> None:
+        """ Writes adjusted close prices, one column per symbol, in the format LocalPriceSource reads """
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        prices.rename_axis("Date").to_csv(file_path)
+
+    def download(self, symbols: list[str], start_date: str, end_date: str) -> pd.DataFrame:
+        if self.prices is None:
+            self.prices = pd.read_csv(self.file_path, index_col=0, parse_dates=True)
+
+        prices = self.prices.loc[(self.prices.index >= start_date) & (self.prices.index < end_date), self.prices.columns.intersection(symbols)]
+        return pd.concat({"Adj Close": prices}, axis=1)
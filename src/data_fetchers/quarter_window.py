@@ -0,0 +1,65 @@
+""" Range of quarters to extract, pushed down into the reading of the workbooks and kept in the cache """
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from .metric_series import CompactSeries, dates_to_days
+
+
+@dataclass(frozen=True)
+class QuarterWindow:
+    """ Dates from start_day to end_day, both included, as days since 1970-01-01. None leaves that side open """
+    start_day: int | None = None
+    end_day: int | None = None
+
+    @classmethod
+    def from_quarters(cls, start=None, end=None) -> "QuarterWindow":
+        """ Window from the first day of the start quarter to the last day of the end quarter. start and end are anything
+        pd.Period understands ("2000Q1", "2000", a date, ...), like the arguments of MetricsFetcher.load_panel.
+        """
+        start_day = int(dates_to_days([pd.Period(start, freq="Q").start_time.date()])[0]) if start is not None else None
+        end_day = int(dates_to_days([pd.Period(end, freq="Q").end_time.date()])[0]) if end is not None else None
+        return cls(start_day, end_day)
+
+    @property
+    def is_full(self) -> bool:
+        return self.start_day is None and self.end_day is None
+
+    def contains_days(self, days: np.ndarray) -> np.ndarray:
+        is_in_window = np.ones(np.shape(days), dtype=bool)
+        if self.start_day is not None:
+            is_in_window &= days >= self.start_day
+        if self.end_day is not None:
+            is_in_window &= days <= self.end_day
+        return is_in_window
+
+    def contains(self, dates) -> np.ndarray:
+        """ Mask of the datetime.date (or np.datetime64) in the window """
+        return self.contains_days(dates_to_days(dates))
+
+    def is_before(self, date) -> bool:
+        return self.start_day is not None and dates_to_days([date])[0] < self.start_day
+
+    def is_after(self, date) -> bool:
+        return self.end_day is not None and dates_to_days([date])[0] > self.end_day
+
+    def covers(self, other: "QuarterWindow") -> bool:
+        """ Whether every date of other is in this window """
+        return ((self.start_day is None or (other.start_day is not None and self.start_day <= other.start_day)) and
+                (self.end_day is None or (other.end_day is not None and self.end_day >= other.end_day)))
+
+    def union(self, other: "QuarterWindow") -> "QuarterWindow":
+        """ Smallest window that covers both """
+        return QuarterWindow(None if self.start_day is None or other.start_day is None else min(self.start_day, other.start_day),
+                             None if self.end_day is None or other.end_day is None else max(self.end_day, other.end_day))
+
+    def select(self, metric_data: pd.Series | CompactSeries) -> pd.Series | CompactSeries:
+        """ The values of a metric series in the window """
+        if self.is_full:
+            return metric_data
+        if isinstance(metric_data, CompactSeries):
+            is_in_window = self.contains_days(metric_data.days)
+            return CompactSeries(metric_data.name, metric_data.days[is_in_window], metric_data.values[is_in_window])
+
+        return metric_data[self.contains(metric_data.index.to_numpy())]
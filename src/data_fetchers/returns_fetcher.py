@@ -1,83 +1,238 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import pickle
 import os
-
-import yfinance as yf
+import time
+import warnings
 
 import pandas as pd
 import numpy as np
 
 from icecream import ic
 
+from .price_sources import YFinancePriceSource
+
+DEFAULT_START_DATE = "1999-12-31"
+DEFAULT_END_DATE = "2023-09-29"
+
+def download_stock_data(symbols, start_date=DEFAULT_START_DATE, end_date=DEFAULT_END_DATE) -> pd.DataFrame:
+    return YFinancePriceSource().download(symbols, start_date, end_date)
+
+class FailedDownloads(UserWarning):
+    def __init__(self, symbols: list, error: Exception):
+        self.symbols = symbols
+        self.error = error
+
+    def __str__(self):
+        return f"Prices of {self.symbols} couldn't be downloaded: {self.error!r}."
+
 class ReturnsFetcher:
     """Calculates stock returns, both quarterly and daily.
+
+    The adjusted close prices of every symbol are cached with the date range they were requested for. Only the symbols
+    and date ranges that are not cached yet are downloaded, and the returns of any window are calculated from the cache.
+
+    Downloads are split in chunks of chunk_size symbols, run on n_workers threads. A chunk that fails is retried with
+    exponential backoff, and then symbol by symbol, so one bad symbol doesn't lose the prices of the others. Only the
+    ranges of the chunks that were downloaded are cached, also for the symbols without prices in them, e.g. before the
+    company was listed. The cache is saved after every chunk, so an interrupted fetch only downloads what is still
+    missing when it is run again.
     """
-    def __init__(self, data_file_path: str):
+    def __init__(self, data_file_path: str, download_stock_data=download_stock_data, chunk_size: int=100, n_workers: int=4,
+                 max_retries: int=3, retry_delay: float=1.0):
+        """
+        Args:
+            download_stock_data (optional): Function (symbols, start_date, end_date) -> pd.DataFrame shaped like the result of yf.download,
+                with an "Adj Close" column per symbol, or an IPriceSource. end_date is excluded. Defaults to downloading from yfinance.
+            chunk_size (int, optional): Most symbols downloaded in one call. Defaults to 100.
+            n_workers (int, optional): Number of chunks downloaded at the same time. Defaults to 4.
+            max_retries (int, optional): Retries of a chunk whose download raised. Defaults to 3.
+            retry_delay (float, optional): Seconds before the first retry, doubled before every next one. Defaults to 1.0.
+        """
         self.data_file_path = data_file_path
+        self.download_stock_data = download_stock_data
+        self.chunk_size = chunk_size
+        self.n_workers = n_workers
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.failed_symbols = [] # Symbols of the last fetch whose prices couldn't be downloaded
         self.load_data()
 
-    def download_stock_data(self, symbols, start_date="1999-12-31", end_date="2023-09-29"):
-        return yf.download(symbols, start=start_date, end=end_date)
+    @staticmethod
+    def get_adjusted_close(data: pd.DataFrame, symbols: list[str]) -> pd.DataFrame:
+        """ Adjusted close prices with one column per symbol. Symbols that are not in data get a column of NaNs """
+        if "Adj Close" not in data.columns.get_level_values(0): # Nothing was downloaded
+            return pd.DataFrame(np.NaN, index=pd.DatetimeIndex(data.index), columns=symbols)
+        if isinstance(data.columns, pd.MultiIndex):
+            return data["Adj Close"].reindex(columns=symbols)
 
-    def calculate_returns(self, symbols: list[str], data: pd.DataFrame, return_type: str="arithmetic") -> [dict, dict]:
-        quarterly_returns = {}
-        daily_returns = {}
+        # When there is only one symbol, columns are not an instance of MultiIndex
+        return pd.DataFrame({symbol: data["Adj Close"] for symbol in symbols}, index=data.index)
 
-        is_multi_index = isinstance(data.columns, pd.MultiIndex) # When there is only one symbol, columns are not an instance of MultiIndex
+    def calculate_returns(self, symbols: list[str], data: pd.DataFrame, return_type: str="arithmetic", as_frame: bool=False) -> [dict, dict]:
+        """ Daily and quarterly returns of every symbol, computed for the whole adjusted close matrix at once.
 
-        for symbol in symbols:
-            df = data.copy()
-            if is_multi_index:
-                df = df.loc[:, pd.IndexSlice[:, symbol]].copy()
+        Args:
+            as_frame (bool, optional): Return two DataFrames with one column per symbol instead of two dicts of pd.Series.
 
-            df["daily_returns"] = df["Adj Close"].pct_change()
-            df["quarter"] = df.index.to_period("Q")
+        Returns:
+            [dict, dict]: {symbol: quarterly returns}, {symbol: daily returns}
+        """
+        symbols = list(dict.fromkeys(symbols)) # One column per symbol
+        adjusted_close = self.get_adjusted_close(data, symbols)
 
-            if return_type == "arithmetic":
-                quarterly_returns[symbol] = df.groupby("quarter")["daily_returns"].mean()
-            elif return_type == "geometric":
-                df["daily_growth_multiplier"] = df["daily_returns"] + 1
-                quarterly_returns[symbol] = df.groupby("quarter")["daily_growth_multiplier"].apply(np.prod) - 1
+        daily_returns = adjusted_close.pct_change()
+        quarters = daily_returns.index.to_period("Q").rename("quarter")
 
-                # Convert from daily to quarterly geometric mean
-                quarterly_returns[symbol] = (np.power(quarterly_returns[symbol] + 1, 1/63) - 1).rename("quarterly_returns")  # Assuming around 63 trading days in a quarter
+        if return_type == "arithmetic":
+            quarterly_returns = daily_returns.groupby(quarters).mean()
+            quarterly_returns_name = "daily_returns"
+        elif return_type == "geometric":
+            # Product of the daily growth multipliers as a sum of logs. NaNs are skipped, like np.prod skips them
+            log_growth = np.log1p(daily_returns).groupby(quarters).sum()
 
+            # Convert from quarterly to daily geometric mean, prod**(1/63) - 1
+            quarterly_returns = np.expm1(log_growth/63) # Assuming around 63 trading days in a quarter
+            quarterly_returns_name = "quarterly_returns"
+        else: # Unknown return types only get daily returns
+            quarterly_returns = daily_returns.iloc[:0, :0]
+            quarterly_returns_name = None
 
-            daily_returns[symbol] = df["daily_returns"].copy()
+        if as_frame:
+            return quarterly_returns.rename_axis(columns=None), daily_returns.rename_axis(columns=None)
 
-        return quarterly_returns, daily_returns
+        quarterly_returns_by_symbol = {symbol: quarterly_returns[symbol].rename(quarterly_returns_name) for symbol in quarterly_returns.columns}
+        daily_returns_by_symbol = {symbol: daily_returns[symbol].rename("daily_returns") for symbol in daily_returns.columns}
+
+        return quarterly_returns_by_symbol, daily_returns_by_symbol
 
     def load_data(self):
         try:
             with open(self.data_file_path, "rb") as infile:
                 self.returns_data = pickle.load(infile)
         except FileNotFoundError:
-            self.returns_data = {"quarterly_returns": {}, "daily_returns": {}}
+            self.returns_data = {}
+
+        # Files saved before prices were cached only have returns, which can't be reused for other windows
+        if "prices" not in self.returns_data:
+            self.returns_data = {"prices": {}, "price_ranges": {}}
 
     def save_data(self):
-        with open(self.data_file_path, "wb") as outfile:
+        # Written next to the old file and then swapped, so an interrupted save doesn't lose the cache
+        with open(f"{self.data_file_path}.tmp", "wb") as outfile:
             pickle.dump(self.returns_data, outfile)
+        os.replace(f"{self.data_file_path}.tmp", self.data_file_path)
+
+    def get_missing_ranges(self, symbol: str, start_date: pd.Timestamp, end_date: pd.Timestamp) -> list[tuple[pd.Timestamp, pd.Timestamp]]:
+        """ [start, end) ranges of the window that are not cached for symbol """
+        if symbol not in self.returns_data["price_ranges"]:
+            return [(start_date, end_date)]
+
+        cached_start_date, cached_end_date = self.returns_data["price_ranges"][symbol]
+        missing_ranges = []
+        if start_date < cached_start_date:
+            missing_ranges.append((start_date, cached_start_date))
+        if end_date > cached_end_date:
+            missing_ranges.append((cached_end_date, end_date))
+
+        return missing_ranges
+
+    def download_chunk(self, symbols: list[str], start_date: pd.Timestamp, end_date: pd.Timestamp) -> pd.DataFrame:
+        """ Downloads the prices of a chunk, retrying max_retries times with exponential backoff before raising """
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.download_stock_data(symbols, start_date=start_date.strftime("%Y-%m-%d"), end_date=end_date.strftime("%Y-%m-%d"))
+            except Exception:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self.retry_delay*2**attempt)
+
+    def add_prices(self, data: pd.DataFrame, symbols: list[str], start_date: pd.Timestamp, end_date: pd.Timestamp) -> None:
+        """ Caches the downloaded prices of the symbols for the range [start_date, end_date) """
+        adjusted_close = self.get_adjusted_close(data, symbols)
 
-    def fetch(self, symbols, return_type="arithmetic", refresh_data=False):
-        # If saved data is missing symbols, download them and update the saved object
-        missing_data_symbols = list(set(symbols) - set(self.returns_data["quarterly_returns"].keys()))
-
-        if refresh_data or return_type != self.returns_data.get("return_type"):
-            data = self.download_stock_data(symbols)
-            quarterly_returns, daily_returns = self.calculate_returns(symbols, data, return_type)
-
-            self.returns_data = {"quarterly_returns": quarterly_returns, "daily_returns": daily_returns, "return_type": return_type}
-            self.save_data()
-        
-        elif missing_data_symbols:
-            data = self.download_stock_data(missing_data_symbols)
-            quarterly_returns, daily_returns = self.calculate_returns(missing_data_symbols, data, return_type)
-
-            self.returns_data["quarterly_returns"].update(quarterly_returns)
-            self.returns_data["daily_returns"].update(daily_returns)
-            self.returns_data["return_type"] = return_type
-            self.save_data()
-
-        return self.returns_data["quarterly_returns"], self.returns_data["daily_returns"]
+        for symbol in symbols:
+            prices = adjusted_close[symbol].dropna().rename(symbol)
+            prices = prices[(prices.index >= start_date) & (prices.index < end_date)]
+            if symbol in self.returns_data["prices"]:
+                prices = pd.concat([self.returns_data["prices"][symbol], prices]).sort_index()
+            self.returns_data["prices"][symbol] = prices[~prices.index.duplicated(keep="last")]
+
+            # The range is cached even when it has no prices, e.g. before the company was listed, so it isn't downloaded again
+            cached_start_date, cached_end_date = self.returns_data["price_ranges"].get(symbol, (start_date, end_date))
+            self.returns_data["price_ranges"][symbol] = (min(cached_start_date, start_date), max(cached_end_date, end_date))
+
+    def update_prices(self, symbols: list[str], start_date: pd.Timestamp, end_date: pd.Timestamp) -> bool:
+        """ Downloads the prices of the symbols and ranges of the window that are not cached, and saves the cache after
+        every chunk. Symbols missing the same range are downloaded together, chunk_size at a time. The symbols of chunks
+        that still fail when downloaded alone are left in self.failed_symbols, with a FailedDownloads warning, and their
+        range is not cached.
+
+        Returns:
+            bool: Whether anything was downloaded
+        """
+        symbols_by_range = {}
+        for symbol in symbols:
+            for missing_range in self.get_missing_ranges(symbol, start_date, end_date):
+                symbols_by_range.setdefault(missing_range, []).append(symbol)
+
+        self.failed_symbols = []
+        with ThreadPoolExecutor(max_workers=self.n_workers) as executor:
+            def submit(chunk_symbols, missing_range):
+                return executor.submit(self.download_chunk, chunk_symbols, *missing_range), (chunk_symbols, missing_range)
+
+            chunks = dict(submit(range_symbols[chunk_start:chunk_start + self.chunk_size], missing_range)
+                          for missing_range, range_symbols in symbols_by_range.items()
+                          for chunk_start in range(0, len(range_symbols), self.chunk_size))
+            while chunks:
+                done, _ = wait(chunks, return_when=FIRST_COMPLETED)
+                for future in sorted(done, key=lambda future: future.exception() is not None): # Downloads that finished are saved before any error is raised
+                    chunk_symbols, missing_range = chunks.pop(future)
+                    try:
+                        data = future.result()
+                    except Exception as error:
+                        if len(chunk_symbols) > 1: # Isolates the symbols that make the chunk fail
+                            chunks.update(submit([symbol], missing_range) for symbol in chunk_symbols)
+                        else:
+                            self.failed_symbols.extend(chunk_symbols)
+                            warnings.warn(FailedDownloads(chunk_symbols, error))
+                        continue
+
+                    # Only this thread touches the cache, the workers just download
+                    self.add_prices(data, chunk_symbols, *missing_range)
+                    self.save_data()
+
+        return bool(symbols_by_range)
+
+    def get_prices(self, symbols: list[str], start_date: pd.Timestamp, end_date: pd.Timestamp) -> pd.DataFrame:
+        """ Cached adjusted close prices of the window, one column per symbol, shaped like the result of yf.download """
+        # Symbols whose prices couldn't be downloaded get a column of NaNs
+        prices = pd.DataFrame({symbol: self.returns_data["prices"][symbol] for symbol in symbols if symbol in self.returns_data["prices"]}, columns=symbols)
+        prices.index = pd.DatetimeIndex(prices.index) # Also when no symbol has prices
+        prices = prices[(prices.index >= start_date) & (prices.index < end_date)]
+
+        return pd.concat({"Adj Close": prices}, axis=1)
+
+    def fetch(self, symbols, return_type="arithmetic", refresh_data=False, start_date=DEFAULT_START_DATE, end_date=DEFAULT_END_DATE):
+        """ Returns of the symbols in the window [start_date, end_date).
+
+        Args:
+            refresh_data (bool, optional): Download the prices of the symbols again instead of using the cached ones.
+
+        Returns:
+            [dict, dict]: {symbol: quarterly returns}, {symbol: daily returns} of every symbol in symbols
+        """
+        symbols = list(dict.fromkeys(symbols))
+        start_date, end_date = pd.Timestamp(start_date), pd.Timestamp(end_date)
+
+        if refresh_data:
+            for symbol in symbols:
+                self.returns_data["prices"].pop(symbol, None)
+                self.returns_data["price_ranges"].pop(symbol, None)
+
+        # Only the prices that are not cached are downloaded, the returns are always calculated from the cache
+        self.update_prices(symbols, start_date, end_date)
+
+        return self.calculate_returns(symbols, self.get_prices(symbols, start_date, end_date), return_type)
 
 
 def main():
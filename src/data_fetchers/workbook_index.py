@@ -0,0 +1,210 @@
+""" Lookups of sheets and rows of a workbook, read once and shared by every extractor working on it """
+import warnings
+from typing import Iterator
+
+import openpyxl as opx
+from openpyxl.worksheet.worksheet import Worksheet
+from openpyxl.worksheet._read_only import ReadOnlyWorksheet
+from openpyxl.utils import coordinate_to_tuple
+
+
+class AmbiguousRowLabel(UserWarning):
+    def __init__(self, metric_name: str, sheet_title: str, matching_labels: list, row_num: int):
+        self.metric_name = metric_name
+        self.sheet_title = sheet_title
+        self.matching_labels = matching_labels
+        self.row_num = row_num
+
+    def __str__(self):
+        return f"Metric {self.metric_name} matches several rows of {self.sheet_title}: {self.matching_labels}. Using row {self.row_num}."
+
+
+class CountingReader:
+    """ File object of a zip member that counts the bytes read from it into a SheetBytesCounter """
+    def __init__(self, member, counter: "SheetBytesCounter"):
+        self.member = member
+        self.counter = counter
+
+    def read(self, size: int=-1) -> bytes:
+        data = self.member.read(size)
+        self.counter.bytes_read += len(data)
+        return data
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.member.close()
+
+    def __getattr__(self, name: str):
+        return getattr(self.member, name)
+
+
+class SheetBytesCounter:
+    """
+    Stands in for the zip archive of a read only workbook, which parses the XML of its sheets on demand, and counts the
+    uncompressed bytes of the sheet XML parts that are actually read. Install it with SheetBytesCounter.install(workbook).
+    """
+    SHEETS_PATH = "xl/worksheets/"
+
+    def __init__(self, archive):
+        self.archive = archive
+        self.bytes_read = 0
+
+    @classmethod
+    def install(cls, workbook: opx.Workbook) -> "SheetBytesCounter":
+        counter = cls(workbook._archive)
+        workbook._archive = counter
+        return counter
+
+    def open(self, name: str, *args, **kwargs):
+        member = self.archive.open(name, *args, **kwargs)
+        return CountingReader(member, self) if name.lstrip("/").startswith(self.SHEETS_PATH) else member
+
+    def __getattr__(self, name: str):
+        return getattr(self.archive, name)
+
+
+class SheetCells:
+    """
+    Values and number formats of every cell of a sheet, read in a single pass.
+
+    A read only sheet parses its XML from the top on every iter_rows call and every cell access, so reading the labels,
+    the timestamp row, the company cell and the metric rows one by one parses the same sheet tens of times per workbook.
+    The dimensions of the sheet are ignored: some exporters write a stale <dimension> tag, which would cut the rows short.
+    """
+    def __init__(self, worksheet: Worksheet):
+        if isinstance(worksheet, ReadOnlyWorksheet):
+            worksheet.reset_dimensions()
+
+        self.values = [] # [row][column], row and column 1 at index 0. Rows are as long as their last cell
+        self.number_formats = []
+        for row in worksheet.iter_rows():
+            self.values.append([cell.value for cell in row])
+            self.number_formats.append([cell.number_format for cell in row])
+        self.max_column = max(map(len, self.values), default=0) # Like worksheet.max_column of a fully loaded sheet
+
+    @property
+    def max_row(self) -> int:
+        return len(self.values)
+
+    def get_value(self, coordinate: str):
+        row_num, col_num = coordinate_to_tuple(coordinate)
+        row = self.values[row_num - 1] if row_num <= self.max_row else []
+        return row[col_num - 1] if col_num <= len(row) else None
+
+    def get_column(self, col_num: int) -> list:
+        """ Values of a column, one per row """
+        return [row[col_num - 1] if col_num <= len(row) else None for row in self.values]
+
+    def get_row(self, row_num: int, first_col_num: int, n_cols: int=None) -> tuple[list, list]:
+        """ Values and number formats of n_cols cells starting at first_col_num. Defaults to reading up to max_column """
+        values = self.values[row_num - 1] if row_num <= self.max_row else []
+        number_formats = self.number_formats[row_num - 1] if row_num <= self.max_row else []
+        n_cols = n_cols if n_cols is not None else max(self.max_column - first_col_num + 1, 0)
+        padding = max(first_col_num - 1 + n_cols - len(values), 0)
+
+        return ((values + [None]*padding)[first_col_num - 1:first_col_num - 1 + n_cols],
+                (number_formats + ["General"]*padding)[first_col_num - 1:first_col_num - 1 + n_cols])
+
+
+class WorkbookIndex:
+    """
+    Index of the sheet titles and row labels of a workbook. Built lazily, so only the sheets that are looked up are read.
+
+    Lookups keep the substring semantics of the original linear scans: a sheet matches when its title contains the
+    requested sheet name and a row matches when its label contains the metric name ("ROE" matches "Pretax ROE"), and
+    the first match wins.
+
+    The sheets of read only workbooks are read whole, once, into SheetCells (see get_sheet_cells), and every lookup
+    and cell read of those sheets is served from there.
+    """
+    def __init__(self, workbook: opx.Workbook, label_column: int = 1):
+        self.workbook = workbook
+        self.label_column = label_column
+
+        self.titles_by_cell = {} # {title cell coordinate: [(title, sheet), ...]} in workbook order, of the sheets read so far
+        self.rows_by_label = {} # {sheet title: {normalized label: [row numbers]}} in order of first appearance
+        self.ambiguous_matches = [] # AmbiguousRowLabel of every ambiguous lookup
+        self.sheet_cells = {} # {sheet title: SheetCells} of the sheets read whole
+        self.quarter_indexes = {} # Quarter end dates of the timestamp rows, shared by the metrics of a sheet. See IMetricFetcher.get_metric_data_bulk
+
+        self._sheet_lookups = {}
+        self._row_lookups = {}
+
+    @staticmethod
+    def normalize_label(label) -> str | None:
+        return label.strip() if isinstance(label, str) else None
+
+    def get_sheet_cells(self, worksheet: Worksheet) -> SheetCells:
+        if worksheet.title not in self.sheet_cells:
+            self.sheet_cells[worksheet.title] = SheetCells(worksheet)
+
+        return self.sheet_cells[worksheet.title]
+
+    def get_cell_value(self, worksheet: Worksheet, coordinate: str):
+        if self.workbook.read_only:
+            return self.get_sheet_cells(worksheet).get_value(coordinate)
+
+        return worksheet[coordinate].value
+
+    def iter_sheet_titles(self, title_cell: str) -> Iterator[tuple[str, Worksheet]]:
+        """ (title, sheet) of every sheet in workbook order. Titles are read as they are reached, so a lookup that stops
+        at the first match doesn't read the titles of the sheets after it
+        """
+        titles = self.titles_by_cell.setdefault(title_cell, [])
+        yield from titles
+        for sheet in self.workbook.worksheets[len(titles):]:
+            # Sheets that are not read whole yet are not read whole for their title: a read only sheet stops parsing after the title row
+            title = self.sheet_cells[sheet.title].get_value(title_cell) if sheet.title in self.sheet_cells else sheet[title_cell].value
+            titles.append((title, sheet))
+            yield title, sheet
+
+    def get_sheet_titles(self, title_cell: str) -> list[tuple[str, Worksheet]]:
+        return list(self.iter_sheet_titles(title_cell))
+
+    def find_sheet(self, sheet_name: str, title_cell: str) -> Worksheet | None:
+        """ First sheet whose title, stored in title_cell, contains sheet_name """
+        if (sheet_name, title_cell) not in self._sheet_lookups:
+            self._sheet_lookups[(sheet_name, title_cell)] = next((sheet for title, sheet in self.iter_sheet_titles(title_cell)
+                                                                  if title is not None and sheet_name in title), None)
+
+        return self._sheet_lookups[(sheet_name, title_cell)]
+
+    def get_row_labels(self, worksheet: Worksheet) -> dict:
+        if worksheet.title not in self.rows_by_label:
+            if self.workbook.read_only:
+                labels = self.get_sheet_cells(worksheet).get_column(self.label_column)
+            else:
+                labels = [cell.value for [cell] in worksheet.iter_rows(min_col=self.label_column, max_col=self.label_column)]
+
+            rows_by_label = {}
+            for row_num, label in enumerate(map(self.normalize_label, labels), start=1):
+                if label is not None:
+                    rows_by_label.setdefault(label, []).append(row_num)
+
+            self.rows_by_label[worksheet.title] = rows_by_label
+
+        return self.rows_by_label[worksheet.title]
+
+    def find_rows(self, worksheet: Worksheet, metric_name: str) -> dict:
+        """ {label: [row numbers]} of every row label that contains metric_name """
+        if (worksheet.title, metric_name) not in self._row_lookups:
+            self._row_lookups[(worksheet.title, metric_name)] = {label: rows for label, rows in self.get_row_labels(worksheet).items() if metric_name in label}
+
+        return self._row_lookups[(worksheet.title, metric_name)]
+
+    def find_row(self, worksheet: Worksheet, metric_name: str) -> int | None:
+        """ First row whose label contains metric_name. Warns with AmbiguousRowLabel when more than one row matches """
+        is_new_lookup = (worksheet.title, metric_name) not in self._row_lookups
+        matching_rows = self.find_rows(worksheet, metric_name)
+        if not matching_rows:
+            return None
+
+        row_num = min(rows[0] for rows in matching_rows.values())
+        if is_new_lookup and sum(len(rows) for rows in matching_rows.values()) > 1:
+            ambiguous_match = AmbiguousRowLabel(metric_name, worksheet.title, list(matching_rows.keys()), row_num)
+            self.ambiguous_matches.append(ambiguous_match)
+            warnings.warn(ambiguous_match)
+
+        return row_num
@@ -0,0 +1,143 @@
+""" Reads the sheet list and a few cells of the active sheet straight from the xlsx zip, without loading the workbook """
+from dataclasses import dataclass
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+
+from openpyxl.utils import coordinate_to_tuple
+
+from .file_style import FileStyle, FileStyleManager, FileStyleNotRecognized
+
+SPREADSHEET_NAMESPACE = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+RELATIONSHIP_ID = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+PACKAGE_RELATIONSHIP = "{http://schemas.openxmlformats.org/package/2006/relationships}Relationship"
+WORKSHEET_RELATIONSHIP_TYPE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"
+
+MIN_SHEETS = 4 # Workbooks with less sheets are worthless to us
+
+
+@dataclass
+class WorkbookPrescan:
+    """
+    Attributes:
+        sheet_names (list[str]): Names of the worksheets, like [sheet.title for sheet in workbook.worksheets]
+        active_sheet_name (str): Name of the sheet of workbook.active
+        cells (dict): {coordinate: value} of the cells of the active sheet that were asked for. Empty cells are None
+    """
+    sheet_names: list[str]
+    active_sheet_name: str | None
+    cells: dict
+
+    @property
+    def n_sheets(self) -> int:
+        return len(self.sheet_names)
+
+    @property
+    def is_incomplete(self) -> bool:
+        return self.n_sheets < MIN_SHEETS
+
+    def get_file_style(self, file_style_configs: dict) -> FileStyle | None:
+        """ Style of the workbook for the {FileStyle: FileStyleDetails} of a metric, None when no style matches.
+        The cells of FileStyleManager(file_style_configs).get_style_cells() must have been read.
+        """
+        try:
+            return FileStyleManager(file_style_configs).determine_file_style_from_cells(self.cells)
+        except FileStyleNotRecognized:
+            return None
+
+
+def get_style_cells(file_style_configs_by_metric: dict) -> list[str]:
+    """ Cells that determine the style of a workbook for every metric """
+    return list(dict.fromkeys(coordinate for file_style_configs in file_style_configs_by_metric.values()
+                              for coordinate in FileStyleManager(file_style_configs).get_style_cells()))
+
+
+def _read_xml(archive: zipfile.ZipFile, member_path: str) -> ET.Element:
+    with archive.open(member_path) as infile:
+        return ET.parse(infile).getroot()
+
+def _resolve_target(target: str) -> str:
+    """ Path inside the zip of a relationship target of xl/workbook.xml """
+    return target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target))
+
+def _read_shared_strings(archive: zipfile.ZipFile, indices: set[int]) -> dict:
+    """ {index: text} of the shared strings at indices. Stops reading after the last one """
+    shared_strings = {}
+    if not indices or "xl/sharedStrings.xml" not in archive.namelist():
+        return shared_strings
+
+    last_index = max(indices)
+    with archive.open("xl/sharedStrings.xml") as infile:
+        index = 0
+        for _, element in ET.iterparse(infile):
+            if element.tag != f"{SPREADSHEET_NAMESPACE}si":
+                continue
+            if index in indices:
+                # Plain text is in <t>, rich text is split in runs <r>, each with its own <t>. Phonetic runs (<rPh>) are not part of the text
+                texts = element.findall(f"{SPREADSHEET_NAMESPACE}t") + element.findall(f"{SPREADSHEET_NAMESPACE}r/{SPREADSHEET_NAMESPACE}t")
+                shared_strings[index] = "".join(text.text or "" for text in texts)
+            element.clear()
+            if index == last_index:
+                break
+            index += 1
+
+    return shared_strings
+
+def _read_cells(archive: zipfile.ZipFile, sheet_path: str, coordinates: list[str]) -> dict:
+    """ {coordinate: value} of the cells of a sheet. Stops reading after the row of the last cell """
+    cells = dict.fromkeys(coordinates)
+    last_row = max(coordinate_to_tuple(coordinate)[0] for coordinate in coordinates) if coordinates else 0
+    shared_string_cells = {}
+    with archive.open(sheet_path) as infile:
+        for _, element in ET.iterparse(infile):
+            if element.tag == f"{SPREADSHEET_NAMESPACE}row" and int(element.get("r", 0)) >= last_row:
+                break
+            if element.tag != f"{SPREADSHEET_NAMESPACE}c" or element.get("r") not in cells:
+                continue
+
+            cell_type = element.get("t", "n")
+            if cell_type == "inlineStr":
+                cells[element.get("r")] = "".join(text.text or "" for text in element.iter(f"{SPREADSHEET_NAMESPACE}t"))
+                continue
+
+            value = element.findtext(f"{SPREADSHEET_NAMESPACE}v")
+            if value is None:
+                continue
+            if cell_type == "s":
+                shared_string_cells[element.get("r")] = int(value)
+            elif cell_type in ["str", "e"]:
+                cells[element.get("r")] = value
+            elif cell_type == "b":
+                cells[element.get("r")] = value == "1"
+            else:
+                cells[element.get("r")] = float(value) if any(character in value for character in ".eE") else int(value)
+
+    shared_strings = _read_shared_strings(archive, set(shared_string_cells.values()))
+    cells.update({coordinate: shared_strings.get(index) for coordinate, index in shared_string_cells.items()})
+    return cells
+
+
+def prescan_workbook(file_path: str, coordinates: list[str]) -> WorkbookPrescan:
+    """ Sheet names and the values of the cells at coordinates of the active sheet of an xlsx file. Only the workbook
+    part, the active sheet up to the row of the last cell and the shared strings up to the last one needed are read.
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        workbook = _read_xml(archive, "xl/workbook.xml")
+        relationships = _read_xml(archive, "xl/_rels/workbook.xml.rels")
+        worksheet_paths = {relationship.get("Id"): _resolve_target(relationship.get("Target"))
+                           for relationship in relationships.iter(PACKAGE_RELATIONSHIP) if relationship.get("Type") == WORKSHEET_RELATIONSHIP_TYPE}
+
+        # Chartsheets are in <sheets> too, but not in workbook.worksheets
+        sheets = [(sheet.get("name"), worksheet_paths.get(sheet.get(RELATIONSHIP_ID))) for sheet in workbook.iter(f"{SPREADSHEET_NAMESPACE}sheet")]
+        sheet_names = [sheet_name for sheet_name, sheet_path in sheets if sheet_path is not None]
+        if not sheets:
+            return WorkbookPrescan(sheet_names, None, dict.fromkeys(coordinates))
+
+        # workbook.active is the sheet of the activeTab of the first view, the first sheet by default
+        workbook_view = workbook.find(f"{SPREADSHEET_NAMESPACE}bookViews/{SPREADSHEET_NAMESPACE}workbookView")
+        active_index = int(workbook_view.get("activeTab", 0)) if workbook_view is not None else 0
+        active_sheet_name, active_sheet_path = sheets[active_index] if active_index < len(sheets) else sheets[0]
+        if active_sheet_path is None: # A chartsheet, without cells
+            return WorkbookPrescan(sheet_names, active_sheet_name, dict.fromkeys(coordinates))
+
+        return WorkbookPrescan(sheet_names, active_sheet_name, _read_cells(archive, active_sheet_path, coordinates))
@@ -0,0 +1,175 @@
+""" Backtest of the quantile portfolios over a grid of metrics, quantiles and study/invest windows, run on a process pool """
+from dataclasses import dataclass, asdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from multiprocessing import shared_memory
+import os
+
+import numpy as np
+import pandas as pd
+from .quantile_portfolios import QuantilePortfolioBuilder
+from .return_statistics import summarize_returns, paired_t_tests
+
+
+@dataclass(frozen=True)
+class SweepCell:
+    """ One point of the grid: the portfolios of a metric, split at quantile, for the investment period starting at rebalance_date """
+    metric: str
+    quantile: float
+    study_quarters: int
+    invest_quarters: int
+    rebalance_date: str # Quarter, like "2010Q1"
+
+SWEEP_CELL_COLUMNS = list(SweepCell.__dataclass_fields__)
+RESULT_COLUMNS = SWEEP_CELL_COLUMNS + ["portfolio", "n_quarters", "mean", "variance", "std", "t_statistic", "p_value"]
+
+
+def get_rolling_rebalance_dates(first_quarter, last_quarter, study_quarters: int, invest_quarters: int) -> list[str]:
+    """ Rebalance dates of consecutive investment periods, with the first study period starting at first_quarter
+    and the last investment period ending at last_quarter at the latest.
+    """
+    first_quarter, last_quarter = pd.Period(first_quarter, freq="Q"), pd.Period(last_quarter, freq="Q")
+    rebalance_dates = []
+    rebalance_quarter = first_quarter + study_quarters
+    while rebalance_quarter + invest_quarters - 1 <= last_quarter:
+        rebalance_dates.append(str(rebalance_quarter))
+        rebalance_quarter += invest_quarters
+
+    return rebalance_dates
+
+
+# Data of the sweep in every worker process, set by _init_sweep_worker
+_sweep_data = {}
+
+def _init_sweep_worker(returns_memory_name: str, returns_shape: tuple, returns_index: pd.Index, returns_columns: pd.Index,
+                       panels: dict, baseline_symbol: str) -> None:
+    returns_memory = shared_memory.SharedMemory(name=returns_memory_name)
+    returns_values = np.ndarray(returns_shape, dtype=float, buffer=returns_memory.buf)
+
+    _sweep_data.update(returns_memory=returns_memory,
+                       returns=pd.DataFrame(returns_values, index=returns_index, columns=returns_columns, copy=False),
+                       panels=panels, baseline_symbol=baseline_symbol)
+
+def _close_sweep_worker() -> None:
+    _sweep_data.pop("returns", None)
+    _sweep_data.pop("returns_memory").close()
+
+def _run_sweep_task(task: tuple) -> list[dict]:
+    """ Result rows of the cells of one (quantile, study_quarters, invest_quarters, metric), every cell with one row per portfolio.
+    All the rebalance dates of the task are built at once.
+    """
+    (quantile, study_quarters, invest_quarters, metric), cells = task
+    returns = _sweep_data["returns"]
+    baseline_returns = returns[_sweep_data["baseline_symbol"]]
+
+    builder = QuantilePortfolioBuilder([quantile], study_quarters, invest_quarters)
+    portfolios = builder.build({metric: _sweep_data["panels"][metric]}, returns, [cell.rebalance_date for cell in cells])
+
+    # Statistics of every portfolio of the task at once. Outside of its investment period, a portfolio only has NaNs
+    paired_returns = portfolios.returns[metric].copy()
+    paired_returns[baseline_returns.reindex(paired_returns.index).isna().to_numpy()] = np.NaN # Only quarters where the baseline has returns too
+    summary = summarize_returns(paired_returns)
+    t_tests = paired_t_tests(paired_returns, baseline_returns)
+
+    rows = []
+    for cell in cells:
+        for portfolio in range(builder.n_portfolios):
+            column = (pd.Period(cell.rebalance_date, freq="Q"), portfolio)
+            rows.append({**asdict(cell), "portfolio": portfolio, "n_quarters": t_tests.loc[column, "n"],
+                         "mean": summary.loc[column, "mean"], "variance": summary.loc[column, "variance"], "std": summary.loc[column, "std"],
+                         "t_statistic": t_tests.loc[column, "t_statistic"], "p_value": t_tests.loc[column, "p_value"]})
+
+    return rows
+
+
+class ParameterSweep:
+    """
+    Runs the grid of metrics x quantiles x (study, invest) windows x rolling rebalance dates and compares every portfolio
+    against a baseline, the S&P500 by default, with a paired t-test over its investment period.
+
+    The returns matrix is copied once into shared memory, which every worker maps instead of receiving its own copy.
+    Result rows are appended to a CSV file as soon as their cells are done, and cells already in the file are skipped,
+    so an interrupted sweep resumes where it stopped.
+    """
+    def __init__(self, panels: dict, returns: pd.DataFrame, results_file_path: str, baseline_symbol: str="^GSPC", n_workers: int=1):
+        """
+        Args:
+            panels (dict): {metric: panel} of MetricsFetcher.fetch_many
+            returns (pd.DataFrame): Quarterly returns of the companies and of the baseline, one column per symbol
+            n_workers (int, optional): Number of processes the grid is split across. 1 (default) runs it in this process.
+        """
+        self.panels = panels
+        self.returns = returns
+        self.results_file_path = results_file_path
+        self.baseline_symbol = baseline_symbol
+        self.n_workers = n_workers
+
+    def get_grid(self, metrics: list[str], quantiles: list[float], windows: list[tuple[int, int]], first_quarter, last_quarter) -> list[SweepCell]:
+        """ Every cell of the grid. windows are (study_quarters, invest_quarters) pairs, each with its own rolling rebalance dates """
+        return [SweepCell(metric, quantile, study_quarters, invest_quarters, rebalance_date)
+                for study_quarters, invest_quarters in windows
+                for rebalance_date in get_rolling_rebalance_dates(first_quarter, last_quarter, study_quarters, invest_quarters)
+                for quantile in quantiles
+                for metric in metrics]
+
+    def load_results(self) -> pd.DataFrame:
+        try:
+            return pd.read_csv(self.results_file_path, dtype={"metric": str, "rebalance_date": str}, float_precision="round_trip")
+        except FileNotFoundError:
+            return pd.DataFrame(columns=RESULT_COLUMNS)
+
+    def get_completed_cells(self, results: pd.DataFrame) -> set:
+        """ Cells with the rows of both of their portfolios, below and above the quantile, in the results """
+        portfolios_per_cell = results.groupby(SWEEP_CELL_COLUMNS)["portfolio"].nunique()
+        return {SweepCell(*cell) for cell in portfolios_per_cell.index[portfolios_per_cell == 2]}
+
+    def _append_results(self, rows: list[dict]) -> None:
+        is_new_file = not os.path.exists(self.results_file_path)
+        # One write per task, so the rows of a cell are never split by an interruption
+        pd.DataFrame(rows, columns=RESULT_COLUMNS).to_csv(self.results_file_path, mode="a", header=is_new_file, index=False)
+
+    def run(self, metrics: list[str]=None, quantiles: list[float]=[0.5], windows: list[tuple[int, int]]=[(40, 4)],
+            first_quarter="2000Q1", last_quarter="2019Q4") -> pd.DataFrame:
+        """
+        Returns:
+            pd.DataFrame: Result rows of every cell of the grid, including the ones of previous runs
+        """
+        metrics = list(self.panels.keys()) if metrics is None else metrics
+        completed_cells = self.get_completed_cells(self.load_results())
+        pending_cells = [cell for cell in self.get_grid(metrics, quantiles, windows, first_quarter, last_quarter) if cell not in completed_cells]
+
+        # A task per (quantile, study_quarters, invest_quarters, metric), its rebalance dates are built together
+        tasks = {}
+        for cell in pending_cells:
+            tasks.setdefault((cell.quantile, cell.study_quarters, cell.invest_quarters, cell.metric), []).append(cell)
+
+        if tasks:
+            self._run_tasks(list(tasks.items()))
+
+        # Rows of cells that were half written when a previous run stopped are written again, keep the last ones
+        results = self.load_results().drop_duplicates(SWEEP_CELL_COLUMNS + ["portfolio"], keep="last")
+        grid_cells = set(self.get_grid(metrics, quantiles, windows, first_quarter, last_quarter))
+        is_in_grid = [SweepCell(*cell) in grid_cells for cell in results[SWEEP_CELL_COLUMNS].itertuples(index=False)]
+        return results[is_in_grid].reset_index(drop=True)
+
+    def _run_tasks(self, tasks: list) -> None:
+        returns_values = self.returns.to_numpy(dtype=float)
+        returns_memory = shared_memory.SharedMemory(create=True, size=max(returns_values.nbytes, 1))
+        try:
+            np.ndarray(returns_values.shape, dtype=float, buffer=returns_memory.buf)[:] = returns_values
+            worker_args = (returns_memory.name, returns_values.shape, self.returns.index, self.returns.columns, self.panels, self.baseline_symbol)
+
+            with ProcessPoolExecutor(max_workers=self.n_workers, initializer=_init_sweep_worker, initargs=worker_args) if self.n_workers > 1 else nullcontext() as executor:
+                if not executor:
+                    _init_sweep_worker(*worker_args)
+
+                mapper = executor.map if executor else map
+                try:
+                    for rows in mapper(_run_sweep_task, tasks):
+                        self._append_results(rows)
+                finally:
+                    if not executor:
+                        _close_sweep_worker()
+        finally:
+            returns_memory.close()
+            returns_memory.unlink()
@@ -0,0 +1,154 @@
+""" Quantile sorted portfolios of many metrics and rebalancing dates, formed and evaluated with array operations """
+from dataclasses import dataclass
+import warnings
+
+import numpy as np
+import pandas as pd
+
+EXCLUDED = -1 # Portfolio of the companies that are not in any portfolio: no data in the study period or outliers
+
+
+def to_quarter_index(index: pd.Index) -> pd.PeriodIndex:
+    """ Quarters of an index of dates (like the index of the MetricsFetcher panels) or periods (like the one of the ReturnsFetcher returns) """
+    if isinstance(index, pd.PeriodIndex):
+        return index.asfreq("Q")
+
+    return pd.PeriodIndex(pd.to_datetime(index), freq="Q")
+
+
+@dataclass
+class QuantilePortfolios:
+    """
+    Attributes:
+        memberships (pd.DataFrame): Portfolio of every ticker (rows) for every (metric, rebalance date) (columns). 0 holds the
+            companies with the lowest metric averages. EXCLUDED for companies that are not in any portfolio.
+        returns (pd.DataFrame): Equally weighted return of every (metric, rebalance date, portfolio) (columns) in every quarter
+            of its investment period (rows). NaN outside of the investment period.
+    """
+    memberships: pd.DataFrame
+    returns: pd.DataFrame
+    invest_quarters: int
+
+    def get_returns(self, metric: str, rebalance_date) -> pd.DataFrame:
+        """ Returns of the portfolios of one metric and rebalance date, only for their investment period. One column per portfolio """
+        rebalance_quarter = pd.Period(rebalance_date, freq="Q")
+        returns = self.returns[metric][rebalance_quarter]
+        return returns[(returns.index >= rebalance_quarter) & (returns.index < rebalance_quarter + self.invest_quarters)]
+
+
+class QuantilePortfolioBuilder:
+    """
+    Replaces the portfolio formation of the notebooks, one metric at a time, with one pass over all metrics and rebalancing dates:
+        1. The metric of every company is averaged over the study period, the study_quarters quarters before the rebalance date.
+        2. Companies whose average is further than iqr_times IQRs from the quartiles of the averages are left out.
+        3. The rest are split at the quantiles of their averages. A company is in portfolio i when its average is at least the i-th quantile.
+        4. The returns of the portfolios are the mean of the returns of their companies, over the invest_quarters quarters from the rebalance date.
+
+    Memberships are kept as a ticker by (metric, rebalance date, portfolio) matrix, so the returns of every portfolio are
+    one matrix product with the returns matrix.
+    """
+    def __init__(self, quantiles: list[float]=[0.5], study_quarters: int=40, invest_quarters: int=4, iqr_times: float | None=1.5):
+        """
+        Args:
+            quantiles (list[float], optional): Quantiles that split the companies, len(quantiles) + 1 portfolios. [0.5] splits them at the median.
+            iqr_times (float | None, optional): Width of the outlier filter in IQRs. None keeps every company.
+        """
+        self.quantiles = sorted(quantiles)
+        self.study_quarters = study_quarters
+        self.invest_quarters = invest_quarters
+        self.iqr_times = iqr_times
+
+    @classmethod
+    def with_n_quantiles(cls, n_quantiles: int, **kwargs) -> "QuantilePortfolioBuilder":
+        """ Builder of n_quantiles portfolios with the same number of companies, e.g. 5 for quintiles """
+        return cls(quantiles=[i/n_quantiles for i in range(1, n_quantiles)], **kwargs)
+
+    @property
+    def n_portfolios(self) -> int:
+        return len(self.quantiles) + 1
+
+    def get_metric_averages(self, values: np.ndarray, rebalance_positions: np.ndarray) -> np.ndarray:
+        """ Mean of the non NaN values of the study period of every rebalance date.
+
+        Args:
+            values (np.ndarray): Metric values of shape (metrics, quarters, tickers)
+            rebalance_positions (np.ndarray): Positions of the rebalance dates in the quarters axis
+
+        Returns:
+            np.ndarray: Averages of shape (metrics, rebalance dates, tickers). NaN when there is no data in the study period
+        """
+        is_value = ~np.isnan(values)
+        zeros = np.zeros_like(values[:, :1])
+        cumulative_sums = np.concatenate([zeros, np.cumsum(np.where(is_value, values, 0), axis=1)], axis=1)
+        cumulative_counts = np.concatenate([zeros, np.cumsum(is_value, axis=1)], axis=1)
+
+        study_starts = np.maximum(rebalance_positions - self.study_quarters, 0)
+        sums = cumulative_sums[:, rebalance_positions] - cumulative_sums[:, study_starts]
+        counts = cumulative_counts[:, rebalance_positions] - cumulative_counts[:, study_starts]
+
+        averages = np.full_like(sums, np.NaN)
+        np.divide(sums, counts, out=averages, where=counts > 0)
+        return averages
+
+    def get_portfolio_numbers(self, averages: np.ndarray) -> np.ndarray:
+        """ Portfolio of every company for every (metric, rebalance date), EXCLUDED when it is not in any. Same shape as averages """
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning) # Metrics with no data in a study period give all NaN slices
+            if self.iqr_times is not None:
+                first_quartiles, third_quartiles = np.nanquantile(averages, [0.25, 0.75], axis=-1, keepdims=True)
+                iqrs = third_quartiles - first_quartiles
+                is_outlier = (averages < first_quartiles - self.iqr_times*iqrs) | (averages > third_quartiles + self.iqr_times*iqrs)
+                averages = np.where(is_outlier, np.NaN, averages)
+
+            breakpoints = np.nanquantile(averages, self.quantiles, axis=-1, keepdims=True)
+
+        portfolio_numbers = (averages[np.newaxis] >= breakpoints).sum(axis=0)
+        return np.where(np.isnan(averages), EXCLUDED, portfolio_numbers)
+
+    def build(self, panels: dict, returns: pd.DataFrame, rebalance_dates: list) -> QuantilePortfolios:
+        """
+        Args:
+            panels (dict): {metric: panel}, with the panels of MetricsFetcher.fetch. One row per quarter and one column per ticker.
+            returns (pd.DataFrame): Quarterly returns, one row per quarter and one column per ticker, like pd.DataFrame(ReturnsFetcher.fetch(...)[0]).
+            rebalance_dates (list): First quarter of every investment period, as anything pd.Period understands ("2010Q1", a date, ...).
+        """
+        metrics = list(panels.keys())
+        rebalance_quarters = pd.PeriodIndex([pd.Period(rebalance_date, freq="Q") for rebalance_date in rebalance_dates])
+        return_quarters = to_quarter_index(returns.index)
+
+        # Companies without returns are sorted like the rest, but don't add to the returns of their portfolio
+        tickers = pd.Index([]).append([panel.columns for panel in panels.values()]).unique()
+
+        # Every metric on the same quarter and ticker axes: (metrics, quarters, tickers)
+        panel_quarters = [to_quarter_index(panel.index) for panel in panels.values()]
+        all_quarters = pd.Index([]).append(panel_quarters + [rebalance_quarters])
+        quarters = pd.period_range(all_quarters.min(), all_quarters.max(), freq="Q")
+        values = np.stack([panel.set_axis(quarters_of_panel).groupby(level=0).first().reindex(index=quarters, columns=tickers).to_numpy(dtype=float)
+                           for panel, quarters_of_panel in zip(panels.values(), panel_quarters)]) if metrics else np.empty((0, len(quarters), len(tickers)))
+
+        averages = self.get_metric_averages(values, quarters.get_indexer(rebalance_quarters))
+        portfolio_numbers = self.get_portfolio_numbers(averages)
+
+        # One hot memberships: (tickers, metrics * rebalance dates * portfolios), equally weighted through the counts below
+        memberships = (portfolio_numbers[..., np.newaxis] == np.arange(self.n_portfolios)).transpose(2, 0, 1, 3).reshape(len(tickers), -1).astype(float)
+
+        # Mean of the non NaN returns of the members of every portfolio in every quarter, for all the portfolios at once
+        return_values = returns.reindex(columns=tickers).to_numpy(dtype=float)
+        has_return = ~np.isnan(return_values)
+        return_sums = np.where(has_return, return_values, 0) @ memberships
+        return_counts = has_return.astype(float) @ memberships
+        portfolio_returns = np.full_like(return_sums, np.NaN)
+        np.divide(return_sums, return_counts, out=portfolio_returns, where=return_counts > 0)
+
+        # Only the investment period of every rebalance date is kept
+        rebalance_ordinals = np.repeat(np.tile(rebalance_quarters.asi8, len(metrics)), self.n_portfolios)
+        quarters_since_rebalance = return_quarters.asi8[:, np.newaxis] - rebalance_ordinals[np.newaxis, :]
+        portfolio_returns[(quarters_since_rebalance < 0) | (quarters_since_rebalance >= self.invest_quarters)] = np.NaN
+
+        return QuantilePortfolios(
+            memberships=pd.DataFrame(portfolio_numbers.transpose(2, 0, 1).reshape(len(tickers), -1), index=tickers,
+                                     columns=pd.MultiIndex.from_product([metrics, rebalance_quarters], names=["metric", "rebalance_date"])),
+            returns=pd.DataFrame(portfolio_returns, index=return_quarters,
+                                 columns=pd.MultiIndex.from_product([metrics, rebalance_quarters, range(self.n_portfolios)], names=["metric", "rebalance_date", "portfolio"])),
+            invest_quarters=self.invest_quarters
+        )
@@ -0,0 +1,159 @@
+""" Statistics of many portfolio return series against a baseline, computed for all the series at once """
+from enum import Enum
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+
+class MultipleTesting(Enum):
+    """ Correction of the p-values of many tests run together """
+    NONE = 1
+    BONFERRONI = 2
+    HOLM = 3 # Step down Bonferroni, controls the family wise error rate like Bonferroni with more power
+    BENJAMINI_HOCHBERG = 4 # Controls the false discovery rate
+
+
+def summarize_returns(returns: pd.DataFrame) -> pd.DataFrame:
+    """ The statistics of the notebooks' tables for every column of returns, skipping NaNs like pd.Series does. One row per column """
+    values = returns.to_numpy(dtype=float)
+    means, variances, n_values = _nan_moments(values)
+    summary = {
+        "variance": variances,
+        "mean": means,
+        "std": np.sqrt(variances),
+        "min": _nan_reduce(np.nanmin, values, n_values),
+        "median": _nan_reduce(np.nanmedian, values, n_values),
+        "max": _nan_reduce(np.nanmax, values, n_values),
+        "n": n_values,
+    }
+
+    return pd.DataFrame(summary, index=returns.columns)
+
+def _nan_moments(values: np.ndarray, axis: int=0) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """ Mean, sample variance (ddof=1) and number of the non NaN values along axis. NaN when there are too few values """
+    is_value = ~np.isnan(values)
+    n_values = is_value.sum(axis=axis)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.where(is_value, values, 0).sum(axis=axis)/n_values
+        deviations = np.where(is_value, values - np.expand_dims(means, axis), 0)
+        variances = np.where(n_values > 1, (deviations**2).sum(axis=axis)/(n_values - 1), np.NaN)
+
+    return means, variances, n_values
+
+def _nan_reduce(function, values: np.ndarray, n_values: np.ndarray) -> np.ndarray:
+    """ function along the rows of the columns with values, NaN for the empty ones (instead of the warnings of numpy) """
+    result = np.full(values.shape[1], np.NaN)
+    has_values = n_values > 0
+    if has_values.any():
+        result[has_values] = function(values[:, has_values], axis=0)
+    return result
+
+def _get_differences(returns: pd.DataFrame, baseline: pd.Series) -> np.ndarray:
+    """ returns - baseline for every column, NaN where either is missing, so only complete pairs are compared """
+    return returns.to_numpy(dtype=float) - baseline.reindex(returns.index).to_numpy(dtype=float)[:, np.newaxis]
+
+def _t_statistics(differences: np.ndarray, axis: int=0) -> tuple[np.ndarray, np.ndarray]:
+    """ t statistic of the mean of the non NaN differences against 0 and the number of differences used, along axis """
+    means, variances, n_differences = _nan_moments(differences, axis)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t_statistics = means/np.sqrt(variances/n_differences)
+
+    return t_statistics, n_differences
+
+def paired_t_tests(returns: pd.DataFrame, baseline: pd.Series) -> pd.DataFrame:
+    """ Paired t-test of every column of returns against baseline, like stats.ttest_rel on the quarters where both have returns.
+
+    Returns:
+        pd.DataFrame: t_statistic, p_value (two sided) and n, the number of pairs, of every column
+    """
+    t_statistics, n_differences = _t_statistics(_get_differences(returns, baseline))
+    p_values = np.where(n_differences > 1, 2*stats.t.sf(np.abs(t_statistics), np.maximum(n_differences - 1, 1)), np.NaN)
+
+    return pd.DataFrame({"t_statistic": t_statistics, "p_value": p_values, "n": n_differences}, index=returns.columns)
+
+
+def _bootstrap_exceedances(centered_differences: np.ndarray, observed_t_statistics: np.ndarray, n_resamples: int,
+                           block_length: int, seed_sequence: np.random.SeedSequence) -> np.ndarray:
+    """ Number of resamples of every column whose |t| is at least the observed |t|. Module level so it can be shipped to worker processes """
+    rng = np.random.default_rng(seed_sequence)
+    n_quarters = len(centered_differences)
+    if n_quarters == 0:
+        return np.zeros(centered_differences.shape[1], dtype=int)
+    n_blocks = -(-n_quarters // block_length)
+
+    # Circular blocks of consecutive quarters, the same quarters for every column so their correlation is kept: (resamples, quarters)
+    block_starts = rng.integers(0, n_quarters, size=(n_resamples, n_blocks))
+    quarters = ((block_starts[:, :, np.newaxis] + np.arange(block_length)) % n_quarters).reshape(n_resamples, -1)[:, :n_quarters]
+
+    resampled_t_statistics, _ = _t_statistics(centered_differences[quarters], axis=1)
+    return (np.abs(resampled_t_statistics) >= np.abs(observed_t_statistics)).sum(axis=0)
+
+def block_bootstrap_p_values(returns: pd.DataFrame, baseline: pd.Series, n_resamples: int=10000, block_length: int=4,
+                             seed: int=0, n_workers: int=1, resamples_per_task: int=250) -> pd.DataFrame:
+    """ Paired tests of every column of returns against baseline with p-values from a circular block bootstrap instead
+    of the t distribution, for returns that are autocorrelated or far from normal.
+
+    The differences are centered so the null hypothesis, a mean difference of 0, holds, and resampled in blocks of
+    block_length quarters. The p-value is the share of resamples whose |t| is at least the observed one.
+
+    Args:
+        seed (int, optional): The resamples are split in tasks of resamples_per_task, each with its own seed derived from seed,
+            so the p-values only depend on seed and not on n_workers.
+        n_workers (int, optional): Number of processes the tasks are split across. 1 (default) runs them in this process.
+
+    Returns:
+        pd.DataFrame: t_statistic, p_value and n of every column
+    """
+    differences = _get_differences(returns, baseline)
+    observed_t_statistics, n_differences = _t_statistics(differences)
+    centered_differences = differences - _nan_moments(differences)[0]
+
+    task_sizes = [min(resamples_per_task, n_resamples - start) for start in range(0, n_resamples, resamples_per_task)]
+    seed_sequences = np.random.SeedSequence(seed).spawn(len(task_sizes))
+    with ProcessPoolExecutor(max_workers=n_workers) if n_workers > 1 else nullcontext() as executor:
+        mapper = executor.map if executor else map
+        exceedances = sum(mapper(_bootstrap_exceedances, repeat(centered_differences), repeat(observed_t_statistics), task_sizes,
+                                 repeat(block_length), seed_sequences), np.zeros(differences.shape[1], dtype=int))
+
+    # The observed sample counts as one of the resamples, so p-values are never 0
+    p_values = np.where(n_differences > 1, (exceedances + 1)/(n_resamples + 1), np.NaN)
+    return pd.DataFrame({"t_statistic": observed_t_statistics, "p_value": p_values, "n": n_differences}, index=returns.columns)
+
+
+def adjust_p_values(p_values, method: MultipleTesting=MultipleTesting.HOLM):
+    """ p-values corrected for running all the tests together. NaNs are left as they are and don't count as tests.
+    Returns the same type as p_values (np.ndarray, pd.Series or list).
+    """
+    values = np.asarray(p_values, dtype=float)
+    adjusted_values = values.copy()
+    is_test = ~np.isnan(values)
+    tested_values = values[is_test]
+    n_tests = len(tested_values)
+
+    match method:
+        case MultipleTesting.BONFERRONI:
+            adjusted_tested_values = tested_values*n_tests
+        case MultipleTesting.HOLM:
+            order = np.argsort(tested_values, kind="stable")
+            adjusted_sorted_values = np.maximum.accumulate(tested_values[order]*(n_tests - np.arange(n_tests)))
+            adjusted_tested_values = np.empty(n_tests)
+            adjusted_tested_values[order] = adjusted_sorted_values
+        case MultipleTesting.BENJAMINI_HOCHBERG:
+            order = np.argsort(tested_values, kind="stable")[::-1] # From the largest p-value down
+            adjusted_sorted_values = np.minimum.accumulate(tested_values[order]*n_tests/np.arange(n_tests, 0, -1))
+            adjusted_tested_values = np.empty(n_tests)
+            adjusted_tested_values[order] = adjusted_sorted_values
+        case _:
+            adjusted_tested_values = tested_values
+
+    adjusted_values[is_test] = np.minimum(adjusted_tested_values, 1)
+
+    if isinstance(p_values, pd.Series):
+        return pd.Series(adjusted_values, index=p_values.index, name=p_values.name)
+    if isinstance(p_values, list):
+        return adjusted_values.tolist()
+    return adjusted_values.reshape(np.shape(p_values))
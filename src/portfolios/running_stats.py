@@ -0,0 +1,145 @@
+""" Per company aggregates of a metric panel that are updated one quarter at a time instead of recomputed over the history """
+import numpy as np
+import pandas as pd
+
+from .quantile_portfolios import QuantilePortfolioBuilder, to_quarter_index
+
+
+class RunningMetricStats:
+    """
+    Aggregates of every company of a metric panel, kept up to date as quarters are appended:
+        count, mean and variance (ddof=1) of all the non NaN values of the history, updated with Welford's algorithm
+        window_sum and window_count of the non NaN values of the last window_quarters quarters, the study period of
+            QuantilePortfolioBuilder, updated with a ring buffer of those quarters
+
+    Appending a quarter costs O(companies), whatever the length of the history. The aggregates are the same as the ones
+    computed over the whole panel, and get_memberships gives the portfolios QuantilePortfolioBuilder.build would form at
+    the quarter after the last one appended.
+    """
+    def __init__(self, tickers: list[str], window_quarters: int=40):
+        self.tickers = pd.Index(tickers)
+        self.window_quarters = window_quarters
+        self.last_quarter = None # pd.Period of the last quarter appended
+
+        n_tickers = len(self.tickers)
+        self.count = np.zeros(n_tickers, dtype=int)
+        self._mean = np.zeros(n_tickers)
+        self._sum_of_squares = np.zeros(n_tickers) # Of the deviations from the mean, M2 in Welford's algorithm
+
+        self.window_values = np.full((window_quarters, n_tickers), np.NaN) # Ring buffer, the oldest quarter at self._window_position
+        self.window_sum = np.zeros(n_tickers)
+        self.window_count = np.zeros(n_tickers, dtype=int)
+        self._window_position = 0
+
+    @classmethod
+    def from_panel(cls, panel: pd.DataFrame, window_quarters: int=40) -> "RunningMetricStats":
+        """ Aggregates of the history of a panel of MetricsFetcher, computed at once. Quarters missing from its index count as NaN """
+        stats = cls(panel.columns, window_quarters)
+        if panel.empty:
+            return stats
+
+        quarterly_panel = cls._to_quarterly_panel(panel)
+        values = quarterly_panel.to_numpy(dtype=float)
+        is_value = ~np.isnan(values)
+
+        stats.count = is_value.sum(axis=0)
+        has_values = stats.count > 0
+        stats._mean[has_values] = np.nansum(values[:, has_values], axis=0)/stats.count[has_values]
+        stats._sum_of_squares = (np.where(is_value, values - stats._mean, 0)**2).sum(axis=0)
+
+        last_values = values[-window_quarters:]
+        stats.window_values[window_quarters - len(last_values):] = last_values
+        stats.window_sum = np.where(np.isnan(last_values), 0, last_values).sum(axis=0)
+        stats.window_count = (~np.isnan(last_values)).sum(axis=0)
+        stats.last_quarter = quarterly_panel.index[-1]
+        return stats
+
+    @staticmethod
+    def _to_quarterly_panel(panel: pd.DataFrame) -> pd.DataFrame:
+        """ Panel on a full range of quarters, like QuantilePortfolioBuilder aligns it """
+        quarters = to_quarter_index(panel.index)
+        panel = panel.set_axis(quarters).groupby(level=0).first()
+        return panel.reindex(pd.period_range(quarters.min(), quarters.max(), freq="Q"))
+
+    def _add_tickers(self, new_tickers: list[str]) -> None:
+        n_new_tickers = len(new_tickers)
+        self.tickers = self.tickers.append(pd.Index(new_tickers))
+        self.count = np.concatenate([self.count, np.zeros(n_new_tickers, dtype=int)])
+        self._mean = np.concatenate([self._mean, np.zeros(n_new_tickers)])
+        self._sum_of_squares = np.concatenate([self._sum_of_squares, np.zeros(n_new_tickers)])
+        self.window_values = np.concatenate([self.window_values, np.full((self.window_quarters, n_new_tickers), np.NaN)], axis=1)
+        self.window_sum = np.concatenate([self.window_sum, np.zeros(n_new_tickers)])
+        self.window_count = np.concatenate([self.window_count, np.zeros(n_new_tickers, dtype=int)])
+
+    def _push(self, values: np.ndarray) -> None:
+        """ Adds the values of one quarter, NaN for the companies without data, in O(companies) """
+        is_value = ~np.isnan(values)
+
+        # Welford's update of the mean and the sum of squares of the companies with a value
+        self.count += is_value
+        deltas = np.where(is_value, values - self._mean, 0)
+        self._mean += np.divide(deltas, self.count, out=np.zeros_like(deltas), where=is_value)
+        self._sum_of_squares += np.where(is_value, deltas*(values - self._mean), 0)
+
+        # The oldest quarter of the window leaves, the new one takes its place
+        leaving_values = self.window_values[self._window_position]
+        is_leaving_value = ~np.isnan(leaving_values)
+        self.window_sum += np.where(is_value, values, 0) - np.where(is_leaving_value, leaving_values, 0)
+        self.window_count += is_value.astype(int) - is_leaving_value
+        self.window_values[self._window_position] = values
+        self._window_position = (self._window_position + 1) % self.window_quarters
+
+    def append_quarter(self, quarter, values: pd.Series) -> None:
+        """ Adds the values of the companies for quarter, which must come after the last quarter appended. Companies that are
+        not in values have no data for the quarter, tickers that are new are added. Skipped quarters count as NaN.
+
+        Args:
+            quarter: Anything pd.Period understands, like an index label of the panels of MetricsFetcher.
+            values (pd.Series): Value of every company with data, indexed by ticker.
+        """
+        quarter = pd.Period(quarter, freq="Q")
+        if self.last_quarter is not None and quarter <= self.last_quarter:
+            raise ValueError(f"Quarter {quarter} is not after the last quarter appended, {self.last_quarter}")
+
+        new_tickers = values.index.difference(self.tickers)
+        if len(new_tickers):
+            self._add_tickers(new_tickers.to_list())
+
+        if self.last_quarter is not None:
+            for _ in range(min(quarter.ordinal - self.last_quarter.ordinal - 1, self.window_quarters)):
+                self._push(np.full(len(self.tickers), np.NaN))
+
+        self._push(values.reindex(self.tickers).to_numpy(dtype=float))
+        self.last_quarter = quarter
+
+    @property
+    def mean(self) -> np.ndarray:
+        return np.where(self.count > 0, self._mean, np.NaN)
+
+    @property
+    def variance(self) -> np.ndarray:
+        variance = np.full(len(self.tickers), np.NaN)
+        np.divide(self._sum_of_squares, self.count - 1, out=variance, where=self.count > 1)
+        return variance
+
+    @property
+    def window_mean(self) -> np.ndarray:
+        """ Average of the last window_quarters quarters, the metric average QuantilePortfolioBuilder sorts the companies by """
+        window_mean = np.full(len(self.tickers), np.NaN)
+        np.divide(self.window_sum, self.window_count, out=window_mean, where=self.window_count > 0)
+        return window_mean
+
+    def to_frame(self) -> pd.DataFrame:
+        """ One row per ticker with every aggregate """
+        return pd.DataFrame({"count": self.count, "mean": self.mean, "variance": self.variance, "window_sum": self.window_sum,
+                             "window_count": self.window_count, "window_mean": self.window_mean}, index=self.tickers)
+
+    def get_memberships(self, builder: QuantilePortfolioBuilder) -> pd.Series:
+        """ Portfolio of every ticker at the rebalance date right after the last quarter appended, from the window averages
+        alone. Same as the memberships of builder.build for that rebalance date.
+        """
+        if builder.study_quarters != self.window_quarters:
+            raise ValueError(f"The study period of the builder, {builder.study_quarters} quarters, is not the window of the stats, {self.window_quarters} quarters")
+
+        rebalance_quarter = self.last_quarter + 1 if self.last_quarter is not None else None
+        return pd.Series(builder.get_portfolio_numbers(self.window_mean), index=self.tickers, name=rebalance_quarter)
@@ -0,0 +1,68 @@
+import unittest
+import tempfile
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+from scipy.ndimage import uniform_filter1d
+
+import os
+import sys
+sys.path.append(os.path.join(os.getcwd()))
+from src.cleaning.panel_cleaning import PanelCleaningPipeline, DropLongNaNRuns, FillFromSameQuarter, Smooth, RemoveOutliers
+
+
+def handle_nans(df: pd.DataFrame) -> pd.DataFrame:
+    """ handle_nans of the notebooks """
+    consecutive_nans = df.isnull().rolling(window=5).sum()
+    df = df.drop(columns=df.columns[consecutive_nans.max() > 4])
+    df = df.fillna(df.shift(4))
+    return df.fillna(df.shift(-4))
+
+
+class PanelCleaningTestCase(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        values = rng.normal(size=(60, 30))
+        values[rng.random(values.shape) < 0.15] = np.NaN
+        values[10:16, 3] = np.NaN # Long NaN run
+        values[0:5, 7] = np.NaN
+        values[20, 9] = 40 # Outlier
+        self.panel = pd.DataFrame(values, index=pd.period_range("2000Q1", periods=60, freq="Q"), columns=[f"TICK{i}" for i in range(30)])
+
+    def test_matches_notebook_cleaning(self):
+        cleaned_panel = PanelCleaningPipeline([DropLongNaNRuns(4), FillFromSameQuarter(), Smooth(2), RemoveOutliers(1.5)]).clean(self.panel)
+
+        expected_panel = handle_nans(self.panel)
+        self.assertEqual(cleaned_panel.dropped_companies, ["TICK3", "TICK7"])
+        self.assertEqual(cleaned_panel.log[1].imputed_cells, int(self.panel.drop(columns=["TICK3", "TICK7"]).isna().sum().sum() - expected_panel.isna().sum().sum()))
+
+        expected_panel = expected_panel.apply(lambda column: uniform_filter1d(column, 2))
+        stacked_panel = expected_panel.stack()
+        first_quartile, third_quartile = stacked_panel.quantile(0.25), stacked_panel.quantile(0.75)
+        iqr = third_quartile - first_quartile
+        expected_panel = expected_panel.where(expected_panel.isna() | expected_panel.apply(lambda column: column.between(first_quartile - 1.5*iqr, third_quartile + 1.5*iqr)))
+
+        assert_frame_equal(cleaned_panel.panel, expected_panel)
+        self.assertEqual(cleaned_panel.log[3].removed_cells, int(cleaned_panel.panel.isna().sum().sum() - handle_nans(self.panel).apply(lambda column: uniform_filter1d(column, 2)).isna().sum().sum()))
+
+    def test_imputed_cells(self):
+        cleaned_panel = PanelCleaningPipeline([FillFromSameQuarter()]).clean(self.panel)
+        assert_frame_equal(cleaned_panel.imputed, self.panel.isna() & cleaned_panel.panel.notna())
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as cache_folder_path:
+            pipeline = PanelCleaningPipeline([FillFromSameQuarter(), Smooth(3)], cache_folder_path)
+            cleaned_panel = pipeline.clean(self.panel)
+            self.assertEqual(len(os.listdir(cache_folder_path)), 1)
+
+            assert_frame_equal(pipeline.clean(self.panel.copy()).panel, cleaned_panel.panel)
+            self.assertEqual(len(os.listdir(cache_folder_path)), 1)
+
+            # Other parameters or other data are cleaned again
+            PanelCleaningPipeline([FillFromSameQuarter(), Smooth(2)], cache_folder_path).clean(self.panel)
+            pipeline.clean(self.panel.iloc[:-1])
+            self.assertEqual(len(os.listdir(cache_folder_path)), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+import tempfile
+import warnings
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+import os
+import sys
+sys.path.append(os.path.join(os.getcwd()))
+from src.data_fetchers.classification_fetcher import ClassificationFetcher, UnknownTickers, load_classification_table
+
+
+class ClassificationFetcherTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.data_file_path = os.path.join(self.temp_dir.name, "classification.csv")
+        self.write_classification_file([
+            ("MSFT", "Microsoft", "Information Technology", "Systems Software"),
+            ("AAPL", "Apple Inc.", "Information Technology", "Technology Hardware"),
+            ("ABT", "Abbott", "Health Care", "Health Care Equipment"),
+            ("EXC", "Exelon", "Utilities", "Electric Utilities"),
+        ])
+        self.fetcher = ClassificationFetcher(self.data_file_path)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write_classification_file(self, rows: list):
+        pd.DataFrame(rows, columns=["Symbol", "Security", "GICS Sector", "GICS Sub-Industry"]).to_csv(self.data_file_path, index=False)
+
+    def test_fetch_matches_full_read(self):
+        tickers = ["EXC", "MSFT"]
+        expected_data = pd.read_csv(self.data_file_path, index_col="Symbol")[["GICS Sector", "GICS Sub-Industry"]].T
+        expected_data = expected_data.rename({"GICS Sector": "sector", "GICS Sub-Industry": "industry"})[tickers]
+
+        assert_frame_equal(self.fetcher.fetch(tickers), expected_data, check_names=False)
+        self.assertEqual(self.fetcher.unknown_tickers, [])
+
+    def test_unknown_tickers_are_reported(self):
+        with warnings.catch_warnings(record=True) as caught_warnings:
+            warnings.simplefilter("always")
+            fetched_data = self.fetcher.fetch(["MSFT", "XXXX", "ABT"])
+
+        self.assertEqual(fetched_data.columns.to_list(), ["MSFT", "ABT"])
+        self.assertEqual(self.fetcher.unknown_tickers, ["XXXX"])
+        self.assertTrue(any(isinstance(warning.message, UnknownTickers) for warning in caught_warnings))
+
+    def test_tickers_by_sector(self):
+        self.assertEqual(self.fetcher.get_tickers_by_sector(), {"Health Care": ["ABT"], "Information Technology": ["MSFT", "AAPL"], "Utilities": ["EXC"]})
+        self.assertEqual(self.fetcher.get_tickers_by_sector(["AAPL", "EXC"]), {"Information Technology": ["AAPL"], "Utilities": ["EXC"]})
+        self.assertEqual(self.fetcher.get_tickers_by_industry(["ABT"]), {"Health Care Equipment": ["ABT"]})
+
+    def test_table_is_parsed_once_per_file_version(self):
+        table = load_classification_table(self.data_file_path)
+        self.assertIs(load_classification_table(self.data_file_path), table)
+        self.assertEqual(table["sector"].dtype, "category")
+
+        self.write_classification_file([("TXT", "Textron", "Industrials", "Aerospace & Defense")])
+        os.utime(self.data_file_path, ns=(0, 0)) # Make sure the mtime changes
+        self.assertEqual(ClassificationFetcher(self.data_file_path).fetch(["TXT"]).loc["sector", "TXT"], "Industrials")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+from unittest import mock
+import tempfile
+from pandas.testing import assert_frame_equal
+
+import os
+import sys
+sys.path.append(os.path.join(os.getcwd()))
+from openpyxl.worksheet._read_only import ReadOnlyWorksheet
+
+from src.data_fetchers.metrics_fetcher import MetricsFetcher, ExtractionEngine
+from src.configs.file_style_configs_by_metric import file_style_configs_by_metric
+from tests.synthetic_workbooks import write_sample_companies_folder, write_stale_dimensions
+
+
+class ExtractionEngineTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.data_folder_path = self.temp_dir.name
+
+        write_sample_companies_folder(self.data_folder_path)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_bulk_engine_matches_cellwise_engine(self):
+        test_metrics = ["Pretax ROA", "Gross Margin"]
+        cellwise_fetcher = MetricsFetcher(self.data_folder_path, file_style_configs_by_metric)
+        bulk_fetcher = MetricsFetcher(self.data_folder_path, file_style_configs_by_metric, extraction_engine=ExtractionEngine.BULK)
+
+        cellwise_data = cellwise_fetcher._load_from_excel_files(test_metrics)
+        bulk_data = bulk_fetcher._load_from_excel_files(test_metrics)
+
+        for test_metric in test_metrics:
+            assert_frame_equal(bulk_fetcher.get_dataframe(bulk_data[test_metric]),
+                               cellwise_fetcher.get_dataframe(cellwise_data[test_metric]))
+
+    def test_stale_dimensions(self):
+        """ Read only sheets take their size from <dimension>, which some exporters leave at A1 """
+        test_metrics = ["Pretax ROA", "Gross Margin"]
+        cellwise_fetcher = MetricsFetcher(self.data_folder_path, file_style_configs_by_metric)
+        cellwise_data = cellwise_fetcher._load_from_excel_files(test_metrics)
+
+        for file_name in os.listdir(self.data_folder_path):
+            write_stale_dimensions(os.path.join(self.data_folder_path, file_name))
+        bulk_fetcher = MetricsFetcher(self.data_folder_path, file_style_configs_by_metric, extraction_engine=ExtractionEngine.BULK)
+        bulk_data = bulk_fetcher._load_from_excel_files(test_metrics)
+
+        for test_metric in test_metrics:
+            bulk_panel = bulk_fetcher.get_dataframe(bulk_data[test_metric])
+            self.assertFalse(bulk_panel.empty)
+            assert_frame_equal(bulk_panel, cellwise_fetcher.get_dataframe(cellwise_data[test_metric]))
+
+    def test_bulk_engine_reads_every_sheet_once(self):
+        """ Read only sheets parse their XML on every read, so the labels, dates, company and metric rows of all the
+        metrics come from a single read of the metric sheet. Titles of other sheets are only read up to the title row.
+        """
+        bulk_fetcher = MetricsFetcher(self.data_folder_path, file_style_configs_by_metric, extraction_engine=ExtractionEngine.BULK)
+        with mock.patch.object(ReadOnlyWorksheet, "_cells_by_row", autospec=True, side_effect=ReadOnlyWorksheet._cells_by_row) as cells_by_row:
+            bulk_fetcher._load_from_excel_files(["Pretax ROA", "Gross Margin", "ROIC"])
+
+        whole_sheet_reads = [call for call in cells_by_row.call_args_list if call.args[4] is None] # max_row
+        self.assertEqual(len(whole_sheet_reads), 4) # The metric sheet of the 4 complete workbooks
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+import unittest
+import tempfile
+import json
+import zipfile
+from dataclasses import replace
+import openpyxl as opx
+
+import os
+import sys
+sys.path.append(os.path.join(os.getcwd()))
+from src.data_fetchers.metrics_fetcher import MetricsFetcher, ExtractionEngine, extract_metrics_of_company_with_report
+from src.data_fetchers.extraction_report import ExtractionHook, JsonReportWriter, FailureReason, STAGES
+from src.data_fetchers.quarter_window import QuarterWindow
+from src.configs.file_style_configs_by_metric import file_style_configs_by_metric
+from tests.synthetic_workbooks import write_companies_folder, quarter_labels
+
+
+class RecordingHook(ExtractionHook):
+    def __init__(self):
+        self.file_reports = []
+        self.reports = []
+
+    def on_file(self, file_report):
+        self.file_reports.append(file_report)
+
+    def on_report(self, report):
+        self.reports.append(report)
+
+
+class ExtractionReportTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.data_folder_path = os.path.join(self.temp_dir.name, "companies_data")
+        self.pickled_data_path = os.path.join(self.temp_dir.name, "pickled_data")
+        os.mkdir(self.pickled_data_path)
+
+        write_companies_folder(self.data_folder_path, {
+            "AAPL": ("A", "Apple Inc", quarter_labels(2019, 6, 3), {"Pretax ROA": [1, 2, 3, 4, 5, 6]}),
+            "MSFT": ("A", "Microsoft Corp", quarter_labels(2018, 4, 1), {"Gross Margin": [1, 2, 3, 4]}),
+            "TXT": ("B", "Textron Inc", quarter_labels(2020, 4, 1), {"Pretax ROA": [1, 2, 3, 4]}, 3),
+        })
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_report_of_fetch_many(self):
+        hook = RecordingHook()
+        report_file_path = os.path.join(self.temp_dir.name, "report.json")
+        fetcher = MetricsFetcher(self.data_folder_path, file_style_configs_by_metric, show_progress=False,
+                                 report_hooks=[hook, JsonReportWriter(report_file_path)])
+        fetcher.fetch_many(["Pretax ROA", "Gross Margin"], self.pickled_data_path)
+
+        report = fetcher.extraction_report
+        self.assertEqual(hook.reports, [report])
+        self.assertEqual(hook.file_reports, report.file_reports)
+
+        file_table = report.get_file_table().set_index("company_ticker")
+        self.assertEqual(sorted(file_table.index), ["AAPL", "MSFT", "TXT"])
+        self.assertGreater(file_table.loc["AAPL", "cells_read"], 12) # The timestamp row is read ahead to find the years
+        self.assertEqual(file_table.loc["TXT", "cells_read"], 0)
+        self.assertEqual(file_table.loc["AAPL", "bytes_read"], self.get_sheet_bytes("AAPL")) # Loaded whole
+        self.assertEqual(file_table.loc["TXT", "bytes_read"], 0)
+        self.assertTrue((file_table[STAGES] >= 0).all().all())
+        self.assertAlmostEqual(report.get_stage_totals().sum(), file_table["total_time"].sum())
+
+        failures = report.get_failure_table()
+        self.assertEqual(sorted(map(tuple, failures.to_numpy())), [("AAPL", "Gross Margin", "METRIC_NOT_FOUND"),
+                                                                    ("MSFT", "Pretax ROA", "METRIC_NOT_FOUND"),
+                                                                    ("TXT", "Gross Margin", "INCOMPLETE_WORKBOOK"),
+                                                                    ("TXT", "Pretax ROA", "INCOMPLETE_WORKBOOK")])
+
+        with open(report_file_path) as infile:
+            self.assertEqual(json.load(infile), report.to_dict())
+
+    def get_sheet_bytes(self, ticker: str) -> int:
+        with zipfile.ZipFile(os.path.join(self.data_folder_path, f"{ticker}_quarterly.xlsx")) as archive:
+            return sum(info.file_size for info in archive.infolist() if info.filename.startswith("xl/worksheets/"))
+
+    def test_cells_and_bytes_read(self):
+        file_path = os.path.join(self.data_folder_path, "AAPL_quarterly.xlsx")
+        metrics = {"Pretax ROA": file_style_configs_by_metric["Pretax ROA"]}
+
+        # Timestamp and metric rows, once each, and in the window only the cells of the metric row of its quarters
+        _, file_report = extract_metrics_of_company_with_report(file_path, "AAPL", metrics, ExtractionEngine.BULK)
+        self.assertEqual(file_report.cells_read, 12)
+        self.assertGreater(file_report.bytes_read, 0)
+        self.assertLessEqual(file_report.bytes_read, 2*self.get_sheet_bytes("AAPL")) # The title cells are read before the sheet
+        _, file_report = extract_metrics_of_company_with_report(file_path, "AAPL", metrics, ExtractionEngine.BULK, window=QuarterWindow.from_quarters("2020Q1", "2020Q2"))
+        self.assertEqual(file_report.cells_read, 6 + 2)
+
+        # The cellwise engine goes through the timestamp cells outside the window until it moves past it
+        _, full_report = extract_metrics_of_company_with_report(file_path, "AAPL", metrics)
+        _, window_report = extract_metrics_of_company_with_report(file_path, "AAPL", metrics, window=QuarterWindow.from_quarters("2020Q1", "2020Q2"))
+        self.assertGreater(window_report.cells_read, 2 + 2)
+        self.assertLess(window_report.cells_read, full_report.cells_read)
+
+    def test_unrecognized_style_and_missing_sheet_are_recorded(self):
+        workbook = opx.load_workbook(os.path.join(self.data_folder_path, "AAPL_quarterly.xlsx"))
+        workbook.active["A3"] = "Something else"
+        workbook.save(os.path.join(self.data_folder_path, "BAD_quarterly.xlsx"))
+
+        for engine in ExtractionEngine:
+            fetcher = MetricsFetcher(self.data_folder_path, file_style_configs_by_metric, extraction_engine=engine, report=True, show_progress=False)
+            pickled_data_path = os.path.join(self.pickled_data_path, engine.name)
+            os.mkdir(pickled_data_path)
+            fetched_data = fetcher.fetch("Pretax ROA", pickled_data_path)
+            self.assertEqual(fetched_data.columns.to_list(), ["AAPL"])
+            self.assertEqual([file_report.failures for file_report in fetcher.extraction_report.file_reports if file_report.company_ticker == "BAD"],
+                             [{"Pretax ROA": FailureReason.UNRECOGNIZED_STYLE}])
+
+            missing_sheet_configs = {"Pretax ROA": {style: replace(details, metric_sheet_name="Missing Sheet")
+                                                    for style, details in file_style_configs_by_metric["Pretax ROA"].items()},
+                                     "Gross Margin": file_style_configs_by_metric["Gross Margin"]}
+            metrics_of_company, file_report = extract_metrics_of_company_with_report(os.path.join(self.data_folder_path, "MSFT_quarterly.xlsx"),
+                                                                                     "MSFT", missing_sheet_configs, engine)
+            self.assertIsNone(metrics_of_company["Pretax ROA"])
+            self.assertEqual(len(metrics_of_company["Gross Margin"].metric_data), 4)
+            self.assertEqual(file_report.failures, {"Pretax ROA": FailureReason.SHEET_NOT_FOUND})
+
+    def test_only_extracted_files_are_reported(self):
+        MetricsFetcher(self.data_folder_path, file_style_configs_by_metric, show_progress=False).fetch("Pretax ROA", self.pickled_data_path)
+
+        fetcher = MetricsFetcher(self.data_folder_path, file_style_configs_by_metric, report=True, show_progress=False)
+        fetcher.fetch("Pretax ROA", self.pickled_data_path)
+        self.assertEqual(fetcher.extraction_report.file_reports, [])
+
+    def test_no_report_by_default(self):
+        fetcher = MetricsFetcher(self.data_folder_path, file_style_configs_by_metric, show_progress=False)
+        fetcher._load_from_excel_file("Pretax ROA")
+        self.assertIsNone(fetcher.extraction_report)
+        self.assertEqual(sorted(fetcher.companies_with_not_enough_data), ["MSFT", "TXT"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+import tempfile
+
+import os
+import sys
+sys.path.append(os.path.join(os.getcwd()))
+from src.data_fetchers.metrics_fetcher import MetricsFetcher, ExtractionEngine
+from src.configs.file_style_configs_by_metric import file_style_configs_by_metric
+from tests.synthetic_workbooks import generate_companies_folder
+
+
+class GeneratedWorkbooksTestCase(unittest.TestCase):
+    """ The generated workbooks of both styles are read by MetricsFetcher like the real ones """
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.data_folder_path = os.path.join(self.temp_dir.name, "companies_data")
+        self.pickled_data_path = os.path.join(self.temp_dir.name, "pickled_data")
+        os.mkdir(self.pickled_data_path)
+
+        self.styles = generate_companies_folder(self.data_folder_path, n_companies=6, n_quarters=12, n_sheets=5, filler_rows=3, seed=1)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_every_metric_is_extracted_from_both_styles(self):
+        self.assertEqual(set(self.styles.values()), {"A", "B"})
+
+        for engine in ExtractionEngine:
+            pickled_data_path = os.path.join(self.pickled_data_path, engine.name)
+            os.mkdir(pickled_data_path)
+            fetcher = MetricsFetcher(self.data_folder_path, file_style_configs_by_metric, extraction_engine=engine)
+            panels = fetcher.fetch_many(list(file_style_configs_by_metric), pickled_data_path)
+
+            for metric, panel in panels.items():
+                self.assertEqual(sorted(panel.columns), sorted(self.styles), metric)
+                self.assertTrue((panel.notna().sum() <= 12).all())
+                self.assertTrue(panel.isna().any().any()) # "-" blanks
+
+            # Margins are stored as percentages, ratios as plain numbers, both around 10
+            self.assertLess(panels["Gross Margin"].abs().stack().median(), 1)
+            self.assertGreater(panels["Current Ratio"].abs().stack().median(), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+import tempfile
+from pandas.testing import assert_frame_equal
+
+import os
+import sys
+sys.path.append(os.path.join(os.getcwd()))
+from src.data_fetchers.metrics_fetcher import MetricsFetcher
+from src.configs.file_style_configs_by_metric import file_style_configs_by_metric
+from tests.synthetic_workbooks import write_companies_folder, quarter_labels
+
+
+class MetricCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.data_folder_path = os.path.join(self.temp_dir.name, "companies_data")
+        self.pickled_data_path = os.path.join(self.temp_dir.name, "pickled_data")
+        os.mkdir(self.pickled_data_path)
+
+        write_companies_folder(self.data_folder_path, {
+            "AAPL": ("A", "Apple Inc", quarter_labels(2019, 6, 3), {"Pretax ROA": [1, 2, 3, 4, 5, 6]}),
+            "ABT": ("B", "Abbott Laboratories", quarter_labels(2020, 4, 1), {"Pretax ROA": [1, 2, 3, 4]}),
+            "MSFT": ("A", "Microsoft Corp", quarter_labels(2018, 4, 1), {"Gross Margin": [1, 2, 3, 4]}),
+        })
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def fetch(self, metric: str="Pretax ROA"):
+        fetcher = MetricsFetcher(self.data_folder_path, file_style_configs_by_metric)
+        return fetcher, fetcher.fetch(metric, pickled_data_path=self.pickled_data_path)
+
+    def assert_matches_full_extraction(self, fetched_data, metric: str="Pretax ROA"):
+        fetcher = MetricsFetcher(self.data_folder_path, file_style_configs_by_metric)
+        fetcher._load_from_excel_file(metric)
+        assert_frame_equal(fetched_data, fetcher.get_dataframe())
+
+    def test_unchanged_files_are_not_extracted_again(self):
+        fetcher, _ = self.fetch()
+        self.assertEqual((fetcher.cache_stats["Pretax ROA"].hits, fetcher.cache_stats["Pretax ROA"].misses), (0, 3))
+
+        fetcher, fetched_data = self.fetch()
+        self.assertEqual((fetcher.cache_stats["Pretax ROA"].hits, fetcher.cache_stats["Pretax ROA"].misses), (3, 0))
+        self.assertEqual(fetcher.companies_with_not_enough_data, ["MSFT"])
+        self.assertEqual(fetcher.companies_successfully_extracted, 2)
+        self.assert_matches_full_extraction(fetched_data)
+
+    def test_new_changed_and_removed_files(self):
+        self.fetch()
+
+        write_companies_folder(self.data_folder_path, {
+            "ABT": ("B", "Abbott Laboratories", quarter_labels(2020, 5, 1), {"Pretax ROA": [1, 2, 3, 4, 10]}),
+            "EXC": ("B", "Exelon Corp", quarter_labels(2017, 4, 4), {"Pretax ROA": [7, 8, 9, 10]}),
+        })
+        os.remove(os.path.join(self.data_folder_path, "MSFT_quarterly.xlsx"))
+
+        fetcher, fetched_data = self.fetch()
+        cache_stats = fetcher.cache_stats["Pretax ROA"]
+        self.assertEqual((cache_stats.hits, cache_stats.misses, cache_stats.removed), (1, 2, 1))
+        self.assertEqual(sorted(fetched_data.columns), ["AAPL", "ABT", "EXC"])
+        self.assert_matches_full_extraction(fetched_data)
+
+    def test_long_lived_fetcher_sees_added_and_removed_files(self):
+        fetcher = MetricsFetcher(self.data_folder_path, file_style_configs_by_metric)
+        fetcher.fetch("Pretax ROA", pickled_data_path=self.pickled_data_path)
+
+        write_companies_folder(self.data_folder_path, {
+            "EXC": ("B", "Exelon Corp", quarter_labels(2017, 4, 4), {"Pretax ROA": [7, 8, 9, 10]}),
+        })
+        fetched_data = fetcher.fetch("Pretax ROA", pickled_data_path=self.pickled_data_path)
+        cache_stats = fetcher.cache_stats["Pretax ROA"]
+        self.assertEqual((cache_stats.hits, cache_stats.misses, cache_stats.removed), (3, 1, 0))
+        self.assertEqual(sorted(fetched_data.columns), ["AAPL", "ABT", "EXC"])
+
+        os.remove(os.path.join(self.data_folder_path, "AAPL_quarterly.xlsx"))
+        fetched_data = fetcher.fetch("Pretax ROA", pickled_data_path=self.pickled_data_path)
+        cache_stats = fetcher.cache_stats["Pretax ROA"]
+        self.assertEqual((cache_stats.hits, cache_stats.misses, cache_stats.removed), (3, 0, 1))
+        self.assertEqual(sorted(fetched_data.columns), ["ABT", "EXC"])
+        self.assert_matches_full_extraction(fetched_data)
+
+    def test_touched_file_is_a_hit(self):
+        self.fetch()
+        os.utime(os.path.join(self.data_folder_path, "AAPL_quarterly.xlsx"), ns=(0, 0))
+
+        fetcher, _ = self.fetch()
+        self.assertEqual((fetcher.cache_stats["Pretax ROA"].hits, fetcher.cache_stats["Pretax ROA"].misses), (3, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+import tempfile
+from pandas.testing import assert_frame_equal
+
+import os
+import sys
+sys.path.append(os.path.join(os.getcwd()))
+from src.data_fetchers.metrics_fetcher import MetricsFetcher
+from src.configs.file_style_configs_by_metric import file_style_configs_by_metric
+from tests.synthetic_workbooks import write_sample_companies_folder
+
+
+class FetchManyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.data_folder_path = self.temp_dir.name
+
+        write_sample_companies_folder(self.data_folder_path)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_fetch_many_matches_fetch(self):
+        test_metrics = ["Pretax ROA", "Gross Margin", "ROIC"]
+        pickled_data_path = os.path.join(self.data_folder_path, "pickled_data")
+        os.mkdir(pickled_data_path)
+
+        fetcher = MetricsFetcher(os.path.join(self.data_folder_path), file_style_configs_by_metric)
+        fetched_data = fetcher.fetch_many(test_metrics, pickled_data_path=pickled_data_path)
+        self.assertEqual(list(fetched_data.keys()), test_metrics)
+        self.assertEqual(sorted(fetched_data["Gross Margin"].columns), ["AAPL", "ABT", "MSFT"])
+        self.assertTrue(fetched_data["ROIC"].empty)
+
+        for test_metric in test_metrics:
+            self.assertTrue(os.path.exists(os.path.join(pickled_data_path, f"{test_metric}_data.pickle")))
+
+            single_metric_fetcher = MetricsFetcher(self.data_folder_path, file_style_configs_by_metric)
+            single_metric_fetcher._load_from_excel_file(test_metric)
+            assert_frame_equal(fetched_data[test_metric], single_metric_fetcher.get_dataframe())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+import tempfile
+from pandas.testing import assert_frame_equal
+
+import os
+import sys
+sys.path.append(os.path.join(os.getcwd()))
+from src.data_fetchers.metrics_fetcher import MetricsFetcher
+from src.configs.file_style_configs_by_metric import file_style_configs_by_metric
+from tests.synthetic_workbooks import write_sample_companies_folder
+
+
+class ParallelLoadingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.data_folder_path = self.temp_dir.name
+
+        write_sample_companies_folder(self.data_folder_path)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_parallel_matches_serial(self):
+        test_metric = "Pretax ROA"
+        serial_fetcher = MetricsFetcher(self.data_folder_path, file_style_configs_by_metric)
+        parallel_fetcher = MetricsFetcher(self.data_folder_path, file_style_configs_by_metric, n_workers=3)
+
+        serial_fetcher._load_from_excel_file(test_metric)
+        parallel_fetcher._load_from_excel_file(test_metric)
+
+        self.assertEqual([metric.company_ticker for metric in parallel_fetcher.extracted_data],
+                         [metric.company_ticker for metric in serial_fetcher.extracted_data])
+        self.assertEqual(parallel_fetcher.companies_with_not_enough_data, serial_fetcher.companies_with_not_enough_data)
+        self.assertEqual(sorted(parallel_fetcher.companies_with_not_enough_data), ["MSFT", "TXT"])
+        self.assertEqual(parallel_fetcher.companies_successfully_extracted, 3)
+        assert_frame_equal(parallel_fetcher.get_dataframe(), serial_fetcher.get_dataframe())
+
+
+if __name__ == "__main__":
+    unittest.main()
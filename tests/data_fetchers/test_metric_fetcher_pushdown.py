@@ -0,0 +1,83 @@
+import unittest
+import tempfile
+import datetime
+from pandas.testing import assert_frame_equal
+
+import os
+import sys
+sys.path.append(os.path.join(os.getcwd()))
+from src.data_fetchers.metrics_fetcher import MetricsFetcher, ExtractionEngine
+from src.configs.file_style_configs_by_metric import file_style_configs_by_metric
+from tests.synthetic_workbooks import generate_companies_folder
+
+
+class PushdownTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.data_folder_path = os.path.join(self.temp_dir.name, "companies_data")
+        self.styles = generate_companies_folder(self.data_folder_path, n_companies=8, n_quarters=40, filler_rows=0, seed=2)
+        self.tickers = sorted(self.styles)[:3]
+        self.metrics = ["Pretax ROA", "Current Ratio"]
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def get_pickled_data_path(self, name: str) -> str:
+        pickled_data_path = os.path.join(self.temp_dir.name, name)
+        os.makedirs(pickled_data_path, exist_ok=True)
+        return pickled_data_path
+
+    def get_fetcher(self, **kwargs) -> MetricsFetcher:
+        return MetricsFetcher(self.data_folder_path, file_style_configs_by_metric, show_progress=False, report=True, **kwargs)
+
+    def test_pushdown_matches_filtering_the_full_panel(self):
+        for engine in ExtractionEngine:
+            full_fetcher = self.get_fetcher(extraction_engine=engine)
+            full_panels = full_fetcher.fetch_many(self.metrics, self.get_pickled_data_path(f"full_{engine.name}"))
+
+            fetcher = self.get_fetcher(extraction_engine=engine)
+            panels = fetcher.fetch_many(self.metrics, self.get_pickled_data_path(f"subset_{engine.name}"), tickers=[ticker.lower() for ticker in self.tickers],
+                                        start="2000Q1", end="2004Q4")
+
+            for metric in self.metrics:
+                full_panel = full_panels[metric]
+                is_in_window = [datetime.date(2000, 1, 1) <= date <= datetime.date(2004, 12, 31) for date in full_panel.index]
+                expected_panel = full_panel.loc[is_in_window, [ticker for ticker in full_panel.columns if ticker in self.tickers]]
+                assert_frame_equal(panels[metric].dropna(how="all"), expected_panel.dropna(how="all"))
+
+            self.assertEqual(sorted(file_report.company_ticker for file_report in fetcher.extraction_report.file_reports), self.tickers)
+            full_cells_read = sum(file_report.cells_read for file_report in full_fetcher.extraction_report.file_reports if file_report.company_ticker in self.tickers)
+            self.assertLess(fetcher.extraction_report.get_file_table()["cells_read"].sum(), full_cells_read)
+
+    def test_cache_is_reused_across_overlapping_requests(self):
+        pickled_data_path = self.get_pickled_data_path("pickled_data")
+        self.get_fetcher().fetch("Pretax ROA", pickled_data_path, tickers=self.tickers, start="2000Q1", end="2006Q4")
+        self.assertFalse(os.path.exists(os.path.join(pickled_data_path, "Pretax ROA_data.pickle")))
+
+        fetcher = self.get_fetcher()
+        narrow_panel = fetcher.fetch("Pretax ROA", pickled_data_path, tickers=self.tickers[:2], start="2002Q1", end="2003Q4")
+        self.assertEqual((fetcher.cache_stats["Pretax ROA"].hits, fetcher.cache_stats["Pretax ROA"].misses), (2, 0))
+        self.assertTrue(all(datetime.date(2002, 1, 1) <= date <= datetime.date(2003, 12, 31) for date in narrow_panel.index))
+
+        # A wider window extracts again, the union of both windows, which then serves both
+        fetcher = self.get_fetcher()
+        fetcher.fetch("Pretax ROA", pickled_data_path, tickers=self.tickers, start="1998Q1", end="2003Q4")
+        self.assertEqual(fetcher.cache_stats["Pretax ROA"].misses, 3)
+        fetcher = self.get_fetcher()
+        fetcher.fetch("Pretax ROA", pickled_data_path, tickers=self.tickers, start="1998Q1", end="2006Q4")
+        self.assertEqual((fetcher.cache_stats["Pretax ROA"].hits, fetcher.cache_stats["Pretax ROA"].misses), (3, 0))
+
+        # The full history of every company is only cached by a full fetch
+        fetcher = self.get_fetcher()
+        full_panel = fetcher.fetch("Pretax ROA", pickled_data_path)
+        self.assertEqual(fetcher.cache_stats["Pretax ROA"].misses, 8)
+        self.assertTrue(os.path.exists(os.path.join(pickled_data_path, "Pretax ROA_data.pickle")))
+
+        fetcher = self.get_fetcher()
+        subset_panel = fetcher.fetch("Pretax ROA", pickled_data_path, tickers=self.tickers)
+        self.assertEqual((fetcher.cache_stats["Pretax ROA"].hits, fetcher.cache_stats["Pretax ROA"].misses), (3, 0))
+        assert_frame_equal(subset_panel.dropna(how="all"), full_panel[subset_panel.columns].dropna(how="all"))
+
+
+if __name__ == "__main__":
+    unittest.main()
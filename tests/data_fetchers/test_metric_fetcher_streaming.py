@@ -0,0 +1,78 @@
+import unittest
+import tempfile
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pandas.testing import assert_series_equal
+
+import os
+import sys
+sys.path.append(os.path.join(os.getcwd()))
+from src.data_fetchers.metrics_fetcher import MetricsFetcher, map_bounded
+from src.configs.file_style_configs_by_metric import file_style_configs_by_metric
+from tests.synthetic_workbooks import write_sample_companies_folder
+
+
+class StreamingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.data_folder_path = self.temp_dir.name
+
+        write_sample_companies_folder(self.data_folder_path)
+        self.metrics = ["Pretax ROA", "Gross Margin"]
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def get_fetcher(self, **kwargs) -> MetricsFetcher:
+        return MetricsFetcher(self.data_folder_path, file_style_configs_by_metric, show_progress=False, **kwargs)
+
+    def assert_matches_batch_extraction(self, extracted_companies: list):
+        batch_extraction = self.get_fetcher()._load_from_excel_files(self.metrics)
+        for metric in self.metrics:
+            streamed = [company.metrics_of_company[metric] for company in extracted_companies if company.metrics_of_company[metric] is not None]
+            self.assertEqual([metric_of_company.company_ticker for metric_of_company in streamed],
+                             [metric_of_company.company_ticker for metric_of_company in batch_extraction[metric]])
+            for streamed_metric, batch_metric in zip(streamed, batch_extraction[metric]):
+                assert_series_equal(streamed_metric.metric_data, batch_metric.metric_data)
+
+    def test_iter_companies_matches_batch_extraction(self):
+        for n_workers in [1, 2]:
+            extracted_companies = list(self.get_fetcher(n_workers=n_workers).iter_companies(self.metrics))
+            self.assertEqual([company.file_name for company in extracted_companies],
+                             [f"{company.company_ticker}_quarterly.xlsx" for company in extracted_companies])
+            self.assert_matches_batch_extraction(extracted_companies)
+
+    def test_aiter_companies_matches_batch_extraction(self):
+        async def collect(fetcher):
+            return [company async for company in fetcher.aiter_companies(self.metrics)]
+
+        for n_workers in [1, 2]:
+            self.assert_matches_batch_extraction(asyncio.run(collect(self.get_fetcher(n_workers=n_workers))))
+
+    def test_iter_companies_is_lazy(self):
+        fetcher = self.get_fetcher(report=True)
+        companies = fetcher.iter_companies(self.metrics)
+        next(companies)
+        self.assertEqual(len(fetcher.extraction_report.file_reports), 1)
+
+        companies.close()
+        self.assertEqual(len(fetcher.extraction_report.file_reports), 1)
+
+    def test_map_bounded_keeps_max_pending_tasks(self):
+        lock = threading.Lock()
+        started = []
+        def record_start(i):
+            with lock:
+                started.append(i)
+            return i
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = map_bounded(executor, record_start, range(20), max_pending=3)
+            self.assertEqual([next(results) for _ in range(5)], list(range(5)))
+            self.assertLessEqual(len(started), 5 + 2) # The consumed results plus the ones in flight
+            self.assertEqual(list(results), list(range(5, 20)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+import tempfile
+import datetime
+import pickle
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal, assert_series_equal
+
+import os
+import sys
+sys.path.append(os.path.join(os.getcwd()))
+from src.data_fetchers.metric_series import CompactSeries
+from src.data_fetchers.panel_assembly import PanelAssembler, DuplicateQuarters
+from src.data_fetchers.metrics_fetcher import MetricsFetcher
+from src.configs.file_style_configs_by_metric import file_style_configs_by_metric
+from tests.synthetic_workbooks import generate_companies_folder
+
+
+def quarter_ends(n_quarters: int, first_year: int) -> list:
+    return [datetime.date(first_year + i//4, 3*(i%4) + 1, 1) for i in range(n_quarters)]
+
+
+class CompactSeriesTestCase(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.series_list = []
+        for i in range(20):
+            index = quarter_ends(int(rng.integers(1, 40)), int(rng.integers(1995, 2010)))[::-1] # Descending, like Style A
+            values = rng.normal(size=len(index))
+            values[rng.random(len(index)) < 0.2] = np.NaN
+            self.series_list.append(pd.Series(values, index=index, name=f"TICK{i}"))
+        self.series_list.append(pd.Series([1.0, 2.0, np.NaN], index=quarter_ends(2, 2000) + quarter_ends(1, 2000), name="DUP"))
+
+    def test_round_trip(self):
+        for series in self.series_list:
+            compact_series = CompactSeries.from_series(series)
+            assert_series_equal(compact_series.to_series(), series)
+            np.testing.assert_array_equal(compact_series.is_missing, series.isna().to_numpy())
+            self.assertEqual(pickle.loads(pickle.dumps(compact_series)), compact_series)
+
+    def test_float32_values(self):
+        compact_series = CompactSeries.from_series(self.series_list[0], dtype=np.float32)
+        self.assertEqual(compact_series.values.dtype, np.float32)
+        assert_series_equal(compact_series.to_series(), self.series_list[0], rtol=1e-6)
+
+    def test_assemble_compact_series(self):
+        compact_series_list = [CompactSeries.from_series(series) for series in self.series_list]
+        for duplicate_quarters in [DuplicateQuarters.FIRST, DuplicateQuarters.LAST, DuplicateQuarters.MEAN]:
+            expected_panel = PanelAssembler(duplicate_quarters).assemble(self.series_list)
+            assert_frame_equal(PanelAssembler(duplicate_quarters).assemble(compact_series_list), expected_panel)
+            assert_frame_equal(PanelAssembler(duplicate_quarters).assemble(compact_series_list[:5] + self.series_list[5:]), expected_panel)
+
+
+class CompactFetchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.data_folder_path = os.path.join(self.temp_dir.name, "companies_data")
+        generate_companies_folder(self.data_folder_path, n_companies=6, n_quarters=20, filler_rows=0)
+        self.metrics = ["Pretax ROA", "Current Ratio"]
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def fetch(self, compact_series: bool) -> tuple[MetricsFetcher, dict]:
+        pickled_data_path = os.path.join(self.temp_dir.name, f"pickled_data_{compact_series}")
+        os.mkdir(pickled_data_path)
+        fetcher = MetricsFetcher(self.data_folder_path, file_style_configs_by_metric, show_progress=False, compact_series=compact_series)
+        return fetcher, fetcher.fetch_many(self.metrics, pickled_data_path)
+
+    def test_compact_fetch_gives_the_same_panels(self):
+        fetcher, compact_panels = self.fetch(compact_series=True)
+        _, panels = self.fetch(compact_series=False)
+
+        for metric in self.metrics:
+            assert_frame_equal(compact_panels[metric], panels[metric])
+        self.assertTrue(all(isinstance(metric_of_company.metric_data, CompactSeries) for metric_of_company in fetcher.extracted_data))
+
+        compact_bytes = sum(metric_of_company.metric_data.nbytes for metric_of_company in fetcher.extracted_data)
+        series_bytes = sum(metric_of_company.metric_data.to_series().memory_usage(deep=True) for metric_of_company in fetcher.extracted_data)
+        self.assertLess(compact_bytes*3, series_bytes)
+
+
+if __name__ == "__main__":
+    unittest.main()
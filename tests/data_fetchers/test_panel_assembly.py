@@ -0,0 +1,53 @@
+import unittest
+import datetime
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+import os
+import sys
+sys.path.append(os.path.join(os.getcwd()))
+from src.data_fetchers.panel_assembly import PanelAssembler, DuplicateQuarters, DuplicateQuartersFound
+
+
+def quarter_ends(n_quarters: int, first_year: int) -> list:
+    return [datetime.date(first_year + i//4, 3*(i%4) + 1, 1) for i in range(n_quarters)]
+
+
+class PanelAssemblyTestCase(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.series_list = []
+        for i in range(20):
+            index = quarter_ends(int(rng.integers(1, 40)), int(rng.integers(1995, 2010)))[::-1] # Descending, like Style A
+            values = rng.normal(size=len(index))
+            values[rng.random(len(index)) < 0.2] = np.NaN
+            self.series_list.append(pd.Series(values, index=index, name=f"TICK{i}"))
+
+    def test_assemble_matches_outer_merge(self):
+        merged = pd.DataFrame()
+        for series in self.series_list:
+            merged = pd.merge(merged, series, how="outer", left_index=True, right_index=True)
+
+        assert_frame_equal(PanelAssembler().assemble(self.series_list), merged)
+
+    def test_duplicate_quarters(self):
+        index = quarter_ends(3, 2000)
+        series_list = [pd.Series([1.0, 2.0, 3.0, np.NaN], index=index + [index[1]], name="DUP"), pd.Series([5.0], index=index[:1], name="OK")]
+
+        for duplicate_quarters, expected_value in [(DuplicateQuarters.FIRST, 2.0), (DuplicateQuarters.LAST, np.NaN), (DuplicateQuarters.MEAN, 2.0)]:
+            assembler = PanelAssembler(duplicate_quarters)
+            panel = assembler.assemble(series_list)
+            self.assertEqual(panel.shape, (3, 2))
+            np.testing.assert_equal(panel.loc[index[1], "DUP"], expected_value)
+            self.assertEqual(assembler.companies_with_duplicate_quarters, ["DUP"])
+
+        with self.assertRaises(DuplicateQuartersFound):
+            PanelAssembler(DuplicateQuarters.RAISE).assemble(series_list)
+
+    def test_assemble_nothing(self):
+        assert_frame_equal(PanelAssembler().assemble([]), pd.DataFrame())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,170 @@
+import unittest
+import tempfile
+import datetime
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from unittest import mock
+
+import os
+import sys
+sys.path.append(os.path.join(os.getcwd()))
+from src.data_fetchers.panel_store import ColumnarPanelStore, PanelStorage
+from src.data_fetchers.metrics_fetcher import MetricsFetcher
+from src.data_fetchers.metric_cache import MetricCache
+from src.configs.file_style_configs_by_metric import file_style_configs_by_metric
+from tests.synthetic_workbooks import write_companies_folder, quarter_labels
+
+
+class ColumnarPanelStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store = ColumnarPanelStore(os.path.join(self.temp_dir.name, "Pretax ROA_panel"))
+
+        rng = np.random.default_rng(0)
+        quarter_ends = pd.period_range("1999Q1", "2021Q4", freq="Q").to_timestamp(how="end").date
+        values = rng.normal(size=(len(quarter_ends), 30))
+        values[rng.random(values.shape) < 0.1] = np.NaN
+        self.panel = pd.DataFrame(values, index=pd.Index(quarter_ends, dtype=object), columns=[f"TICK{i}" for i in range(30)])
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_round_trip_keeps_index_type(self):
+        for panel in [self.panel,
+                      self.panel.set_axis(pd.to_datetime(self.panel.index)),
+                      self.panel.set_axis(pd.to_datetime(self.panel.index).to_period("Q")),
+                      pd.DataFrame()]:
+            self.store.save(panel)
+            assert_frame_equal(self.store.load(), panel)
+
+        self.store.save(self.panel)
+        self.assertIsInstance(self.store.load().index[0], datetime.date)
+
+    def test_load_selection(self):
+        self.store.save(self.panel)
+        tickers = ["TICK7", "TICK0", "TICK21"]
+
+        selected_panel = self.store.load(tickers, "2000Q1", "2019Q4")
+        expected_panel = self.panel.loc[(self.panel.index >= datetime.date(2000, 1, 1)) & (self.panel.index <= datetime.date(2019, 12, 31)), tickers]
+        assert_frame_equal(selected_panel, expected_panel)
+        self.assertEqual(len(selected_panel), 80)
+
+        period_panel = self.panel.set_axis(pd.to_datetime(self.panel.index).to_period("Q"))
+        self.store.save(period_panel)
+        assert_frame_equal(self.store.load(tickers, start="2020Q1"), period_panel.loc["2020Q1":, tickers])
+
+        with self.assertRaises(KeyError):
+            self.store.load(["TICK0", "MISSING"])
+
+    def test_append_quarter(self):
+        period_panel = self.panel.set_axis(pd.to_datetime(self.panel.index).to_period("Q"))
+        for panel, new_quarters in [(self.panel, pd.period_range("2022Q1", "2023Q2", freq="Q").to_timestamp(how="end").date),
+                                    (period_panel, pd.period_range("2022Q1", "2023Q2", freq="Q"))]:
+            self.store.save(panel.iloc[:-1])
+            expected_panel = panel.iloc[:-1]
+            rng = np.random.default_rng(1)
+            for new_quarter in [panel.index[-1], *new_quarters]:
+                # Some companies without data for the quarter, and a new one once
+                tickers = [ticker for ticker in panel.columns if rng.random() > 0.2] + (["NEW"] if new_quarter == new_quarters[2] else [])
+                values = pd.Series(rng.normal(size=len(tickers)), index=tickers)
+                self.store.append_quarter(new_quarter, values)
+                expected_panel = pd.concat([expected_panel, values.to_frame(new_quarter).T])
+                assert_frame_equal(self.store.load(), expected_panel)
+
+            with self.assertRaises(ValueError):
+                self.store.append_quarter(new_quarters[0], values)
+
+    def test_append_quarter_in_place(self):
+        self.store.save(self.panel, spare_quarters=4)
+        values_file_path = os.path.join(self.store.panel_path, ColumnarPanelStore.VALUES_FILE_NAME)
+        values_file_size = os.path.getsize(values_file_path)
+        values_file_id = os.stat(values_file_path).st_ino
+
+        for new_quarter in pd.period_range("2022Q1", "2022Q4", freq="Q").to_timestamp(how="end").date:
+            self.store.append_quarter(new_quarter, pd.Series(1.0, index=self.panel.columns[::2]))
+        self.assertEqual(os.path.getsize(values_file_path), values_file_size)
+        self.assertEqual(os.stat(values_file_path).st_ino, values_file_id)
+        self.assertEqual(len(self.store.load()), len(self.panel) + 4)
+        self.assertTrue(self.store.load(start="2022Q1")[self.panel.columns[1::2]].isna().all().all())
+
+        # No spare quarter left: the panel is saved again, with room for as many quarters as it has
+        self.store.append_quarter(datetime.date(2023, 3, 31), pd.Series(1.0, index=self.panel.columns))
+        self.assertEqual(np.load(values_file_path, mmap_mode="r").shape, (30, 2*(len(self.panel) + 5)))
+        assert_frame_equal(self.store.load(end="2021Q4"), self.panel)
+
+    def test_fetch_with_columnar_storage(self):
+        data_folder_path = os.path.join(self.temp_dir.name, "companies_data")
+        write_companies_folder(data_folder_path, {
+            "AAPL": ("A", "Apple Inc", quarter_labels(2019, 7, 3), {"Pretax ROA": [1, 2, None, 4, 5, 6, 7]}),
+            "ABT": ("B", "Abbott Laboratories", quarter_labels(2020, 6, 2), {"Pretax ROA": [1, 2, 3, 4, 5, 6]}),
+        })
+
+        fetcher = MetricsFetcher(data_folder_path, file_style_configs_by_metric, panel_storage=PanelStorage.COLUMNAR)
+        fetched_data = fetcher.fetch("Pretax ROA", pickled_data_path=self.temp_dir.name)
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir.name, "Pretax ROA_data.pickle")))
+
+        assert_frame_equal(fetcher.load_panel("Pretax ROA", self.temp_dir.name), fetched_data)
+        assert_frame_equal(fetcher.load_panel("Pretax ROA", self.temp_dir.name, ["ABT"], "2020Q3", "2020Q4"),
+                           fetched_data.loc[[datetime.date(2020, 9, 30), datetime.date(2020, 12, 31)], ["ABT"]])
+
+        pickle_fetcher = MetricsFetcher(data_folder_path, file_style_configs_by_metric)
+        pickle_fetcher.fetch("Pretax ROA", pickled_data_path=self.temp_dir.name)
+        assert_frame_equal(pickle_fetcher.load_panel("Pretax ROA", self.temp_dir.name, ["ABT"], "2020Q3", "2020Q4"),
+                           fetched_data.loc[[datetime.date(2020, 9, 30), datetime.date(2020, 12, 31)], ["ABT"]])
+
+    def test_warm_fetch_reads_columnar_panel(self):
+        data_folder_path = os.path.join(self.temp_dir.name, "companies_data")
+        write_companies_folder(data_folder_path, {
+            "AAPL": ("A", "Apple Inc", quarter_labels(2019, 7, 3), {"Pretax ROA": [1, 2, None, 4, 5, 6, 7]}),
+            "ABT": ("B", "Abbott Laboratories", quarter_labels(2020, 6, 2), {"Pretax ROA": [1, 2, 3, 4, 5, 6]}),
+            "ACN": ("A", "Accenture", quarter_labels(2018, 5, 1), {"Pretax ROA": [1, 2, 3, 4, 5]}),
+        })
+        fetcher = MetricsFetcher(data_folder_path, file_style_configs_by_metric, panel_storage=PanelStorage.COLUMNAR)
+        pickle_fetcher = MetricsFetcher(data_folder_path, file_style_configs_by_metric)
+        pickle_data_path = os.path.join(self.temp_dir.name, "pickle")
+        os.makedirs(pickle_data_path)
+        fetcher.fetch("Pretax ROA", pickled_data_path=self.temp_dir.name)
+
+        requests = [(None, None, None), (["abt"], None, None), (["ACN", "ABT"], "2019Q1", None), (["AAPL"], "2019Q4", "2020Q4")]
+        with mock.patch.object(MetricCache, "load", side_effect=AssertionError("The manifest was loaded")):
+            warm_panels = [fetcher.fetch_many(["Pretax ROA"], self.temp_dir.name, tickers=tickers, start=start, end=end)["Pretax ROA"]
+                           for tickers, start, end in requests]
+        self.assertEqual(fetcher.cache_stats["Pretax ROA"].hits, 1)
+        for (tickers, start, end), warm_panel in zip(requests, warm_panels):
+            assert_frame_equal(warm_panel, pickle_fetcher.fetch_many(["Pretax ROA"], pickle_data_path,
+                                                                     tickers=tickers, start=start, end=end)["Pretax ROA"])
+
+        # A changed workbook goes through the manifest again
+        write_companies_folder(data_folder_path, {
+            "ABT": ("B", "Abbott Laboratories", quarter_labels(2020, 7, 2), {"Pretax ROA": [1, 2, 3, 4, 5, 6, 7]}),
+        })
+        with mock.patch.object(MetricCache, "load", autospec=True, side_effect=MetricCache.load) as load:
+            panel = fetcher.fetch_many(["Pretax ROA"], self.temp_dir.name, tickers=["ABT"])["Pretax ROA"]
+        load.assert_called_once()
+        self.assertEqual(len(panel), 7)
+        self.assertEqual(fetcher.cache_stats["Pretax ROA"].misses, 1)
+
+    def test_fetch_keeps_appended_quarter(self):
+        data_folder_path = os.path.join(self.temp_dir.name, "companies_data")
+        write_companies_folder(data_folder_path, {
+            "AAPL": ("A", "Apple Inc", quarter_labels(2019, 7, 3), {"Pretax ROA": [1, 2, None, 4, 5, 6, 7]}),
+            "ABT": ("B", "Abbott Laboratories", quarter_labels(2020, 6, 2), {"Pretax ROA": [1, 2, 3, 4, 5, 6]}),
+        })
+        fetcher = MetricsFetcher(data_folder_path, file_style_configs_by_metric, panel_storage=PanelStorage.COLUMNAR)
+        panel = fetcher.fetch("Pretax ROA", pickled_data_path=self.temp_dir.name)
+
+        new_quarter = datetime.date(2022, 3, 31)
+        ColumnarPanelStore(os.path.join(self.temp_dir.name, "Pretax ROA_panel")).append_quarter(new_quarter, pd.Series({"ABT": 0.5}))
+        expected_panel = pd.concat([panel, pd.DataFrame({"AAPL": [np.NaN], "ABT": [0.5]}, index=pd.Index([new_quarter], dtype=object))])
+
+        for _ in range(2): # The first fetch doesn't save over the appended quarter
+            assert_frame_equal(fetcher.fetch("Pretax ROA", pickled_data_path=self.temp_dir.name), expected_panel)
+        assert_frame_equal(fetcher.fetch("Pretax ROA", pickled_data_path=self.temp_dir.name, tickers=["ABT"], start="2021Q4"),
+                           expected_panel.loc[expected_panel.index >= datetime.date(2021, 10, 1), ["ABT"]])
+        self.assertEqual(fetcher.cache_stats["Pretax ROA"].misses, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,299 @@
+import unittest
+import tempfile
+import logging
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_series_equal, assert_frame_equal
+from unittest import mock
+
+import os
+import sys
+sys.path.append(os.path.join(os.getcwd()))
+from src.data_fetchers.returns_fetcher import ReturnsFetcher, FailedDownloads
+from src.data_fetchers import price_sources
+from src.data_fetchers.price_sources import IPriceSource, LocalPriceSource
+
+
+def calculate_returns_per_symbol(symbols: list[str], data: pd.DataFrame, return_type: str) -> [dict, dict]:
+    """ Previous implementation of ReturnsFetcher.calculate_returns: one copy of the frame and one groupby per symbol """
+    quarterly_returns = {}
+    daily_returns = {}
+    is_multi_index = isinstance(data.columns, pd.MultiIndex)
+    for symbol in symbols:
+        df = data.copy()
+        if is_multi_index:
+            df = df.loc[:, pd.IndexSlice[:, symbol]].copy()
+
+        df["daily_returns"] = df["Adj Close"].pct_change()
+        df["quarter"] = df.index.to_period("Q")
+        if return_type == "arithmetic":
+            quarterly_returns[symbol] = df.groupby("quarter")["daily_returns"].mean()
+        elif return_type == "geometric":
+            df["daily_growth_multiplier"] = df["daily_returns"] + 1
+            quarterly_returns[symbol] = df.groupby("quarter")["daily_growth_multiplier"].apply(np.prod) - 1
+            quarterly_returns[symbol] = (np.power(quarterly_returns[symbol] + 1, 1/63) - 1).rename("quarterly_returns")
+        daily_returns[symbol] = df["daily_returns"].copy()
+
+    return quarterly_returns, daily_returns
+
+
+class CalculateReturnsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.fetcher = ReturnsFetcher.__new__(ReturnsFetcher) # Nothing to load, only calculate_returns is used
+        self.symbols = ["MSFT", "AAPL", "^GSPC", "TXT"]
+
+        rng = np.random.default_rng(0)
+        dates = pd.bdate_range("2019-12-31", "2021-06-30")
+        prices = pd.DataFrame(100*np.exp(np.cumsum(rng.normal(0, 0.01, (len(dates), len(self.symbols))), axis=0)), index=dates, columns=self.symbols)
+        prices.iloc[:70, 1] = np.NaN # Listed later
+        prices.iloc[200:205, 2] = np.NaN # Missing days
+        self.data = pd.concat({"Adj Close": prices, "Close": prices, "Volume": prices*1000}, axis=1)
+
+    def test_matches_per_symbol_returns(self):
+        for return_type in ["arithmetic", "geometric"]:
+            quarterly_returns, daily_returns = self.fetcher.calculate_returns(self.symbols, self.data, return_type)
+            expected_quarterly_returns, expected_daily_returns = calculate_returns_per_symbol(self.symbols, self.data, return_type)
+
+            self.assertEqual(list(quarterly_returns.keys()), self.symbols)
+            for symbol in self.symbols:
+                assert_series_equal(quarterly_returns[symbol], expected_quarterly_returns[symbol])
+                assert_series_equal(daily_returns[symbol], expected_daily_returns[symbol])
+
+    def test_single_symbol(self):
+        data = self.data.xs("MSFT", axis=1, level=1)
+        quarterly_returns, daily_returns = self.fetcher.calculate_returns(["MSFT"], data, "geometric")
+        expected_quarterly_returns, expected_daily_returns = calculate_returns_per_symbol(["MSFT"], data, "geometric")
+
+        assert_series_equal(quarterly_returns["MSFT"], expected_quarterly_returns["MSFT"])
+        assert_series_equal(daily_returns["MSFT"], expected_daily_returns["MSFT"])
+
+    def test_as_frame(self):
+        quarterly_returns, daily_returns = self.fetcher.calculate_returns(self.symbols, self.data, "arithmetic", as_frame=True)
+        expected_quarterly_returns, expected_daily_returns = calculate_returns_per_symbol(self.symbols, self.data, "arithmetic")
+
+        assert_frame_equal(quarterly_returns, pd.DataFrame(expected_quarterly_returns))
+        assert_frame_equal(daily_returns, pd.DataFrame(expected_daily_returns))
+
+
+class RecordingPriceSource(LocalPriceSource):
+    """ LocalPriceSource that records every request, and also serves volumes like yf.download """
+    def __init__(self, file_path: str):
+        super().__init__(file_path)
+        self.requests = []
+
+    def download(self, symbols, start_date, end_date) -> pd.DataFrame:
+        self.requests.append((sorted(symbols), start_date, end_date))
+        prices = super().download(symbols, start_date, end_date)["Adj Close"]
+        return pd.concat({"Adj Close": prices, "Volume": prices*1000}, axis=1)
+
+
+class FlakyPriceSource(IPriceSource):
+    """ Serves the prices of a DataFrame, failing the first attempts of every request and every request with a bad symbol """
+    def __init__(self, prices: pd.DataFrame, failed_attempts: int=0, bad_symbols: list=[], interrupt_after: int=None):
+        self.prices = prices
+        self.failed_attempts = failed_attempts
+        self.bad_symbols = bad_symbols
+        self.interrupt_after = interrupt_after # Number of requests after which the run is interrupted
+        self.attempts = {}
+        self.requests = []
+
+    def download(self, symbols, start_date, end_date) -> pd.DataFrame:
+        request = (tuple(sorted(symbols)), start_date, end_date)
+        self.attempts[request] = self.attempts.get(request, 0) + 1
+        if self.attempts[request] <= self.failed_attempts:
+            raise ConnectionError("Timed out")
+        if any(symbol in self.bad_symbols for symbol in symbols):
+            raise ValueError(f"Bad symbol in {symbols}")
+        if self.interrupt_after is not None and len(self.requests) == self.interrupt_after:
+            raise KeyboardInterrupt
+
+        self.requests.append((sorted(symbols), start_date, end_date))
+        prices = self.prices.loc[(self.prices.index >= start_date) & (self.prices.index < end_date), self.prices.columns.intersection(symbols)]
+        return pd.concat({"Adj Close": prices}, axis=1)
+
+
+class PriceCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.data_file_path = os.path.join(self.temp_dir.name, "returns_data.pickle")
+
+        rng = np.random.default_rng(1)
+        dates = pd.bdate_range("2018-01-01", "2021-12-31")
+        self.prices = pd.DataFrame(100*np.exp(np.cumsum(rng.normal(0, 0.01, (len(dates), 3)), axis=0)), index=dates, columns=["MSFT", "AAPL", "^GSPC"])
+        prices_file_path = os.path.join(self.temp_dir.name, "prices.csv")
+        LocalPriceSource.save(self.prices, prices_file_path)
+        self.price_source = RecordingPriceSource(prices_file_path)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def get_fetcher(self) -> ReturnsFetcher:
+        return ReturnsFetcher(self.data_file_path, download_stock_data=self.price_source)
+
+    def assert_returns_from_all_prices(self, returns, symbols, return_type, start_date, end_date):
+        prices = self.prices.loc[(self.prices.index >= start_date) & (self.prices.index < end_date), symbols]
+        expected_quarterly_returns, expected_daily_returns = calculate_returns_per_symbol(symbols, pd.concat({"Adj Close": prices}, axis=1), return_type)
+        for symbol in symbols:
+            assert_series_equal(returns[0][symbol], expected_quarterly_returns[symbol], check_freq=False)
+            assert_series_equal(returns[1][symbol].rename_axis(None), expected_daily_returns[symbol], check_freq=False) # The csv of LocalPriceSource names the dates
+
+    def test_only_missing_prices_are_downloaded(self):
+        returns = self.get_fetcher().fetch(["MSFT", "AAPL"], "arithmetic", start_date="2019-01-01", end_date="2020-01-01")
+        self.assert_returns_from_all_prices(returns, ["MSFT", "AAPL"], "arithmetic", "2019-01-01", "2020-01-01")
+        self.assertEqual(self.price_source.requests, [(["AAPL", "MSFT"], "2019-01-01", "2020-01-01")])
+
+        # Another return type and a narrower window are calculated from the cache, also after reloading it
+        returns = self.get_fetcher().fetch(["MSFT", "AAPL"], "geometric", start_date="2019-04-01", end_date="2019-10-01")
+        self.assert_returns_from_all_prices(returns, ["MSFT", "AAPL"], "geometric", "2019-04-01", "2019-10-01")
+        self.assertEqual(len(self.price_source.requests), 1)
+
+        # Only the head and tail of a wider window and the new symbol are downloaded
+        returns = self.get_fetcher().fetch(["MSFT", "AAPL", "^GSPC"], "geometric", start_date="2018-07-01", end_date="2021-01-01")
+        self.assert_returns_from_all_prices(returns, ["MSFT", "AAPL", "^GSPC"], "geometric", "2018-07-01", "2021-01-01")
+        self.assertEqual(sorted(self.price_source.requests[1:]), [(["AAPL", "MSFT"], "2018-07-01", "2019-01-01"),
+                                                                  (["AAPL", "MSFT"], "2020-01-01", "2021-01-01"),
+                                                                  (["^GSPC"], "2018-07-01", "2021-01-01")])
+
+    def test_refresh_data(self):
+        fetcher = self.get_fetcher()
+        fetcher.fetch(["MSFT"], start_date="2019-01-01", end_date="2020-01-01")
+        fetcher.fetch(["MSFT"], refresh_data=True, start_date="2019-01-01", end_date="2020-01-01")
+        self.assertEqual(len(self.price_source.requests), 2)
+
+
+class BatchedDownloadsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.data_file_path = os.path.join(self.temp_dir.name, "returns_data.pickle")
+
+        rng = np.random.default_rng(2)
+        dates = pd.bdate_range("2019-01-01", "2020-12-31")
+        self.symbols = [f"TICK{i}" for i in range(10)]
+        self.prices = pd.DataFrame(100*np.exp(np.cumsum(rng.normal(0, 0.01, (len(dates), len(self.symbols))), axis=0)), index=dates, columns=self.symbols)
+        self.expected_returns = ReturnsFetcher.__new__(ReturnsFetcher).calculate_returns(self.symbols, pd.concat({"Adj Close": self.prices}, axis=1))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def fetch(self, price_source, refresh_data=False, **kwargs):
+        fetcher = ReturnsFetcher(self.data_file_path, download_stock_data=price_source, retry_delay=0, **{"chunk_size": 3, "n_workers": 3, **kwargs})
+        return fetcher, fetcher.fetch(self.symbols, refresh_data=refresh_data, start_date="2019-01-01", end_date="2021-01-01")
+
+    def assert_expected_returns(self, returns, symbols):
+        for symbol in symbols:
+            assert_series_equal(returns[0][symbol], self.expected_returns[0][symbol], check_freq=False)
+            assert_series_equal(returns[1][symbol].rename_axis(None), self.expected_returns[1][symbol], check_freq=False) # The csv of LocalPriceSource names the dates
+
+    def test_chunks_and_retries(self):
+        price_source = FlakyPriceSource(self.prices, failed_attempts=2)
+        _, returns = self.fetch(price_source)
+
+        self.assert_expected_returns(returns, self.symbols)
+        self.assertEqual(sorted(len(symbols) for symbols, _, _ in price_source.requests), [1, 3, 3, 3])
+        self.assertTrue(all(attempts == 3 for attempts in price_source.attempts.values()))
+
+        # Not enough retries: every chunk and then every symbol fails
+        with self.assertWarns(FailedDownloads):
+            fetcher, _ = self.fetch(FlakyPriceSource(self.prices, failed_attempts=2), max_retries=1, refresh_data=True)
+        self.assertEqual(sorted(fetcher.failed_symbols), self.symbols)
+
+    def test_bad_symbol_is_isolated(self):
+        with self.assertWarns(FailedDownloads):
+            fetcher, returns = self.fetch(FlakyPriceSource(self.prices, bad_symbols=["TICK4"]), max_retries=0)
+
+        self.assertEqual(fetcher.failed_symbols, ["TICK4"])
+        self.assert_expected_returns(returns, [symbol for symbol in self.symbols if symbol != "TICK4"])
+        self.assertTrue(returns[1]["TICK4"].isna().all())
+
+        # The failed symbol is not cached, so the next fetch downloads it alone
+        price_source = FlakyPriceSource(self.prices)
+        fetcher, returns = self.fetch(price_source)
+        self.assertEqual(price_source.requests, [(["TICK4"], "2019-01-01", "2021-01-01")])
+        self.assert_expected_returns(returns, self.symbols)
+
+    def test_range_without_prices_is_cached(self):
+        # IPO is listed in 2020, its columns are NaN before, like yf.download gives them
+        prices = self.prices.assign(IPO=self.prices["TICK0"].where(self.prices.index >= "2020-01-01"))
+        price_source = FlakyPriceSource(prices)
+        fetcher = ReturnsFetcher(self.data_file_path, download_stock_data=price_source, retry_delay=0)
+        for _ in range(2):
+            returns = fetcher.fetch(["IPO"], start_date="2019-01-01", end_date="2019-07-01")
+            self.assertEqual(fetcher.failed_symbols, [])
+            self.assertTrue(returns[1]["IPO"].isna().all())
+        self.assertEqual(price_source.requests, [(["IPO"], "2019-01-01", "2019-07-01")])
+
+        # Only the tail of a wider window is downloaded, and it has prices
+        returns = fetcher.fetch(["IPO"], start_date="2019-01-01", end_date="2021-01-01")
+        self.assertEqual(price_source.requests[1:], [(["IPO"], "2019-07-01", "2021-01-01")])
+        self.assertEqual(returns[1]["IPO"].notna().sum(), (self.prices.index >= "2020-01-01").sum() - 1)
+
+    def test_interrupted_fetch_resumes(self):
+        with self.assertRaises(KeyboardInterrupt):
+            self.fetch(FlakyPriceSource(self.prices, interrupt_after=2), n_workers=1)
+
+        price_source = FlakyPriceSource(self.prices)
+        _, returns = self.fetch(price_source)
+        self.assertEqual(sum(len(symbols) for symbols, _, _ in price_source.requests), 4) # The first two chunks were saved
+        self.assert_expected_returns(returns, self.symbols)
+
+    def test_local_price_source(self):
+        prices_file_path = os.path.join(self.temp_dir.name, "prices", "prices.csv")
+        LocalPriceSource.save(self.prices, prices_file_path)
+
+        _, returns = self.fetch(LocalPriceSource(prices_file_path))
+        self.assert_expected_returns(returns, self.symbols)
+
+
+class TestLocalPriceSource(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.prices_file_path = os.path.join(self.temp_dir.name, "prices", "prices.csv")
+
+        dates = pd.bdate_range("2020-01-01", "2020-03-31")
+        self.prices = pd.DataFrame({"MSFT": np.linspace(100, 120, len(dates)), "AAPL": np.linspace(50, 40, len(dates))}, index=dates)
+        LocalPriceSource.save(self.prices, self.prices_file_path)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_download(self):
+        price_source = LocalPriceSource(self.prices_file_path)
+        self.assertIsNone(price_source.prices) # Read on the first download
+
+        data = price_source(["AAPL", "UNKNOWN"], "2020-02-01", "2020-03-02")
+        expected_prices = self.prices.loc["2020-02-01":"2020-03-01", ["AAPL"]]
+        assert_frame_equal(data["Adj Close"], expected_prices, check_freq=False, check_names=False)
+        self.assertEqual(data.columns.to_list(), [("Adj Close", "AAPL")]) # Unknown symbols are left out
+        self.assertTrue(price_source(["MSFT"], "2021-01-01", "2022-01-01").empty)
+
+
+class YFinancePriceSourceTestCase(unittest.TestCase):
+    def setUp(self):
+        dates = pd.bdate_range("2020-01-01", "2020-01-10")
+        prices = pd.DataFrame({"MSFT": np.arange(len(dates), dtype=float), "IPO": np.NaN}, index=dates)
+        self.data = pd.concat({"Adj Close": prices, "Close": prices}, axis=1)
+
+    def download(self, error_messages: list[str]) -> pd.DataFrame:
+        """ Downloads with a stand-in of yf.download that logs error_messages like it does """
+        def download(*args, **kwargs):
+            for error_message in error_messages:
+                logging.getLogger("yfinance").error(error_message)
+            return self.data
+
+        with mock.patch.object(price_sources.yf, "download", side_effect=download), self.assertLogs("yfinance", "ERROR"):
+            return price_sources.YFinancePriceSource().download(["MSFT", "IPO"], "2020-01-01", "2020-01-11")
+
+    def test_symbols_without_prices_are_not_errors(self):
+        data = self.download(["\n1 Failed download:", "['IPO']: possibly delisted; no price data found  (1d 2020-01-01 -> 2020-01-11)"])
+        assert_frame_equal(data, self.data)
+
+    def test_failed_downloads_raise(self):
+        for error_message in ["['IPO']: YFRateLimitError('Too Many Requests. Rate limited. Try after a while.')",
+                              "['IPO']: possibly delisted; no price data found  (1d 2020-01-01 -> 2020-01-11)(Yahoo status_code = 500)"]:
+            with self.assertRaises(price_sources.MissingPrices) as context:
+                self.download([error_message])
+            self.assertEqual(context.exception.symbols, ["IPO"])
+
+
+if __name__ == "__main__":
+    unittest.main()
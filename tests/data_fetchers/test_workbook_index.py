@@ -0,0 +1,50 @@
+import unittest
+import tempfile
+import warnings
+
+import os
+import sys
+sys.path.append(os.path.join(os.getcwd()))
+import openpyxl as opx
+from src.data_fetchers.workbook_index import WorkbookIndex, AmbiguousRowLabel
+from tests.synthetic_workbooks import write_style_a_workbook, quarter_labels
+
+
+class WorkbookIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        file_path = os.path.join(self.temp_dir.name, "AAPL_quarterly.xlsx")
+        write_style_a_workbook(file_path, "Apple Inc", quarter_labels(2020, 4), {
+            "Pretax ROA": [1, 2, 3, 4],
+            " Pretax ROE ": [1, 2, 3, 4],
+            "ROE": [1, 2, 3, 4],
+            "Gross Margin": [1, 2, 3, 4],
+        })
+        self.workbook = opx.load_workbook(file_path)
+        self.index = WorkbookIndex(self.workbook)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_find_sheet(self):
+        self.assertIs(self.index.find_sheet("Ratios - Key Metric", "A1"), self.workbook["Ratios - Key Metric"])
+        self.assertIs(self.index.find_sheet("Balance", "A1"), self.workbook["Balance Sheet"])
+        self.assertIsNone(self.index.find_sheet("Financial Summary", "A1"))
+
+    def test_find_row_keeps_substring_semantics(self):
+        worksheet = self.index.find_sheet("Ratios - Key Metric", "A1")
+
+        with warnings.catch_warnings(record=True) as caught_warnings:
+            warnings.simplefilter("always")
+            self.assertEqual(self.index.find_row(worksheet, "Gross Margin"), 9)
+            self.assertEqual(self.index.find_row(worksheet, "ROE"), 7) # First row containing "ROE" is "Pretax ROE"
+            self.assertEqual(self.index.find_row(worksheet, "ROE"), 7)
+            self.assertIsNone(self.index.find_row(worksheet, "ROIC"))
+
+        self.assertEqual(len(caught_warnings), 1) # Ambiguous lookups are only reported the first time
+        self.assertIsInstance(caught_warnings[0].message, AmbiguousRowLabel)
+        self.assertEqual(self.index.ambiguous_matches[0].matching_labels, ["Pretax ROE", "ROE"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+import tempfile
+from unittest import mock
+
+import openpyxl as opx
+
+import os
+import sys
+sys.path.append(os.path.join(os.getcwd()))
+from src.data_fetchers.workbook_prescan import prescan_workbook, get_style_cells
+from src.data_fetchers.file_style import FileStyle, FileStyleManager
+from src.data_fetchers.metrics_fetcher import extract_metrics_of_company_with_report
+from src.data_fetchers.extraction_report import FailureReason
+from src.configs.file_style_configs_by_metric import file_style_configs_by_metric
+from tests.synthetic_workbooks import write_companies_folder, quarter_labels
+
+
+class WorkbookPrescanTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.data_folder_path = self.temp_dir.name
+
+        write_companies_folder(self.data_folder_path, {
+            "AAPL": ("A", "Apple Inc", quarter_labels(2019, 6, 3), {"Pretax ROA": [1, 2, 3, 4, 5, 6]}),
+            "ABT": ("B", "Abbott Laboratories", quarter_labels(2020, 4, 1), {"Pretax ROA": [1, 2, 3, 4]}, 6),
+            "TXT": ("B", "Textron Inc", quarter_labels(2020, 4, 1), {"Pretax ROA": [1, 2, 3, 4]}, 3),
+        })
+        self.style_cells = get_style_cells(file_style_configs_by_metric)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def get_file_path(self, company_ticker: str) -> str:
+        return os.path.join(self.data_folder_path, f"{company_ticker}_quarterly.xlsx")
+
+    def test_matches_openpyxl(self):
+        for company_ticker in ["AAPL", "ABT", "TXT"]:
+            workbook = opx.load_workbook(self.get_file_path(company_ticker))
+            prescan = prescan_workbook(self.get_file_path(company_ticker), self.style_cells)
+
+            self.assertEqual(prescan.sheet_names, [sheet.title for sheet in workbook.worksheets])
+            self.assertEqual(prescan.active_sheet_name, workbook.active.title)
+            self.assertEqual(prescan.cells, {coordinate: workbook.active[coordinate].value for coordinate in self.style_cells})
+
+    def test_active_sheet_and_style(self):
+        workbook = opx.load_workbook(self.get_file_path("ABT"))
+        workbook.active = 2
+        workbook.save(self.get_file_path("ABT"))
+
+        prescan = prescan_workbook(self.get_file_path("ABT"), self.style_cells)
+        self.assertEqual(prescan.active_sheet_name, "Balance Sheet")
+        self.assertEqual(prescan.get_file_style(file_style_configs_by_metric["Pretax ROA"]), FileStyle.B)
+        self.assertEqual(prescan_workbook(self.get_file_path("AAPL"), self.style_cells).get_file_style(file_style_configs_by_metric["Pretax ROA"]),
+                         FileStyle.A)
+
+    def test_unrecognized_style(self):
+        workbook = opx.load_workbook(self.get_file_path("AAPL"))
+        workbook.active["A3"] = "Something else"
+        workbook.save(self.get_file_path("AAPL"))
+
+        prescan = prescan_workbook(self.get_file_path("AAPL"), self.style_cells)
+        self.assertIsNone(prescan.get_file_style(file_style_configs_by_metric["Pretax ROA"]))
+        with self.assertRaises(Exception):
+            FileStyleManager(file_style_configs_by_metric["Pretax ROA"]).determine_file_style(workbook)
+
+    def test_incomplete_workbooks_are_not_loaded(self):
+        with mock.patch("src.data_fetchers.metrics_fetcher.opx.load_workbook") as load_workbook:
+            metrics_of_company, file_report = extract_metrics_of_company_with_report(self.get_file_path("TXT"), "TXT", file_style_configs_by_metric)
+
+        load_workbook.assert_not_called()
+        self.assertEqual(metrics_of_company, dict.fromkeys(file_style_configs_by_metric))
+        self.assertEqual(set(file_report.failures.values()), {FailureReason.INCOMPLETE_WORKBOOK})
+
+
+if __name__ == "__main__":
+    unittest.main()
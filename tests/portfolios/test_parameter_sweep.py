@@ -0,0 +1,63 @@
+import unittest
+import tempfile
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+import os
+import sys
+sys.path.append(os.path.join(os.getcwd()))
+from src.portfolios.parameter_sweep import ParameterSweep, get_rolling_rebalance_dates, SWEEP_CELL_COLUMNS
+
+
+class ParameterSweepTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.results_file_path = os.path.join(self.temp_dir.name, "sweep_results.csv")
+
+        rng = np.random.default_rng(0)
+        tickers = [f"TICK{i}" for i in range(40)]
+        quarter_ends = pd.period_range("2000Q1", "2009Q4", freq="Q").to_timestamp(how="end").date
+        self.panels = {metric: pd.DataFrame(rng.normal(size=(len(quarter_ends), len(tickers))), index=pd.Index(quarter_ends, dtype=object), columns=tickers)
+                       for metric in ["Pretax ROA", "Gross Margin"]}
+        return_quarters = pd.period_range("2000Q1", "2009Q4", freq="Q", name="quarter")
+        self.returns = pd.DataFrame(rng.normal(0, 0.01, (len(return_quarters), len(tickers) + 1)), index=return_quarters, columns=tickers + ["^GSPC"])
+
+        self.grid = {"quantiles": [0.5, 0.75], "windows": [(8, 4), (12, 2)], "first_quarter": "2000Q1", "last_quarter": "2009Q4"}
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_rolling_rebalance_dates(self):
+        self.assertEqual(get_rolling_rebalance_dates("2000Q1", "2002Q4", 4, 4), ["2001Q1", "2002Q1"])
+        self.assertEqual(get_rolling_rebalance_dates("2000Q1", "2002Q3", 4, 4), ["2001Q1"])
+
+    def test_sweep(self):
+        results = ParameterSweep(self.panels, self.returns, self.results_file_path).run(**self.grid)
+        n_cells = len(self.panels) * len(self.grid["quantiles"]) * (len(get_rolling_rebalance_dates("2000Q1", "2009Q4", 8, 4)) + len(get_rolling_rebalance_dates("2000Q1", "2009Q4", 12, 2)))
+        self.assertEqual(len(results), 2*n_cells)
+        self.assertFalse(results[SWEEP_CELL_COLUMNS + ["portfolio"]].duplicated().any())
+        self.assertTrue(results["p_value"].between(0, 1).all())
+
+        parallel_results_file_path = os.path.join(self.temp_dir.name, "parallel_sweep_results.csv")
+        parallel_results = ParameterSweep(self.panels, self.returns, parallel_results_file_path, n_workers=2).run(**self.grid)
+        sort_columns = SWEEP_CELL_COLUMNS + ["portfolio"]
+        assert_frame_equal(parallel_results.sort_values(sort_columns).reset_index(drop=True), results.sort_values(sort_columns).reset_index(drop=True))
+
+    def test_resume(self):
+        results = ParameterSweep(self.panels, self.returns, self.results_file_path).run(**self.grid)
+
+        # Interrupted run: the last cells and a row of a half written cell are missing
+        results.iloc[:-7].to_csv(self.results_file_path, index=False)
+        resumed_results = ParameterSweep(self.panels, self.returns, self.results_file_path).run(**self.grid)
+
+        sort_columns = SWEEP_CELL_COLUMNS + ["portfolio"]
+        assert_frame_equal(resumed_results.sort_values(sort_columns).reset_index(drop=True),
+                           results.sort_values(sort_columns).reset_index(drop=True))
+
+        # Nothing left to run
+        ParameterSweep({}, self.returns, self.results_file_path).run(metrics=list(self.panels), **self.grid)
+
+
+if __name__ == "__main__":
+    unittest.main()
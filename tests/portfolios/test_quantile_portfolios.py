@@ -0,0 +1,81 @@
+import unittest
+import datetime
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_series_equal
+
+import os
+import sys
+sys.path.append(os.path.join(os.getcwd()))
+from src.portfolios.quantile_portfolios import QuantilePortfolioBuilder, EXCLUDED
+
+
+def remove_outliers(averages: pd.Series, iqr_times: float) -> pd.Series:
+    first_quartile, third_quartile = averages.quantile(0.25), averages.quantile(0.75)
+    iqr = third_quartile - first_quartile
+    return averages[averages.between(first_quartile - iqr_times*iqr, third_quartile + iqr_times*iqr)]
+
+
+class QuantilePortfoliosTestCase(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.tickers = [f"TICK{i}" for i in range(60)]
+        quarter_ends = pd.period_range("2000Q1", "2012Q4", freq="Q").to_timestamp(how="end").date
+        self.panels = {}
+        for metric in ["Pretax ROA", "Gross Margin", "ROIC"]:
+            values = rng.normal(size=(len(quarter_ends), len(self.tickers)))
+            values[rng.random(values.shape) < 0.2] = np.NaN
+            values[:, 3] = 50 # Outlier
+            self.panels[metric] = pd.DataFrame(values, index=pd.Index(quarter_ends, dtype=object), columns=self.tickers)
+        self.panels["ROIC"] = self.panels["ROIC"].iloc[:, 10:] # Companies missing in a metric
+
+        return_quarters = pd.period_range("2000Q1", "2013Q4", freq="Q", name="quarter")
+        self.returns = pd.DataFrame(rng.normal(0, 0.01, (len(return_quarters), len(self.tickers) - 5)), index=return_quarters, columns=self.tickers[5:])
+        self.returns.iloc[rng.random(self.returns.shape) < 0.1] = np.NaN
+
+    def form_portfolios(self, panel, rebalance_quarter, study_quarters, invest_quarters, quantiles):
+        """ Portfolio formation of the notebooks, one metric and rebalance date at a time """
+        panel = panel.set_axis(pd.PeriodIndex(pd.to_datetime(panel.index), freq="Q"))
+        study_panel = panel[(panel.index >= rebalance_quarter - study_quarters) & (panel.index < rebalance_quarter)]
+        averages = remove_outliers(study_panel.mean(axis=0).dropna(), 1.5)
+
+        breakpoints = [averages.quantile(quantile) for quantile in quantiles]
+        invest_returns = self.returns[(self.returns.index >= rebalance_quarter) & (self.returns.index < rebalance_quarter + invest_quarters)]
+        portfolio_returns = []
+        for portfolio in range(len(quantiles) + 1):
+            is_member = np.ones(len(averages), dtype=bool)
+            if portfolio > 0:
+                is_member &= averages >= breakpoints[portfolio - 1]
+            if portfolio < len(quantiles):
+                is_member &= averages < breakpoints[portfolio]
+            portfolio_returns.append(invest_returns.reindex(columns=averages.index[is_member]).mean(axis=1))
+
+        return portfolio_returns
+
+    def test_matches_notebook_portfolios(self):
+        rebalance_dates = ["2005Q1", "2007Q3", datetime.date(2010, 3, 31)]
+        for builder in [QuantilePortfolioBuilder([0.75], study_quarters=12, invest_quarters=4),
+                        QuantilePortfolioBuilder.with_n_quantiles(5, study_quarters=20, invest_quarters=2)]:
+            portfolios = builder.build(self.panels, self.returns, rebalance_dates)
+            self.assertEqual(portfolios.returns.shape, (len(self.returns), len(self.panels)*len(rebalance_dates)*builder.n_portfolios))
+
+            for metric, panel in self.panels.items():
+                for rebalance_date in rebalance_dates:
+                    rebalance_quarter = pd.Period(rebalance_date, freq="Q")
+                    expected_returns = self.form_portfolios(panel, rebalance_quarter, builder.study_quarters, builder.invest_quarters, builder.quantiles)
+                    returns = portfolios.get_returns(metric, rebalance_date)
+                    for portfolio in range(builder.n_portfolios):
+                        assert_series_equal(returns[portfolio], expected_returns[portfolio], check_names=False)
+
+    def test_memberships(self):
+        portfolios = QuantilePortfolioBuilder([0.5], study_quarters=8).build(self.panels, self.returns, ["2004Q1"])
+        memberships = portfolios.memberships[("Pretax ROA", pd.Period("2004Q1"))]
+
+        self.assertEqual(memberships.index.to_list(), self.tickers)
+        self.assertEqual(memberships["TICK3"], EXCLUDED) # Outlier
+        self.assertTrue((portfolios.memberships[("ROIC", pd.Period("2004Q1"))].iloc[:10] == EXCLUDED).all()) # Not in the ROIC panel
+        self.assertLessEqual(abs((memberships == 0).sum() - (memberships == 1).sum()), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+import os
+import sys
+sys.path.append(os.path.join(os.getcwd()))
+from src.portfolios.return_statistics import summarize_returns, paired_t_tests, block_bootstrap_p_values, adjust_p_values, MultipleTesting
+
+
+class ReturnStatisticsTestCase(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        quarters = pd.period_range("2000Q1", "2009Q4", freq="Q")
+        self.baseline = pd.Series(rng.normal(0, 0.01, len(quarters)), index=quarters)
+        self.baseline.iloc[3] = np.NaN
+
+        values = self.baseline.to_numpy()[:, np.newaxis] + rng.normal(0, 0.01, (len(quarters), 12)) + np.linspace(-0.01, 0.01, 12)
+        values[rng.random(values.shape) < 0.1] = np.NaN
+        values[:, 10] = np.NaN # No returns
+        values[1:, 11] = np.NaN # One return
+        self.returns = pd.DataFrame(values, index=quarters, columns=[f"portfolio {i}" for i in range(12)])
+
+    def test_summary_matches_pandas(self):
+        summary = summarize_returns(self.returns)
+        for column in self.returns.columns:
+            for statistic, function in [("variance", pd.Series.var), ("mean", pd.Series.mean), ("std", pd.Series.std),
+                                        ("min", pd.Series.min), ("median", pd.Series.median), ("max", pd.Series.max)]:
+                np.testing.assert_allclose(summary.loc[column, statistic], function(self.returns[column]), rtol=1e-12)
+
+    def test_t_tests_match_ttest_rel(self):
+        t_tests = paired_t_tests(self.returns, self.baseline)
+        for column in self.returns.columns:
+            pairs = pd.concat([self.returns[column], self.baseline], axis=1).dropna()
+            self.assertEqual(t_tests.loc[column, "n"], len(pairs))
+            if len(pairs) < 2:
+                self.assertTrue(np.isnan(t_tests.loc[column, "p_value"]))
+                continue
+
+            t_statistic, p_value = stats.ttest_rel(pairs.iloc[:, 0], pairs.iloc[:, 1])
+            np.testing.assert_allclose(t_tests.loc[column, ["t_statistic", "p_value"]].to_numpy(dtype=float), [t_statistic, p_value], rtol=1e-9)
+
+    def test_block_bootstrap(self):
+        p_values = block_bootstrap_p_values(self.returns, self.baseline, n_resamples=2000, seed=1)["p_value"]
+        parallel_p_values = block_bootstrap_p_values(self.returns, self.baseline, n_resamples=2000, seed=1, n_workers=2)["p_value"]
+        pd.testing.assert_series_equal(parallel_p_values, p_values)
+
+        # Close to the t distribution for normal, independent returns
+        t_test_p_values = paired_t_tests(self.returns, self.baseline)["p_value"]
+        is_tested = t_test_p_values.notna()
+        self.assertTrue((p_values[is_tested] - t_test_p_values[is_tested]).abs().max() < 0.1)
+        self.assertTrue(p_values[~is_tested].isna().all())
+
+    def test_adjust_p_values(self):
+        p_values = pd.Series([0.01, 0.04, np.NaN, 0.03, 0.5])
+        np.testing.assert_allclose(adjust_p_values(p_values, MultipleTesting.BONFERRONI), [0.04, 0.16, np.NaN, 0.12, 1])
+        np.testing.assert_allclose(adjust_p_values(p_values, MultipleTesting.HOLM), [0.04, 0.09, np.NaN, 0.09, 0.5])
+        np.testing.assert_allclose(adjust_p_values(p_values, MultipleTesting.BENJAMINI_HOCHBERG), [0.04, 0.16/3, np.NaN, 0.16/3, 0.5])
+        self.assertEqual(adjust_p_values([0.2, 0.3], MultipleTesting.NONE), [0.2, 0.3])
+
+
+if __name__ == "__main__":
+    unittest.main()
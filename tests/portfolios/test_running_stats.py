@@ -0,0 +1,71 @@
+import unittest
+import numpy as np
+import pandas as pd
+from numpy.testing import assert_allclose
+from pandas.testing import assert_series_equal
+
+import os
+import sys
+sys.path.append(os.path.join(os.getcwd()))
+from src.portfolios.quantile_portfolios import QuantilePortfolioBuilder
+from src.portfolios.running_stats import RunningMetricStats
+
+
+class RunningMetricStatsTestCase(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.tickers = [f"TICK{i}" for i in range(50)]
+        quarter_ends = pd.period_range("2000Q1", "2012Q4", freq="Q").to_timestamp(how="end").date
+        values = rng.normal(size=(len(quarter_ends), len(self.tickers)))
+        values[rng.random(values.shape) < 0.2] = np.NaN
+        values[:20, 5] = np.NaN # Company that starts reporting late
+        values[:, 6] = np.NaN # Company that never reports
+        values[:, 3] = 50 # Outlier
+        self.panel = pd.DataFrame(values, index=pd.Index(quarter_ends, dtype=object), columns=self.tickers)
+        self.returns = pd.DataFrame(0.0, index=pd.period_range("2000Q1", "2013Q4", freq="Q"), columns=self.tickers)
+
+    def assert_stats_equal(self, stats: RunningMetricStats, panel: pd.DataFrame, window_quarters: int):
+        panel = panel.reindex(columns=stats.tickers)
+        assert_allclose(stats.count, panel.count().to_numpy())
+        assert_allclose(stats.mean, panel.mean().to_numpy())
+        assert_allclose(stats.variance, panel.var().to_numpy())
+
+        window_panel = panel.set_axis(pd.PeriodIndex(pd.to_datetime(panel.index), freq="Q")).loc[stats.last_quarter - window_quarters + 1:]
+        assert_allclose(stats.window_sum, window_panel.sum().to_numpy())
+        assert_allclose(stats.window_count, window_panel.count().to_numpy())
+        assert_allclose(stats.window_mean, window_panel.mean().to_numpy())
+
+    def test_append_matches_full_recompute(self):
+        builder = QuantilePortfolioBuilder.with_n_quantiles(4, study_quarters=12)
+        stats = RunningMetricStats.from_panel(self.panel.iloc[:16], window_quarters=12)
+        for num_quarters in range(17, len(self.panel) + 1):
+            quarter = self.panel.index[num_quarters - 1]
+            stats.append_quarter(quarter, self.panel.iloc[num_quarters - 1].dropna())
+            self.assert_stats_equal(stats, self.panel.iloc[:num_quarters], 12)
+
+            rebalance_quarter = pd.Period(quarter, freq="Q") + 1
+            portfolios = builder.build({"Pretax ROA": self.panel.iloc[:num_quarters]}, self.returns, [rebalance_quarter])
+            assert_series_equal(stats.get_memberships(builder), portfolios.memberships[("Pretax ROA", rebalance_quarter)], check_names=False)
+
+        self.assert_stats_equal(RunningMetricStats.from_panel(self.panel, window_quarters=12), self.panel, 12)
+
+    def test_new_tickers_and_skipped_quarters(self):
+        stats = RunningMetricStats(["TICK0", "TICK1"], window_quarters=4)
+        stats.append_quarter("2000Q1", pd.Series({"TICK0": 1.0, "TICK1": 2.0}))
+        stats.append_quarter("2000Q2", pd.Series({"TICK0": 3.0, "NEW": 4.0}))
+        stats.append_quarter("2001Q1", pd.Series({"NEW": 6.0})) # Two quarters without data
+
+        self.assertEqual(stats.tickers.to_list(), ["TICK0", "TICK1", "NEW"])
+        assert_allclose(stats.count, [2, 1, 2])
+        assert_allclose(stats.mean, [2.0, 2.0, 5.0])
+        assert_allclose(stats.variance, [2.0, np.NaN, 2.0])
+        assert_allclose(stats.window_mean, [3.0, np.NaN, 5.0]) # 2000Q2 to 2001Q1
+
+        with self.assertRaises(ValueError):
+            stats.append_quarter("2001Q1", pd.Series({"NEW": 7.0}))
+        with self.assertRaises(ValueError):
+            stats.get_memberships(QuantilePortfolioBuilder(study_quarters=8))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,175 @@
+""" Helpers that write small Style A / Style B workbooks so the fetchers can be tested without the real data """
+import os
+import re
+import zipfile
+
+import numpy as np
+import openpyxl as opx
+
+PERCENT_NUMBER_FORMAT = r"[>=100]##,##0.0\%;[<=-100]\-##,##0.0\%;##,##0.0\%"
+
+STYLE_A_SHEETS = ["Ratios - Key Metric", "Income Statement", "Balance Sheet", "Cash Flow"]
+STYLE_B_SHEETS = ["Financial Summary", "Income Statement", "Balance Sheet", "Cash Flow"]
+
+
+def quarter_labels(first_year: int, n_quarters: int, first_quarter: int = 1) -> list[tuple[int, int]]:
+    """ (year, quarter) pairs in ascending order """
+    labels = []
+    year, quarter = first_year, first_quarter
+    for _ in range(n_quarters):
+        labels.append((year, quarter))
+        quarter += 1
+        if quarter > 4:
+            year, quarter = year + 1, 1
+    return labels
+
+
+def write_style_a_workbook(file_path: str, company_name: str, quarters: list[tuple[int, int]], rows: dict, n_sheets: int = 4,
+                           filler_rows: int = 0):
+    """ Style A: company name and sheet title in A1, dates on row 5 from column C in descending order.
+    filler_rows rows of numbers are written in the other sheets, so they weigh like the ones of the real workbooks.
+    """
+    workbook = opx.Workbook()
+    workbook.remove(workbook.active)
+    for sheet_title in (STYLE_A_SHEETS + [f"Extra {i}" for i in range(n_sheets)])[:n_sheets]:
+        sheet = workbook.create_sheet(sheet_title[:31])
+        sheet["A1"] = f"{company_name} | {sheet_title}"
+        sheet["A3"] = f"{sheet_title}\xa0\xa0In Millions of USD except Per Share"
+        sheet["A5"] = "Fiscal Year"
+        if sheet_title != STYLE_A_SHEETS[0]:
+            _write_filler_rows(sheet, 6, 3, len(quarters), filler_rows)
+            continue
+
+        descending_quarters = quarters[::-1]
+        for i, (year, _) in enumerate(descending_quarters):
+            sheet.cell(row=5, column=3 + i, value=f" {year}")
+        for row_num, (label, values) in enumerate(rows.items(), start=6):
+            _write_metric_row(sheet, row_num, 3, label, values[::-1])
+
+    workbook.save(file_path)
+
+
+def write_style_b_workbook(file_path: str, company_name: str, quarters: list[tuple[int, int]], rows: dict, n_sheets: int = 4,
+                           filler_rows: int = 0):
+    """ Style B: sheet title in A1, company name in B2, dates on row 11 from column B in ascending order.
+    filler_rows rows of numbers are written in the other sheets, like in write_style_a_workbook.
+    """
+    workbook = opx.Workbook()
+    workbook.remove(workbook.active)
+    for sheet_title in (STYLE_B_SHEETS + [f"Extra {i}" for i in range(n_sheets)])[:n_sheets]:
+        sheet = workbook.create_sheet(sheet_title[:31])
+        sheet["A1"] = sheet_title
+        sheet["B2"] = f"{company_name} (NYSE:{company_name[:4].upper()})"
+        sheet["A3"] = "Currency: USD"
+        sheet["A14"] = f"{sheet_title} - Quarterly"
+        if sheet_title != STYLE_B_SHEETS[0]:
+            _write_filler_rows(sheet, 15, 2, len(quarters), filler_rows)
+            continue
+
+        for i, (year, _) in enumerate(quarters):
+            sheet.cell(row=11, column=2 + i, value=str(year))
+        for row_num, (label, values) in enumerate(rows.items(), start=15):
+            _write_metric_row(sheet, row_num, 2, label, values)
+
+    workbook.save(file_path)
+
+
+def _write_metric_row(sheet, row_num: int, first_col: int, label: str, values: list):
+    sheet.cell(row=row_num, column=1, value=label)
+    for i, value in enumerate(values):
+        cell = sheet.cell(row=row_num, column=first_col + i)
+        if value is None:
+            cell.value = "-"
+        elif isinstance(value, tuple): # (value, number_format)
+            cell.value, cell.number_format = value
+        else:
+            cell.value = value
+            cell.number_format = PERCENT_NUMBER_FORMAT
+
+
+def _write_filler_rows(sheet, first_row_num: int, first_col: int, n_cols: int, n_rows: int):
+    for row_num in range(first_row_num, first_row_num + n_rows):
+        sheet.cell(row=row_num, column=1, value=f"Line item {row_num - first_row_num + 1}")
+        for i in range(n_cols):
+            sheet.cell(row=row_num, column=first_col + i, value=float(row_num*n_cols + i))
+
+
+def write_companies_folder(folder_path: str, companies: dict):
+    """ companies: {ticker: (style, company_name, quarters, rows)}. Files are named like the real data: <ticker>_quarterly.xlsx """
+    os.makedirs(folder_path, exist_ok=True)
+    writers = {"A": write_style_a_workbook, "B": write_style_b_workbook}
+    for ticker, (style, company_name, quarters, rows, *n_sheets) in companies.items():
+        writers[style](os.path.join(folder_path, f"{ticker}_quarterly.xlsx"), company_name, quarters, rows, *n_sheets)
+
+
+def write_stale_dimensions(file_path: str, ref: str = "A1"):
+    """ Rewrites the <dimension> of every sheet to ref, like exporters that don't update it. Read only sheets take their size from it """
+    with zipfile.ZipFile(file_path) as archive:
+        members = {info.filename: archive.read(info.filename) for info in archive.infolist()}
+
+    with zipfile.ZipFile(file_path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for member_path, content in members.items():
+            if member_path.startswith("xl/worksheets/"):
+                content = re.sub(rb'<dimension ref="[^"]*"', f'<dimension ref="{ref}"'.encode(), content)
+            archive.writestr(member_path, content)
+
+
+def write_sample_companies_folder(folder_path: str):
+    """ Five companies of both styles covering the edge cases of the extraction: a blank value and a number format on
+    Pretax ROA for AAPL, a metric named differently in Style B (Gross Profit Margin), a company without Pretax ROA (MSFT),
+    a workbook with too few sheets (TXT) and a history that starts blank (EXC)
+    """
+    write_companies_folder(folder_path, {
+        "AAPL": ("A", "Apple Inc", quarter_labels(2019, 7, 3), {"Pretax ROA": [1.5, 2.0, None, 4, 5, 6, (7.0, "0.00")],
+                                                                "Gross Margin": [40, 41, 42, 43, 44, 45, 46]}),
+        "ABT": ("B", "Abbott Laboratories", quarter_labels(2020, 6, 2), {"Pretax ROA": [1, 2, 3, 4, 5, 6],
+                                                                          "Gross Profit Margin": [50, 51, None, 53, 54, 55]}),
+        "MSFT": ("A", "Microsoft Corp", quarter_labels(2018, 9, 1), {"Gross Margin": [1] * 9}),
+        "TXT": ("B", "Textron Inc", quarter_labels(2020, 4, 1), {"Pretax ROA": [1, 2, 3, 4]}, 3),
+        "EXC": ("B", "Exelon Corp", quarter_labels(2017, 10, 4), {"Pretax ROA": [None, 2, 3, 4, 5, 6, 7, 8, 9, 10]}),
+    })
+
+
+# Metrics stored as plain numbers instead of percentages
+RATIO_METRICS = ["Current Ratio", "Quick Ratio"]
+
+def generate_companies_folder(folder_path: str, n_companies: int, n_quarters: int, n_sheets: int = 4, file_style_configs_by_metric: dict = None,
+                              style_b_share: float = 0.5, blank_share: float = 0.05, filler_rows: int = 30, seed: int = 0) -> dict:
+    """ Writes n_companies random workbooks of both styles with a row for every metric of file_style_configs_by_metric,
+    under the row names of each style. For benchmarks and tests that need more than a handful of companies.
+
+    Args:
+        file_style_configs_by_metric (dict, optional): Defaults to the configuration of src.configs.
+        style_b_share (float, optional): Share of the companies with Style B workbooks, the rest are Style A.
+        blank_share (float, optional): Share of the metric cells written as "-".
+        filler_rows (int, optional): Rows of numbers of the sheets without metrics.
+
+    Returns:
+        dict: {ticker: "A" | "B"}
+    """
+    if file_style_configs_by_metric is None:
+        from src.configs.file_style_configs_by_metric import file_style_configs_by_metric
+    from src.data_fetchers.file_style import FileStyle
+
+    os.makedirs(folder_path, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    writers = {"A": write_style_a_workbook, "B": write_style_b_workbook}
+    styles = {}
+    for i in range(n_companies):
+        ticker = f"T{i:05d}"
+        style = "B" if rng.random() < style_b_share else "A"
+        quarters = quarter_labels(int(rng.integers(1990, 2000)), n_quarters, int(rng.integers(1, 5)))
+
+        rows = {}
+        for metric, file_style_configs in file_style_configs_by_metric.items():
+            values = rng.normal(10, 5, n_quarters).round(2)
+            is_blank = rng.random(n_quarters) < blank_share
+            if metric in RATIO_METRICS:
+                rows[file_style_configs[FileStyle[style]].metric_name] = [None if blank else (value, "0.00") for value, blank in zip(values, is_blank)]
+            else:
+                rows[file_style_configs[FileStyle[style]].metric_name] = [None if blank else value for value, blank in zip(values, is_blank)]
+
+        writers[style](os.path.join(folder_path, f"{ticker}_quarterly.xlsx"), f"Company {i}", quarters, rows, n_sheets, filler_rows=filler_rows)
+        styles[ticker] = style
+
+    return styles